@@ -11,15 +11,119 @@ import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
 import time
 from jupyter_client.kernelspec import KernelSpec, KernelSpecManager, NoSuchKernel
+from jupyter_core.paths import jupyter_data_dir
 from traitlets import Bool, TraitError, Unicode, validate
 
 CACHE_TIMEOUT = 60
 
+DISCOVERY_CACHE_TIMEOUT = 24 * 60 * 60
+"""Seconds a shared conda info or kernel spec discovery result stays valid if no environment directory changes."""
+
 RUNNER_COMMAND = ["python", "-m", "spine_engine.execution_managers.conda_kernel_spec_runner"]
 
 
+def _discovery_cache_file():
+    """Returns the path of the on-disk conda discovery cache."""
+    return join(jupyter_data_dir(), "spine_engine", "conda_discovery_cache.json")
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class _DiscoveryCache:
+    """Process-wide cache of conda information and discovered kernel specs that is mirrored to disk.
+
+    Every entry records the modification times of the directories it was built from
+    and is dropped as soon as one of them changes or the entry is older than DISCOVERY_CACHE_TIMEOUT.
+    """
+
+    def __init__(self, file_path_factory=_discovery_cache_file):
+        self._file_path_factory = file_path_factory
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def get(self, key):
+        """Returns cached value for key or None if there is no valid entry."""
+        with self._lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry["created"] > DISCOVERY_CACHE_TIMEOUT or any(
+                _mtime(path) != mtime for path, mtime in entry["mtimes"].items()
+            ):
+                del entries[key]
+                return None
+            return entry["value"]
+
+    def put(self, key, value, watched_paths):
+        """Stores a JSON serializable value which stays valid until any of the watched paths is modified."""
+        with self._lock:
+            entries = self._load()
+            entries[key] = {
+                "created": time.time(),
+                "mtimes": {path: _mtime(path) for path in watched_paths},
+                "value": value,
+            }
+            self._save(entries)
+
+    def clear(self):
+        """Empties the cache including the on-disk copy."""
+        with self._lock:
+            self._entries = {}
+            try:
+                os.remove(self._file_path_factory())
+            except OSError:
+                pass
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self._file_path_factory(), encoding="utf-8") as cache_file:
+                    entries = json.load(cache_file)
+                if not isinstance(entries, dict):
+                    entries = {}
+            except (OSError, ValueError):
+                entries = {}
+            self._entries = entries
+        return self._entries
+
+    def _save(self, entries):
+        file_path = self._file_path_factory()
+        try:
+            os.makedirs(dirname(file_path), exist_ok=True)
+            file_descriptor, temp_path = tempfile.mkstemp(dir=dirname(file_path), suffix=".tmp")
+            with os.fdopen(file_descriptor, "w", encoding="utf-8") as cache_file:
+                json.dump(entries, cache_file)
+            os.replace(temp_path, file_path)
+        except OSError as error:
+            logging.getLogger(__name__).warning("Failed to write conda discovery cache: %s", error)
+
+
+_discovery_cache = _DiscoveryCache()
+
+
+def clear_conda_discovery_cache():
+    """Forgets all cached conda information and kernel specs."""
+    _discovery_cache.clear()
+
+
+def _watched_paths(conda_info):
+    """Collects the directories whose modification reveals added, removed or changed conda environments."""
+    paths = [conda_info["conda_prefix"], os.path.expanduser(join("~", ".conda", "environments.txt"))]
+    paths += conda_info.get("envs_dirs") or []
+    paths += conda_info.get("envs") or []
+    return paths
+
+
 class CondaKernelSpecManager(KernelSpecManager):
     """A custom KernelSpecManager able to search for conda environments and
     create kernelspecs for them.
@@ -121,32 +225,51 @@ class CondaKernelSpecManager(KernelSpecManager):
         """Get and parse the whole conda information output
 
         Caches the information for CACHE_TIMEOUT seconds, as this is
-        relatively expensive.
+        relatively expensive. Results are shared across instances and processes
+        through the discovery cache.
         """
 
         expiry = self._conda_info_cache_expiry
         if expiry is None or expiry < time.time():
-            self.log.debug("[nb_conda_kernels] refreshing conda info")
-            # This is to make sure that subprocess can find 'conda' even if
-            # it is a Windows batch file---which is the case in non-root
-            # conda environments.
-            shell = self._conda_executable == "conda" and sys.platform.startswith("win")
-            try:
-                # conda info --json uses the standard JSON escaping
-                # mechanism for non-ASCII characters. So it is always
-                # valid to decode here as 'ascii', since the JSON loads()
-                # method will recover any original Unicode for us.
-                p = subprocess.check_output([self._conda_executable, "info", "--json"], shell=shell).decode("ascii")
-                ansi_escape = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
-                result = ansi_escape.sub("", p)  # Remove ANSI Escape Sequences, such as ESC[0m
-                conda_info = json.loads(result)
-            except Exception as err:
-                conda_info = None
-                self.log.error("Obtaining 'conda info --json' failed")
-            self._conda_info_cache = conda_info
+            self._conda_info_cache = _discovery_cache.get(self._info_cache_key)
+            if self._conda_info_cache is None:
+                self._conda_info_cache = self._query_conda_info()
+                if self._conda_info_cache is not None:
+                    _discovery_cache.put(
+                        self._info_cache_key, self._conda_info_cache, _watched_paths(self._conda_info_cache)
+                    )
             self._conda_info_cache_expiry = time.time() + CACHE_TIMEOUT
         return self._conda_info_cache
 
+    @property
+    def _info_cache_key(self):
+        return "info:" + self._conda_executable
+
+    @property
+    def _specs_cache_key(self):
+        return "specs:" + json.dumps([self._conda_executable, self.env_filter, self.name_format, sys.prefix])
+
+    def _query_conda_info(self):
+        """Runs 'conda info --json' and returns parsed output or None if the command fails."""
+        self.log.debug("[nb_conda_kernels] refreshing conda info")
+        # This is to make sure that subprocess can find 'conda' even if
+        # it is a Windows batch file---which is the case in non-root
+        # conda environments.
+        shell = self._conda_executable == "conda" and sys.platform.startswith("win")
+        try:
+            # conda info --json uses the standard JSON escaping
+            # mechanism for non-ASCII characters. So it is always
+            # valid to decode here as 'ascii', since the JSON loads()
+            # method will recover any original Unicode for us.
+            p = subprocess.check_output([self._conda_executable, "info", "--json"], shell=shell).decode("ascii")
+            ansi_escape = re.compile(r"\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])")
+            result = ansi_escape.sub("", p)  # Remove ANSI Escape Sequences, such as ESC[0m
+            conda_info = json.loads(result)
+        except Exception as err:
+            conda_info = None
+            self.log.error("Obtaining 'conda info --json' failed")
+        return conda_info
+
     def _all_envs(self):
         """Find all of the environments we should be checking. We skip
         environments in the conda-bld directory as well as environments
@@ -154,7 +277,7 @@ class CondaKernelSpecManager(KernelSpecManager):
         environment names as keys, and full paths as values.
         """
         conda_info = self._conda_info
-        envs = conda_info["envs"]
+        envs = list(conda_info["envs"])
         base_prefix = conda_info["conda_prefix"]
         envs_prefix = join(base_prefix, "envs")
         build_prefix = join(base_prefix, "conda-bld", "")
@@ -308,8 +431,16 @@ class CondaKernelSpecManager(KernelSpecManager):
         if expiry is not None and expiry >= time.time():
             return self._conda_kernels_cache
 
+        if self.kernelspec_path is None:
+            all_specs = _discovery_cache.get(self._specs_cache_key)
+            if all_specs is None:
+                all_specs = self._all_specs()
+                _discovery_cache.put(self._specs_cache_key, all_specs, self._watched_kernel_paths())
+        else:
+            # Installing the specs is a side effect we must not skip.
+            all_specs = self._all_specs()
         kspecs = {}
-        for name, info in self._all_specs().items():
+        for name, info in all_specs.items():
             kspecs[name] = KernelSpec(**info)
 
         self._conda_kernels_cache_expiry = time.time() + CACHE_TIMEOUT
@@ -317,6 +448,15 @@ class CondaKernelSpecManager(KernelSpecManager):
 
         return kspecs
 
+    def _watched_kernel_paths(self):
+        """Collects the environment and kernel spec directories kernel discovery depends on."""
+        paths = _watched_paths(self._conda_info)
+        for env_path in self._all_envs().values():
+            kspec_base = join(env_path, "share", "jupyter", "kernels")
+            paths.append(kspec_base)
+            paths += glob.glob(join(kspec_base, "*", "kernel.json"))
+        return paths
+
     def find_kernel_specs(self):
         """Returns a dict mapping kernel names to resource directories.
 
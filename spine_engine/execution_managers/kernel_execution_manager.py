@@ -16,13 +16,18 @@ Contains the KernelExecutionManager class and subclasses, and some convenience f
 """
 
 import os
+from queue import Empty, Queue
 import subprocess
 import sys
+import threading
 import uuid
 from jupyter_client.kernelspec import NoSuchKernel
 from jupyter_client.manager import KernelManager
 from spine_engine.execution_managers.conda_kernel_spec_manager import CondaKernelSpecManager
+from ..utils.execution_resources import AcquisitionTag, current_acquisition_tag, persistent_process_semaphore
 from ..utils.helpers import Singleton
+from ..utils.output_limiter import OutputCoalescer, make_output_limiter
+from ..utils.resource_usage import ProcessSampler, emit_resource_usage
 from .execution_manager_base import ExecutionManagerBase
 
 
@@ -39,47 +44,369 @@ class GroupedKernelManager(KernelManager):
         """Returns the group ID of this kernel manager."""
         return self._group_id
 
+    def set_group_id(self, group_id):
+        """Assigns a pre-started kernel to a group.
+
+        Args:
+            group_id (str): group ID
+        """
+        self._group_id = group_id
+
     def set_busy(self, f):
         """Sets km busy. This is set according to the
         status messages received from the IOPUB channel."""
         self._is_busy = f
 
+    @property
+    def kernel_pid(self):
+        """Process id of the kernel or None if not known."""
+        provisioner = getattr(self, "provisioner", None)
+        process = getattr(provisioner, "process", None) if provisioner is not None else getattr(self, "kernel", None)
+        pid = getattr(process, "pid", None)
+        return pid if isinstance(pid, int) else None
+
     def is_busy(self):
         """Returns whether km is busy or not."""
         return self._is_busy
 
 
-class _KernelManagerFactory(metaclass=Singleton):
-    _kernel_managers = {}
-    """Maps filter_id (str) to associated KernelManager"""
-    _key_by_connection_file = {}
-    """Maps connection file path to filter_id (str)"""
+def _start_kernel(km, extra_switches, environment, conda_exe, kwargs):
+    """Starts the kernel of given kernel manager.
+
+    Args:
+        km (GroupedKernelManager): kernel manager
+        extra_switches (list, optional): List of additional switches for the kernel (i.e. Julia or Python)
+        environment (str): "conda" to launch a Conda kernel spec. "" for a regular kernel spec
+        conda_exe (str): path to conda executable
+        kwargs (dict): Keyword arguments passed to ``KernelManager.start_kernel()``
+
+    Returns:
+        dict: message explaining why the kernel could not be started or None if it was started
+    """
+    if environment == "conda":
+        if not os.path.exists(conda_exe):
+            return dict(type="conda_not_found")
+        km.kernel_spec_manager = CondaKernelSpecManager(conda_exe=conda_exe)
+    msg = dict(kernel_name=km.kernel_name)
+    try:
+        if not km.kernel_spec:
+            # Happens when a conda kernel spec with the requested name cannot be dynamically created
+            # i.e. the conda environment does not exist
+            msg["type"] = "conda_kernel_spec_not_found"
+            return msg
+    except NoSuchKernel:
+        msg["type"] = "kernel_spec_not_found"
+        return msg
+    # Check that kernel spec executable is referring to a file that actually exists
+    exe_path = km.kernel_spec.argv[0]
+    if not os.path.exists(exe_path) and os.path.isabs(exe_path):
+        msg["type"] = "kernel_spec_exe_not_found"
+        msg["kernel_exe_path"] = exe_path
+        return msg
+    if extra_switches:
+        # Insert switches right after the julia program
+        km.kernel_spec.argv[1:1] = extra_switches
+    km.start_kernel(**kwargs)
+    return None
+
+
+class _KernelRegistry:
+    """Kernel managers indexed by key, connection file, and kernel name and group id."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._managers = {}
+        """Maps key (str) to GroupedKernelManager"""
+        self._keys_by_group = {}
+        """Maps (kernel name, group id) pairs to keys of kernel managers"""
+        self._key_by_manager = {}
+        self._key_by_connection_file = {}
+
+    def __len__(self):
+        return len(self._managers)
+
+    def add(self, km):
+        """Adds a started kernel manager to the registry.
 
-    def _make_kernel_manager(self, kernel_name, group_id, server_ip, filter_id):
-        """Creates a new kernel manager if necessary or returns an existing one.
+        Args:
+            km (GroupedKernelManager): kernel manager
+
+        Returns:
+            str: kernel manager's key
+        """
+        key = uuid.uuid4().hex
+        with self._lock:
+            self._managers[key] = km
+            self._keys_by_group.setdefault((km.kernel_name, km.group_id()), []).append(key)
+            self._key_by_manager[km] = key
+            self._key_by_connection_file[km.connection_file] = key
+        return key
+
+    def find_idle(self, kernel_name, group_id):
+        """Finds an idle kernel manager.
 
         Args:
-            kernel_name (str): The kernel
-            group_id (str): Item group that will execute using this kernel
-            server_ip (str): Engine Server IP address. '127.0.0.1' when execution happens locally
-            filter_id (str): Filter Id
+            kernel_name (str): kernel's name
+            group_id (str): group id
 
         Returns:
-            GroupedKernelManager
+            tuple: key and kernel manager or None if there are no idle kernel managers
         """
-        if not filter_id == "":
-            group_id = filter_id  # Ignore group ID in case filter ID exists
-        for k in self._kernel_managers:
-            # Reuse kernel manager if using same group id and kernel and it's idle
-            km = self._kernel_managers[k]
-            if km.group_id() == group_id and km.kernel_name == kernel_name:
+        with self._lock:
+            for key in self._keys_by_group.get((kernel_name, group_id), ()):
+                km = self._managers[key]
                 if not km.is_busy():
-                    return km
-        key = uuid.uuid4().hex
-        # Spawn a new kernel manager
-        km = self._kernel_managers[key] = GroupedKernelManager(kernel_name=kernel_name, ip=server_ip, group_id=group_id)
+                    return key, km
+        return None
+
+    def get(self, key):
+        return self._managers.get(key)
+
+    def key_of(self, km):
+        return self._key_by_manager.get(km)
+
+    def get_by_connection_file(self, connection_file):
+        return self._managers.get(self._key_by_connection_file.get(connection_file))
+
+    def pop(self, key):
+        """Removes a kernel manager from the registry.
+
+        Args:
+            key (str): kernel manager's key
+
+        Returns:
+            GroupedKernelManager: removed kernel manager or None if key was not found
+        """
+        with self._lock:
+            km = self._managers.pop(key, None)
+            if km is None:
+                return None
+            group_key = km.kernel_name, km.group_id()
+            group_keys = self._keys_by_group[group_key]
+            group_keys.remove(key)
+            if not group_keys:
+                del self._keys_by_group[group_key]
+            del self._key_by_manager[km]
+            if self._key_by_connection_file.get(km.connection_file) == key:
+                del self._key_by_connection_file[km.connection_file]
         return km
 
+    def pop_by_connection_file(self, connection_file):
+        key = self._key_by_connection_file.get(connection_file)
+        return self.pop(key) if key is not None else None
+
+    def keys(self):
+        return list(self._managers)
+
+
+_POOL_TAG = AcquisitionTag("kernel_pool")
+"""Acquisition tag of the persistent process permits held by idle pooled kernels."""
+
+
+class _KernelPool:
+    """Pre-started idle kernels per kernel spec that can be claimed by any group.
+
+    Kernel specs get pooled once they have been requested; a background thread tops up the pool after each claim.
+    Each idle pooled kernel holds a persistent process permit until it is claimed or shut down.
+    Starting a pooled kernel is skipped if no permit is available right away,
+    and idle kernels are shut down when someone waits for a permit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._size = 0
+        self._idle = {}
+        """Maps spec keys to lists of idle GroupedKernelManagers"""
+        self._recipes = {}
+        """Maps spec keys to arguments needed to start kernels"""
+        self._refill_queue = Queue()
+        self._filler = None
+        persistent_process_semaphore.add_reclaimer(self.reclaim)
+
+    def configure(self, size):
+        """Sets the number of idle kernels to keep per kernel spec.
+
+        Args:
+            size (int): pool size per kernel spec; 0 disables the pool
+        """
+        excess = []
+        with self._lock:
+            self._size = size
+            for kms in self._idle.values():
+                while len(kms) > size:
+                    excess.append(kms.pop())
+            spec_keys = list(self._recipes) if size > 0 else []
+        for km in excess:
+            _discard(km)
+        for spec_key in spec_keys:
+            self._request_refill(spec_key)
+
+    def claim(self, spec_key, recipe):
+        """Takes an idle pre-started kernel and schedules a refill.
+
+        Args:
+            spec_key (tuple): kernel spec key
+            recipe (tuple): kernel name, server IP, extra switches, environment, conda executable
+                and ``start_kernel()`` keyword arguments needed to start kernels for the spec
+
+        Returns:
+            GroupedKernelManager: kernel manager or None if none was available
+        """
+        dead = []
+        with self._lock:
+            if self._size == 0:
+                return None
+            self._recipes.setdefault(spec_key, recipe)
+            kms = self._idle.get(spec_key, [])
+            km = None
+            while kms and km is None:
+                candidate = kms.pop(0)
+                if candidate.is_alive():
+                    km = candidate
+                else:
+                    dead.append(candidate)
+        for _ in dead:
+            persistent_process_semaphore.release(_POOL_TAG)
+        if km is not None:
+            persistent_process_semaphore.release(_POOL_TAG)  # Claimed kernels do not hold permits.
+        self._request_refill(spec_key)
+        return km
+
+    def reclaim(self):
+        """Shuts down an idle kernel of the most pooled spec in the background and releases its permit.
+
+        Returns:
+            bool: True if a kernel was shut down, False if the pool was empty
+        """
+        with self._lock:
+            kms = max(self._idle.values(), key=len, default=[])
+            if not kms:
+                return False
+            km = kms.pop(0)
+        persistent_process_semaphore.release(_POOL_TAG)
+        threading.Thread(target=_shutdown, args=(km,), name="KernelPoolReclaim", daemon=True).start()
+        return True
+
+    def _request_refill(self, spec_key):
+        self._refill_queue.put(spec_key)
+        with self._lock:
+            if self._filler is None or not self._filler.is_alive():
+                self._filler = threading.Thread(target=self._refill, name="KernelPoolFiller", daemon=True)
+                self._filler.start()
+
+    def _refill(self):
+        """Starts kernels until each requested spec has a full pool."""
+        while True:
+            try:
+                spec_key = self._refill_queue.get(timeout=1.0)
+            except Empty:
+                with self._lock:
+                    if self._refill_queue.empty():
+                        self._filler = None
+                        return
+                continue
+            while True:
+                with self._lock:
+                    recipe = self._recipes.get(spec_key)
+                    if recipe is None or len(self._idle.get(spec_key, [])) >= self._size:
+                        break
+                if not persistent_process_semaphore.acquire(timeout=0.0, tag=_POOL_TAG):
+                    break
+                kernel_name, server_ip, extra_switches, environment, conda_exe, kwargs = recipe
+                km = GroupedKernelManager(kernel_name=kernel_name, ip=server_ip)
+                try:
+                    started = _start_kernel(km, extra_switches, environment, conda_exe, dict(kwargs)) is None
+                except Exception:  # pylint: disable=broad-except
+                    started = False
+                with self._lock:
+                    if started:
+                        # The pool may have been cleared or shrunk while the kernel was starting.
+                        pooled = spec_key in self._recipes and len(self._idle.get(spec_key, [])) < self._size
+                        if pooled:
+                            self._idle.setdefault(spec_key, []).append(km)
+                    else:
+                        pooled = False
+                        self._recipes.pop(spec_key, None)  # Spec is broken, stop pooling it.
+                if not pooled:
+                    _discard(km)
+                    break
+
+    def clear(self):
+        """Shuts down all idle kernels and forgets pooled specs."""
+        with self._lock:
+            kms = [km for idle in self._idle.values() for km in idle]
+            self._idle.clear()
+            self._recipes.clear()
+        for km in kms:
+            _discard(km)
+
+    def n_idle(self):
+        """Returns the number of idle pre-started kernels."""
+        with self._lock:
+            return sum(len(kms) for kms in self._idle.values())
+
+
+def _shutdown(km):
+    """Shuts down a kernel if it is alive.
+
+    Args:
+        km (GroupedKernelManager): kernel manager
+
+    Returns:
+        bool: True if the kernel was shut down, False if it was not alive
+    """
+    if km.is_alive():
+        km.shutdown_kernel(now=True)
+        return True
+    return False
+
+
+def _discard(km):
+    """Shuts down a kernel that was started for the pool and releases its permit.
+
+    Args:
+        km (GroupedKernelManager): kernel manager
+    """
+    try:
+        _shutdown(km)
+    finally:
+        persistent_process_semaphore.release(_POOL_TAG)
+
+
+def _spec_key(kernel_name, server_ip, extra_switches, environment, conda_exe, kwargs):
+    """Returns a key identifying kernels that can be started with given arguments interchangeably."""
+    start_options = tuple(
+        sorted((name, repr(value)) for name, value in kwargs.items() if name not in ("stdout", "stderr"))
+    )
+    return kernel_name, server_ip, tuple(extra_switches or ()), environment, conda_exe, start_options
+
+
+def _discards_output(kwargs):
+    """Checks that start options send kernel's standard output and error nowhere, as pooled kernels do."""
+    for name in ("stdout", "stderr"):
+        stream = kwargs.get(name)
+        if stream is not subprocess.DEVNULL and getattr(stream, "name", None) != os.devnull:
+            return False
+    return True
+
+
+class _KernelManagerFactory(metaclass=Singleton):
+    _registry = _KernelRegistry()
+    _pool = _KernelPool()
+    _prewarm_lock = threading.Lock()
+    _prewarming = {}
+    """Maps (kernel name, group id) pairs to events that get set when pre-warming a kernel for them has finished."""
+    _prewarmed = {}
+    """Maps keys of pre-warmed kernel managers that no execution has taken over yet to their acquisition tags."""
+
+    def configure_pool(self, size):
+        """Sets the number of pre-started idle kernels to keep per kernel spec.
+
+        Args:
+            size (int): pool size per kernel spec; 0 disables the pool
+        """
+        self._pool.configure(size)
+
     def new_kernel_manager(self, kernel_name, group_id, logger, extra_switches=None, environment="", **kwargs):
         """Creates a new kernel manager for given kernel and group id if none exists.
         Starts the kernel if not started, and returns it.
@@ -95,52 +422,121 @@ class _KernelManagerFactory(metaclass=Singleton):
         Returns:
             KernelManager
         """
-        server_ip = kwargs.pop("server_ip", "")
         filter_id = logger.msg_kernel_execution.filter_id
-        km = self._make_kernel_manager(kernel_name, group_id, server_ip, filter_id)
+        with self._prewarm_lock:
+            prewarming = self._prewarming.get((kernel_name, group_id if filter_id == "" else filter_id))
+        if prewarming is not None:
+            prewarming.wait()
+        return self._new_kernel_manager(kernel_name, group_id, logger, extra_switches, environment, **kwargs)
+
+    def _new_kernel_manager(self, kernel_name, group_id, logger, extra_switches, environment, **kwargs):
+        """See :meth:`new_kernel_manager`."""
+        server_ip = kwargs.pop("server_ip", "")
         conda_exe = kwargs.pop("conda_exe", "")
-        if environment == "conda":
-            if not os.path.exists(conda_exe):
-                logger.msg_kernel_execution.emit(msg=dict(type="conda_not_found"))
-                self._kernel_managers.pop(self.get_kernel_manager_key(km))
-                return None
-            km.kernel_spec_manager = CondaKernelSpecManager(conda_exe=conda_exe)
-        msg = dict(kernel_name=kernel_name)
-        if not km.is_alive():
-            try:
-                if not km.kernel_spec:
-                    # Happens when a conda kernel spec with the requested name cannot be dynamically created
-                    # i.e. the conda environment does not exist
-                    msg["type"] = "conda_kernel_spec_not_found"
-                    logger.msg_kernel_execution.emit(msg)
-                    self._kernel_managers.pop(self.get_kernel_manager_key(km))  # Delete failed kernel manager
+        filter_id = logger.msg_kernel_execution.filter_id
+        if not filter_id == "":
+            group_id = filter_id  # Ignore group ID in case filter ID exists
+        km = self._reuse_kernel_manager(kernel_name, group_id)
+        if km is None:
+            if _discards_output(kwargs):
+                spec_key = _spec_key(kernel_name, server_ip, extra_switches, environment, conda_exe, kwargs)
+                pool_kwargs = dict(kwargs, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                recipe = kernel_name, server_ip, extra_switches, environment, conda_exe, pool_kwargs
+                km = self._pool.claim(spec_key, recipe)
+            if km is not None:
+                km.set_group_id(group_id)
+            else:
+                km = GroupedKernelManager(kernel_name=kernel_name, ip=server_ip, group_id=group_id)
+                error = _start_kernel(km, extra_switches, environment, conda_exe, kwargs)
+                if error is not None:
+                    logger.msg_kernel_execution.emit(error)
                     return None
-            except NoSuchKernel:
-                msg["type"] = "kernel_spec_not_found"
-                logger.msg_kernel_execution.emit(msg)
-                self._kernel_managers.pop(self.get_kernel_manager_key(km))
-                return None
-            # Check that kernel spec executable is referring to a file that actually exists
-            exe_path = km.kernel_spec.argv[0]
-            if not os.path.exists(exe_path) and os.path.isabs(exe_path):
-                msg["type"] = "kernel_spec_exe_not_found"
-                msg["kernel_exe_path"] = exe_path
-                logger.msg_kernel_execution.emit(msg)
-                self._kernel_managers.pop(self.get_kernel_manager_key(km))
-                return None
-            if extra_switches:
-                # Insert switches right after the julia program
-                km.kernel_spec.argv[1:1] = extra_switches
-            km.start_kernel(**kwargs)
-            key = self.get_kernel_manager_key(km)
-            if not key:
-                return None  # Logic error
-            self._key_by_connection_file[km.connection_file] = key
-        msg["type"] = "kernel_started"
-        msg["connection_file"] = km.connection_file
+            self._registry.add(km)
+        msg = dict(kernel_name=kernel_name, type="kernel_started", connection_file=km.connection_file)
         logger.msg_kernel_execution.emit(msg)
         return km
 
+    def _reuse_kernel_manager(self, kernel_name, group_id):
+        """Returns an idle kernel manager of given group if its kernel is alive.
+
+        Dead kernels found on the way are dropped from the registry.
+
+        Args:
+            kernel_name (str): The kernel
+            group_id (str): Item group that will execute using this kernel
+
+        Returns:
+            GroupedKernelManager: kernel manager or None
+        """
+        while True:
+            found = self._registry.find_idle(kernel_name, group_id)
+            if found is None:
+                return None
+            key, km = found
+            if km.is_alive():
+                self._prewarmed.pop(key, None)
+                return km
+            self._registry.pop(key)
+            self._prewarmed.pop(key, None)
+
+    def prewarm_kernel_manager(self, kernel_name, group_id, logger, extra_switches=None, environment="", **kwargs):
+        """Starts a kernel in the background ahead of the execution that is going to need it.
+
+        The kernel is left idle in the factory where :meth:`new_kernel_manager` takes it over.
+        Nothing is started if a matching idle kernel exists already
+        or no persistent process permit is available right away;
+        the permit is held only while the kernel starts.
+
+        Args:
+            kernel_name (str): The kernel
+            group_id (str): Item group that will execute using this kernel
+            logger (LoggerInterface): For logging
+            extra_switches (list, optional): List of additional switches for the kernel (i.e. Julia or Python)
+            environment (str): "conda" to launch a Conda kernel spec. "" for a regular kernel spec
+            `**kwargs`: optional. Keyword arguments passed to ``KernelManager.start_kernel()``
+
+        Returns:
+            bool: True if a new kernel was started, False otherwise
+        """
+        filter_id = logger.msg_kernel_execution.filter_id
+        if not filter_id == "":
+            group_id = filter_id  # Kernels of filtered executions are grouped by filter ID.
+        prewarm_key = kernel_name, group_id
+        with self._prewarm_lock:
+            if prewarm_key in self._prewarming or self._registry.find_idle(kernel_name, group_id) is not None:
+                return False
+            if not persistent_process_semaphore.acquire(timeout=0.0):
+                return False
+            prewarming = self._prewarming[prewarm_key] = threading.Event()
+        try:
+            km = self._new_kernel_manager(kernel_name, group_id, logger, extra_switches, environment, **kwargs)
+            if km is None:
+                return False
+            key = self._registry.key_of(km)
+            if key is None:
+                return False
+            self._prewarmed[key] = current_acquisition_tag()
+            return True
+        finally:
+            persistent_process_semaphore.release()
+            with self._prewarm_lock:
+                del self._prewarming[prewarm_key]
+            prewarming.set()
+
+    def discard_prewarmed(self, tag):
+        """Shuts down pre-warmed kernels that no execution has taken over.
+
+        Args:
+            tag (AcquisitionTag): acquisition tag that was current when the kernels were pre-warmed
+        """
+        for key, prewarm_tag in list(self._prewarmed.items()):
+            if prewarm_tag != tag:
+                continue
+            del self._prewarmed[key]
+            km = self._registry.get(key)
+            if km is not None and not km.is_busy():
+                self.shutdown_kernel_manager(km.connection_file)
+
     def get_kernel_manager_key(self, km):
         """Returns the key of the given kernel manager stored in this factory.
 
@@ -150,10 +546,7 @@ class _KernelManagerFactory(metaclass=Singleton):
         Returns:
             str: Kernel Manager's 32 character key
         """
-        for key, kernman in self._kernel_managers.items():
-            if kernman == km:
-                return key
-        return None
+        return self._registry.key_of(km)
 
     def get_kernel_manager(self, connection_file):
         """Returns a kernel manager for given connection file if any.
@@ -164,8 +557,7 @@ class _KernelManagerFactory(metaclass=Singleton):
         Returns:
             GroupedKernelManager or None
         """
-        key = self._key_by_connection_file.get(connection_file, None)
-        return self._kernel_managers.get(key, None)
+        return self._registry.get_by_connection_file(connection_file)
 
     def pop_kernel_manager(self, connection_file):
         """Returns a kernel manager for given connection file if any.
@@ -177,8 +569,7 @@ class _KernelManagerFactory(metaclass=Singleton):
         Returns:
             GroupedKernelManager or None
         """
-        key = self._key_by_connection_file.pop(connection_file, None)
-        return self._kernel_managers.pop(key, None)
+        return self._registry.pop_by_connection_file(connection_file)
 
     def shutdown_kernel_manager(self, connection_file):
         """Pops a kernel manager from factory and shuts it down.
@@ -192,10 +583,7 @@ class _KernelManagerFactory(metaclass=Singleton):
         km = self.pop_kernel_manager(connection_file)
         if not km:
             return False
-        if km.is_alive():
-            km.shutdown_kernel(now=True)
-            return True
-        return False
+        return _shutdown(km)
 
     def restart_kernel_manager(self, connection_file):
         """Restarts kernel manager.
@@ -215,19 +603,21 @@ class _KernelManagerFactory(metaclass=Singleton):
         return False
 
     def kill_kernel_managers(self):
-        """Shuts down all kernel managers stored in the factory."""
-        while True:
-            try:
-                key, km = self._kernel_managers.popitem()
-                if km.is_alive():
-                    km.shutdown_kernel(now=True)
-            except KeyError:
-                break
-        self._key_by_connection_file.clear()
+        """Shuts down all kernel managers stored in the factory as well as pre-started idle kernels."""
+        for key in self._registry.keys():
+            km = self._registry.pop(key)
+            if km is not None:
+                _shutdown(km)
+        self._prewarmed.clear()
+        self._pool.clear()
 
     def n_kernel_managers(self):
         """Returns the number of open kernel managers stored in the factory."""
-        return len(self._kernel_managers)
+        return len(self._registry)
+
+    def n_pooled_kernels(self):
+        """Returns the number of pre-started idle kernels that no group has claimed yet."""
+        return self._pool.n_idle()
 
 
 _kernel_manager_factory = _KernelManagerFactory()
@@ -249,6 +639,30 @@ def kill_all_kernel_managers():
     _kernel_manager_factory.kill_kernel_managers()
 
 
+def configure_kernel_pool(size):
+    """See _KernelManagerFactory."""
+    _kernel_manager_factory.configure_pool(size)
+
+
+def prewarm_kernel_manager(kernel_name, group_id, logger, extra_switches=None, environment="", **kwargs):
+    """See _KernelManagerFactory.
+
+    Kernel's standard output and error are discarded as they are in :class:`KernelExecutionManager`
+    unless other streams are given.
+    """
+    kwargs.setdefault("stdout", subprocess.DEVNULL)
+    kwargs.setdefault("stderr", subprocess.DEVNULL)
+    kwargs.setdefault("creationflags", subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0)
+    return _kernel_manager_factory.prewarm_kernel_manager(
+        kernel_name, group_id, logger, extra_switches=extra_switches, environment=environment, **kwargs
+    )
+
+
+def discard_prewarmed_kernel_managers(tag):
+    """See _KernelManagerFactory."""
+    _kernel_manager_factory.discard_prewarmed(tag)
+
+
 def shutdown_kernel_manager(connection_file):
     return _kernel_manager_factory.shutdown_kernel_manager(connection_file)
 
@@ -296,13 +710,21 @@ class KernelExecutionManager(ExecutionManagerBase):
         self._kernel_client = self._kernel_manager.client() if self._kernel_manager is not None else None
         self._startup_timeout = startup_timeout
         self._kill_completed = kill_completed
+        self._output_limiter = None
+        self._output_coalescer = None
 
     def run_until_complete(self):
         if self._kernel_client is None:
             return -1
+        self._output_limiter = make_output_limiter(self._logger)
+        self._output_coalescer = OutputCoalescer(self._forward_output)
+        sampler = ProcessSampler(getattr(self._kernel_manager, "kernel_pid", None))
         self._kernel_client.start_channels()
         run_succeeded = self._do_run()
         self._kernel_client.stop_channels()
+        self._output_coalescer.close()
+        emit_resource_usage(self._logger, "kernel", sampler.stop())
+        self._finish_output()
         if self._kill_completed:
             conn_file = self._kernel_manager.connection_file
             shutdown_kernel_manager(conn_file)
@@ -347,9 +769,38 @@ class KernelExecutionManager(ExecutionManagerBase):
                 self._kernel_manager.set_busy(False)
         elif msg["header"]["msg_type"] == "execute_input":
             execution_count, code = msg["content"]["execution_count"], msg["content"]["code"]
+            self._output_coalescer.flush()
             self._logger.msg_kernel_execution.emit({"type": "stdin", "data": f"In [{execution_count}]: {code}"})
         elif msg["header"]["msg_type"] == "stream":
-            self._logger.msg_kernel_execution.emit({"type": msg["content"]["name"], "data": msg["content"]["text"]})
+            text = msg["content"]["text"]
+            if not self._output_limiter.admit(text, msg["content"]["name"]):
+                return
+            self._emit_suppressed_summary()
+            self._output_coalescer.add(msg["content"]["name"], text)
+
+    def _forward_output(self, stream, text):
+        """Emits coalesced stream output.
+
+        Args:
+            stream (str): stream name
+            text (str): output text
+        """
+        self._logger.msg_kernel_execution.emit({"type": stream, "data": text})
+
+    def _emit_suppressed_summary(self):
+        """Emits a warning if output has been suppressed by the output limiter."""
+        summary = self._output_limiter.take_suppressed_summary()
+        if summary is not None:
+            self._output_coalescer.flush()
+            self._logger.msg_warning.emit(summary)
+
+    def _finish_output(self):
+        """Emits a final warning and forwards the tail of output suppressed by the output limiter."""
+        summary, tail = self._output_limiter.finish()
+        if summary is not None:
+            self._logger.msg_warning.emit(summary)
+        for stream, text in tail:
+            self._logger.msg_kernel_execution.emit({"type": stream, "data": text})
 
     def stop_execution(self):
         if self._kernel_manager is not None:
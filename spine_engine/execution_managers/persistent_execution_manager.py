@@ -15,34 +15,223 @@ Contains PersistentManagerBase, PersistentExecutionManagerBase classes and subcl
 as well as some convenience functions.
 """
 
+from collections import Counter
 from dataclasses import dataclass
+from functools import partial
+import itertools
 from multiprocessing import Lock, Process
 import os
 from queue import Empty, Queue
 import signal
 import socket
-import socketserver
-from subprocess import PIPE, Popen
+import struct
+from subprocess import PIPE, Popen, TimeoutExpired
 import sys
 import threading
 import time
 from typing import Literal, TypeAlias
 import uuid
-from ..utils.execution_resources import persistent_process_semaphore
+from ..utils.execution_resources import current_acquisition_tag, persistent_process_semaphore
 from ..utils.helpers import Singleton
+from ..utils.output_limiter import make_output_limiter
+from ..utils.output_multiplexer import output_multiplexer
+from ..utils.resource_usage import ProcessSampler, current_rss, emit_resource_usage
 from .execution_manager_base import ExecutionManagerBase
 
 if sys.platform == "win32":
     import ctypes
     from subprocess import CREATE_NEW_PROCESS_GROUP, CREATE_NO_WINDOW
 
-Request: TypeAlias = Literal["add_history", "completions", "history_item", "is_complete"]
+_MAX_REAP_INTERVAL = 5.0
+"""Maximum interval in seconds between checks for idle persistent processes to evict."""
+_MIN_REAP_INTERVAL = 0.1
+"""Minimum interval in seconds between checks for idle persistent processes to evict."""
+
+Request: TypeAlias = Literal["add_history", "completions", "history_item", "is_complete", "stage_batch"]
 
 
 class PersistentIsDead(Exception):
     pass
 
 
+_FIELD_SEP = "\u001f"  # Unit separator
+_COMMAND_SEP = "\u001e"  # Record separator
+_HEADER = struct.Struct("!I")
+_EXIT_TIMEOUT = 5.0
+"""Time in seconds to wait for the persistent process to exit after its control channel has closed."""
+
+
+class _ControlChannel:
+    """Long-lived connection to the control thread of a persistent process.
+
+    Messages are frames consisting of a four-byte big-endian length followed by UTF-8 encoded fields
+    separated by the unit separator. Requests sent to the process are ``(request id, request, *args)``;
+    the process sends ``("response", request id, response)`` for each request
+    and ``("idle", token, "ok" or "error")`` when a ping command with given token has run.
+    """
+
+    POLL_INTERVAL = 0.5
+    """Interval in seconds at which waiters check if the process is still alive."""
+    CONNECT_TIMEOUT = 120.0
+    """Time in seconds the persistent process has to connect after it has been started."""
+
+    def __init__(self, connection: socket.socket):
+        """
+        Args:
+            connection: connected socket
+        """
+        self._socket = connection
+        self._send_lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        self._waiters: dict[tuple[str, str], Queue] = {}
+        self._waiters_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._read_frames, daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def accept(cls, listener: socket.socket, process: Popen) -> "_ControlChannel | None":
+        """Waits for the persistent process to connect.
+
+        Args:
+            listener: listening socket
+            process: persistent process
+
+        Returns:
+            control channel or None if the process died or did not connect in time
+        """
+        listener.settimeout(cls.POLL_INTERVAL)
+        deadline = time.monotonic() + cls.CONNECT_TIMEOUT
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except socket.timeout:
+                if process.poll() is not None or time.monotonic() >= deadline:
+                    return None
+                continue
+            connection.settimeout(None)
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return cls(connection)
+
+    def expect(self, kind: str, message_id: str) -> Queue:
+        """Registers interest in a message.
+
+        Args:
+            kind: "response" or "idle"
+            message_id: request id or ping token
+
+        Returns:
+            queue that receives message's payload or None if the channel closes
+        """
+        queue = Queue()
+        with self._waiters_lock:
+            if self._closed:
+                queue.put(None)
+            else:
+                self._waiters[kind, message_id] = queue
+        return queue
+
+    def request(self, request: str, args: tuple[str, ...], receive: bool, is_alive) -> str | None:
+        """Sends a request and optionally waits for the response.
+
+        Args:
+            request: request name
+            args: request arguments
+            receive: if True, waits for and returns the response
+            is_alive (Callable): function that returns False if the process has died
+
+        Returns:
+            response or None if ``receive`` is False
+        """
+        request_id = str(next(self._request_ids))
+        queue = self.expect("response", request_id) if receive else None
+        self.send(request_id, request, *args)
+        if queue is None:
+            return None
+        response = self.wait(queue, is_alive)
+        if response is None:
+            raise PersistentIsDead()
+        return response
+
+    def send(self, *fields: str) -> None:
+        """Sends a frame.
+
+        Args:
+            *fields: frame's fields
+        """
+        data = _FIELD_SEP.join(fields).encode("UTF8")
+        try:
+            with self._send_lock:
+                self._socket.sendall(_HEADER.pack(len(data)) + data)
+        except OSError as error:
+            raise PersistentIsDead() from error
+
+    def wait(self, queue: Queue, is_alive) -> str | None:
+        """Waits for an expected message.
+
+        Args:
+            queue: queue returned by :meth:`expect`
+            is_alive (Callable): function that returns False if the process has died
+
+        Returns:
+            message's payload or None if the channel was closed or the process died
+        """
+        while True:
+            try:
+                return queue.get(timeout=self.POLL_INTERVAL)
+            except Empty:
+                if not is_alive():
+                    return None
+
+    def close(self) -> None:
+        """Closes the connection and wakes up all waiters."""
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._socket.close()
+        self._close_waiters()
+
+    def _close_waiters(self) -> None:
+        with self._waiters_lock:
+            self._closed = True
+            waiters, self._waiters = self._waiters, {}
+        for queue in waiters.values():
+            queue.put(None)
+
+    def _read_frames(self) -> None:
+        """Dispatches incoming messages to waiters."""
+        try:
+            while True:
+                try:
+                    header = self._receive_exactly(_HEADER.size)
+                    data = self._receive_exactly(_HEADER.unpack(header)[0]) if header is not None else None
+                except OSError:
+                    data = None
+                if data is None:
+                    break
+                fields = data.decode("UTF8", "replace").split(_FIELD_SEP, 2)
+                if len(fields) != 3:
+                    continue
+                kind, message_id, payload = fields
+                with self._waiters_lock:
+                    queue = self._waiters.pop((kind, message_id), None)
+                if queue is not None:
+                    queue.put(payload)
+        finally:
+            self._close_waiters()
+
+    def _receive_exactly(self, size: int) -> bytes | None:
+        chunks = []
+        while size > 0:
+            chunk = self._socket.recv(size)
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+
 class PersistentManagerBase:
     def __init__(self, args, group_id):
         """
@@ -51,11 +240,17 @@ class PersistentManagerBase:
         """
         self._args = args
         self._group_id = group_id
+        self._acquisition_tag = current_acquisition_tag()  # Semaphore gets released in another thread.
         self._server_address = None
+        self._channel = None
+        self._ping_tokens = itertools.count(1)
+        self._batch_ids = itertools.count(1)
         self._msg_queue = Queue()
         self.command_successful = False
         self._is_running_lock = Lock()
         self._is_running = True
+        self.last_used = time.monotonic()
+        """Time from :func:`time.monotonic` when the manager last started or finished running."""
         self._persistent_resources_release_lock = Lock()
         self._kwargs = dict(stdin=PIPE, stdout=PIPE, stderr=PIPE)
         if sys.platform == "win32":
@@ -75,6 +270,17 @@ class PersistentManagerBase:
     def group_id(self):
         return self._group_id
 
+    @property
+    def acquisition_tag(self):
+        """Acquisition tag of the execution that started the process."""
+        return self._acquisition_tag
+
+    @property
+    def pid(self):
+        """Process id of the persistent process or None if it is not running."""
+        persistent = self._persistent
+        return persistent.pid if persistent is not None else None
+
     @property
     def language(self):
         """Returns the underlying language for UI customization in toolbox.
@@ -92,6 +298,7 @@ class PersistentManagerBase:
         """
         with self._is_running_lock:
             self._is_running = running
+            self.last_used = time.monotonic()
 
     def is_running_until_completion(self):
         with self._is_running_lock:
@@ -121,15 +328,27 @@ class PersistentManagerBase:
         raise NotImplementedError()
 
     @staticmethod
-    def _ping_command(host, port):
-        """Returns a command in the underlying language that connects to a socket listening on given host/port,
-        and sends "ok" if no exception has been recorded.
+    def _ping_command(token):
+        """Returns a command in the underlying language that notifies the control channel that the process is idle,
+        sending given token and "ok" if no exception has been recorded.
 
         Used to synchronize with the persistent process.
 
         Args:
-            host (str)
-            port (int)
+            token (int): ping identifier
+
+        Returns:
+            str
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def _run_batch_command(batch_id):
+        """Returns a command in the underlying language that compiles and executes a batch
+        staged over the control channel.
+
+        Args:
+            batch_id (str): batch identifier
 
         Returns:
             str
@@ -137,33 +356,30 @@ class PersistentManagerBase:
         raise NotImplementedError()
 
     def _start_persistent(self):
-        """Starts the persistent process."""
-        host = "127.0.0.1"
-        with socketserver.TCPServer((host, 0), None) as s:
-            self.port = s.server_address[1]  # Let OS select a free port
-        self._server_address = host, self.port
+        """Starts the persistent process and waits for it to connect to the control channel."""
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
         self.command_successful = False
-        self._persistent = Popen(self._args + self._init_args(), **self._kwargs)
-        threading.Thread(target=self._log_stdout, daemon=True).start()
-        threading.Thread(target=self._log_stderr, daemon=True).start()
+        with socket.create_server(("127.0.0.1", 0)) as listener:
+            self._server_address = listener.getsockname()[:2]
+            self._persistent = Popen(self._args + self._init_args(), **self._kwargs)
+            output_multiplexer.add_stream(self._persistent.stdout, partial(self._log_output, "stdout"))
+            output_multiplexer.add_stream(self._persistent.stderr, partial(self._log_output, "stderr"))
+            self._channel = _ControlChannel.accept(listener, self._persistent)
+        if self._channel is None and self._persistent.poll() is None:
+            # The process is unusable without the control channel.
+            self._persistent.kill()
+            self._persistent.wait()
+
+    def _log_output(self, msg_type, line):
+        """Puts a line of output from the process into the queue (it will be consumed by issue_command()).
 
-    def _log_stdout(self):
-        """Puts stdout from the process into the queue (it will be consumed by issue_command())."""
-        try:
-            for line in iter(self._persistent.stdout.readline, b""):
-                data = line.decode("UTF8", "replace").rstrip()
-                self._msg_queue.put(dict(type="stdout", data=data))
-        except ValueError:
-            pass
-
-    def _log_stderr(self):
-        """Puts stderr from the process into the queue (it will be consumed by issue_command())."""
-        try:
-            for line in iter(self._persistent.stderr.readline, b""):
-                data = line.decode("UTF8", "replace").rstrip()
-                self._msg_queue.put(dict(type="stderr", data=data))
-        except ValueError:
-            pass
+        Args:
+            msg_type (str): "stdout" or "stderr"
+            line (str): line of output
+        """
+        self._msg_queue.put(dict(type=msg_type, data=line.rstrip()))
 
     def make_complete_command(self, cmd: str) -> str | None:
         lines = cmd.splitlines()
@@ -206,7 +422,40 @@ class PersistentManagerBase:
         cmd = self.make_complete_command(cmd)
         if cmd is None:
             return
-        t = threading.Thread(target=self._issue_command_and_wait_for_idle, args=(cmd, add_history, catch_exception))
+        yield from self._yield_messages_until_finished(
+            self._issue_command_and_wait_for_idle, cmd, add_history, catch_exception
+        )
+
+    def issue_batch(self, commands, add_history=False, catch_exception=True):
+        """Issues commands to the persistent process as a single batch and yields stdout and stderr messages.
+
+        The batch is sent over the control channel, so it costs a single round trip instead of two per command.
+        The REPL still executes the commands one by one as if they had been issued separately:
+        expression values are displayed and execution stops at the first command that raises.
+
+        Args:
+            commands (list of str): commands to execute
+            add_history (bool): whether to add the commands to history
+            catch_exception (bool): whether to catch and report exceptions in the REPL as errors
+
+        Yields:
+            dict: message
+        """
+        yield from self._yield_messages_until_finished(
+            self._issue_batch_and_wait_for_idle, commands, add_history, catch_exception
+        )
+
+    def _yield_messages_until_finished(self, target, *args):
+        """Runs target in a thread and yields messages from the queue until the command has finished.
+
+        Args:
+            target (Callable): function that issues a command and puts "command_finished" into the queue when done
+            *args: target's arguments
+
+        Yields:
+            dict: message
+        """
+        t = threading.Thread(target=target, args=args)
         t.start()
         try:
             while True:
@@ -238,6 +487,32 @@ class PersistentManagerBase:
                     self.command_successful &= self._wait()
         self._msg_queue.put({"type": "command_finished"})
 
+    def _issue_batch_and_wait_for_idle(self, commands: list[str], add_history: bool, catch_exception: bool) -> None:
+        """Stages a batch, issues the command that runs it and waits for idle.
+
+        Args:
+            commands: Commands in the batch
+            add_history: Whether to add the commands to history
+            catch_exception: whether to catch and report exceptions in the REPL as errors
+        """
+        with self._lock:
+            for cmd in commands:
+                self._msg_queue.put({"type": "stdin", "data": cmd})
+            batch_id = str(next(self._batch_ids))
+            history = "true" if add_history else "false"
+            try:
+                # The process waits for the batch to arrive, so no need to wait for a response.
+                self._communicate("stage_batch", batch_id, history, _COMMAND_SEP.join(commands), receive=False)
+            except PersistentIsDead:
+                self.command_successful = False
+            else:
+                self.command_successful = self._issue_command(
+                    self._run_batch_command(batch_id), catch_exception=catch_exception
+                )
+                if self.command_successful:
+                    self.command_successful &= self._wait()
+        self._msg_queue.put({"type": "command_finished"})
+
     def _issue_command(self, cmd: str, catch_exception: bool = True) -> bool:
         """Writes command to the process's stdin and flushes.
 
@@ -264,70 +539,35 @@ class PersistentManagerBase:
     def _wait(self) -> bool:
         """Waits for the persistent process to become idle.
 
-        This is implemented as follows:
-            1. Run a socket server on the current process that waits for a ping.
-            2. Issue a command to the persistent process that pings that server.
-        The ping command will run on the persistent process when it becomes idle and we will catch that situation
-        in the server.
+        This is implemented by issuing a ping command to the persistent process.
+        The ping command will run when the process becomes idle and notify us over the control channel.
 
         Returns:
             True if persistent process finished successfully, False otherwise
         """
-        queue = Queue()
-        thread = threading.Thread(target=self._wait_ping, args=(queue,))
-        thread.start()
-        host, port = queue.get()  # This blocks until the server is listening
-        ping = self._ping_command(host, port)
-        if not self._issue_command(ping, catch_exception=False):
-            # Ping failed because pipe is broken, i.e. kernel died
-            thread.join()
+        channel = self._channel
+        result = None
+        if channel is not None:
+            token = str(next(self._ping_tokens))
+            idle = channel.expect("idle", token)
+            if self._issue_command(self._ping_command(token), catch_exception=False):
+                result = channel.wait(idle, self.is_persistent_alive)
+        if result is None or not self.is_persistent_alive():
+            # Ping failed because pipe or channel is broken, i.e. kernel died
             self._msg_queue.put({"type": "stdout", "data": "Kernel died (×_×)"})
-            return False
-        result = queue.get()  # This blocks until the server is done
-        thread.join()
-        if not self.is_persistent_alive():
-            self._msg_queue.put({"type": "stdout", "data": "Kernel died (×_×)"})
-            if self._persistent is not None:
+            persistent = self._persistent
+            if persistent is not None:
+                try:
+                    persistent.wait(timeout=_EXIT_TIMEOUT)  # The channel closes slightly before the process exits.
+                except TimeoutExpired:
+                    pass
+            if self._persistent is not None and self._persistent.poll() is not None:
                 success = self._persistent.returncode == 0
                 self._release_persistent_resources()
                 return success
             return False
         return result == "ok"
 
-    def _wait_ping(self, queue, timeout=1):
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
-            server.settimeout(timeout)
-            host = "127.0.0.1"
-            while True:
-                with socketserver.TCPServer((host, 0), None) as s:
-                    port = s.server_address[1]
-                try:
-                    server.bind((host, port))
-                    break
-                except OSError:
-                    # OSError: [Errno 98] Address already in use
-                    time.sleep(0.02)
-            server.listen()
-            queue.put((host, port))
-            while True:
-                try:
-                    conn, _ = server.accept()
-                    break
-                except socket.timeout:
-                    if not self.is_persistent_alive():
-                        queue.put("error")
-                        return
-            conn.settimeout(timeout)
-            with conn:
-                while True:
-                    try:
-                        data = conn.recv(1024)
-                    except socket.timeout:
-                        continue
-                    queue.put(data.decode("UTF8", "replace"))
-                    if not data:
-                        break
-
     def _communicate(self, request: Request, *args, receive: bool = True) -> str | None:
         """
         Sends a request to the persistent process with the given argument.
@@ -340,30 +580,10 @@ class PersistentManagerBase:
         Returns:
             response, or None if the ``receive`` argument is False
         """
-        if not self.is_persistent_alive():
+        channel = self._channel
+        if channel is None or not self.is_persistent_alive():
             raise PersistentIsDead()
-        req_args_sep = "\u001f"  # Unit separator
-        args_sep = "\u0091"  # Private Use 1
-        args = args_sep.join(args)
-        msg = f"{request}{req_args_sep}{args}"
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            while True:
-                try:
-                    s.connect(self._server_address)
-                    break
-                except ConnectionRefusedError:
-                    if self.is_persistent_alive():
-                        time.sleep(0.02)
-                    else:
-                        raise PersistentIsDead()
-            try:
-                s.sendall(bytes(msg, "UTF8"))
-                if receive:
-                    response = s.recv(1000000)
-                    return str(response, "UTF8")
-            except ConnectionResetError:
-                raise PersistentIsDead()
-        return None
+        return channel.request(request, args, receive, self.is_persistent_alive)
 
     def get_completions(self, text: str) -> list[str]:
         """Returns a list of autocompletion options for given text.
@@ -471,7 +691,10 @@ class PersistentManagerBase:
                 except BrokenPipeError:
                     pass
                 self._persistent = None
-                persistent_process_semaphore.release()
+                if self._channel is not None:
+                    self._channel.close()
+                    self._channel = None
+                persistent_process_semaphore.release(self._acquisition_tag)
 
 
 def _send_ctrl_c(pid):
@@ -496,7 +719,7 @@ class JuliaPersistentManager(PersistentManagerBase):
         return [
             "-i",
             "-e",
-            f'include("{path}"); SpineREPL.start_server("{host}", {port})',
+            f'include("{path}"); SpineREPL.start_control_channel("{host}", {port})',
             "--color=yes",
             "--banner=yes",
             # "--threads=auto",
@@ -507,8 +730,12 @@ class JuliaPersistentManager(PersistentManagerBase):
         return f"try SpineREPL.set_exception(false); @eval {cmd} catch; SpineREPL.set_exception(true); rethrow() end"
 
     @staticmethod
-    def _ping_command(host, port):
-        return f'SpineREPL.ping("{host}", {port})'
+    def _ping_command(token):
+        return f'SpineREPL.ping("{token}")'
+
+    @staticmethod
+    def _run_batch_command(batch_id):
+        return f'SpineREPL.run_batch("{batch_id}")'
 
 
 class PythonPersistentManager(PersistentManagerBase):
@@ -525,7 +752,7 @@ class PythonPersistentManager(PersistentManagerBase):
             "-u",
             "-c",
             f"import sys; sys.ps1 = sys.ps2 = ''; sys.path.append('{path}'); "
-            f"import spine_repl; spine_repl.start_server({self._server_address})",
+            f"import spine_repl; spine_repl.start_control_channel({self._server_address})",
         ]
 
     @staticmethod
@@ -542,8 +769,12 @@ class PythonPersistentManager(PersistentManagerBase):
         return os.linesep.join(lines) + os.linesep
 
     @staticmethod
-    def _ping_command(host, port):
-        return f'spine_repl.ping("{host}", {port})'
+    def _ping_command(token):
+        return f'spine_repl.ping("{token}")'
+
+    @staticmethod
+    def _run_batch_command(batch_id):
+        return f'spine_repl.run_batch("{batch_id}")'
 
 
 class _PersistentManagerFactory(metaclass=Singleton):
@@ -558,6 +789,16 @@ class _PersistentManagerFactory(metaclass=Singleton):
     """Maps keys to associated PersistentManagerBase instances."""
     _factory_open = OpenSign()
     _idle_manager_lock = threading.Lock()
+    _idle_ttl = None
+    _memory_cap = None
+    _wanted = Counter()
+    """Counts (args, group id) pairs of callers waiting for a persistent manager."""
+    _listeners = []
+    _reaper = None
+    _prewarming = {}
+    """Maps (args, group id) pairs to events that get set when pre-warming a process for them has finished."""
+    _prewarmed = {}
+    """Maps keys of pre-warmed managers that no execution has taken over yet to their acquisition tags."""
 
     @staticmethod
     def _emit_persistent_started(logger, key, language):
@@ -574,10 +815,125 @@ class _PersistentManagerFactory(metaclass=Singleton):
     def _reuse_persistent_manager(self, idle_pms, logger, args, group_id):
         for key, pm in idle_pms:
             if pm.args == args and pm.group_id == group_id:
+                if self._prewarmed.pop(key, None) is not None:
+                    self._emit_persistent_started(logger, key, pm.language)
+                    for msg in pm.drain_queue():
+                        logger.msg_persistent_execution.emit(msg)
+                    return pm
                 logger.msg_warning.emit(f"Reusing process for group '{group_id}'")
                 self._emit_persistent_started(logger, key, pm.language)
                 return pm
 
+    def configure_pool(self, idle_ttl, memory_cap):
+        """Configures eviction of idle persistent processes.
+
+        Args:
+            idle_ttl (float, optional): seconds after which idle processes are killed; None to keep them indefinitely
+            memory_cap (int, optional): maximum total resident memory of persistent processes in bytes;
+                idle processes are killed to stay under the cap; None for no cap
+        """
+        with self._idle_manager_lock:
+            type(self)._idle_ttl = idle_ttl
+            type(self)._memory_cap = memory_cap
+            reaper = type(self)._reaper
+            if (idle_ttl is not None or memory_cap is not None) and (reaper is None or not reaper.is_alive()):
+                reaper = type(self)._reaper = threading.Thread(target=self._reap, name="PersistentReaper", daemon=True)
+                reaper.start()
+
+    def add_listener(self, listener, group=None):
+        """Adds a function that gets called with a dictionary describing each eviction.
+
+        Args:
+            listener (Callable): listener to add
+            group (str, optional): receive only evictions of processes started by this acquisition group;
+                None to receive all evictions
+        """
+        with self._idle_manager_lock:
+            self._listeners.append((listener, group))
+
+    def remove_listener(self, listener):
+        """Removes a listener.
+
+        Args:
+            listener (Callable): listener to remove
+        """
+        with self._idle_manager_lock:
+            self._listeners[:] = [(added, group) for added, group in self._listeners if added != listener]
+
+    def _reap(self):
+        """Periodically evicts expired and excess idle processes until eviction is disabled."""
+        while True:
+            with self._idle_manager_lock:
+                if self._idle_ttl is None and self._memory_cap is None:
+                    type(self)._reaper = None
+                    return
+                interval = _MAX_REAP_INTERVAL
+                if self._idle_ttl is not None:
+                    interval = max(min(self._idle_ttl, _MAX_REAP_INTERVAL), _MIN_REAP_INTERVAL)
+                self.evict_idle_managers()
+            time.sleep(interval)
+
+    def evict_idle_managers(self):
+        """Kills idle processes that have exceeded the idle TTL or the pool's memory cap.
+
+        Caller must hold the idle manager lock.
+        """
+        idle_pms = self._get_idle_persistent_managers()
+        if self._idle_ttl is not None:
+            now = time.monotonic()
+            for key, pm in list(idle_pms):
+                if now - pm.last_used > self._idle_ttl:
+                    self._evict(key, pm, "idle_ttl")
+                    idle_pms.remove((key, pm))
+        if self._memory_cap is not None:
+            rss_by_key = {key: current_rss(pm.pid) or 0 for key, pm in self.persistent_managers.items()}
+            total = sum(rss_by_key.values())
+            for key, pm in self._eviction_candidates(idle_pms):
+                if total <= self._memory_cap:
+                    break
+                self._evict(key, pm, "memory_cap")
+                total -= rss_by_key.get(key, 0)
+
+    def _eviction_candidates(self, idle_pms):
+        """Orders idle managers for eviction.
+
+        Managers that match no waiting caller go first; within each class, least recently used go first.
+
+        Args:
+            idle_pms (list of tuple): keys and idle persistent managers
+
+        Returns:
+            list of tuple: keys and managers in eviction order
+        """
+        return sorted(
+            idle_pms,
+            key=lambda item: (self._wanted[_wanted_key(item[1].args, item[1].group_id)] > 0, item[1].last_used),
+        )
+
+    def _evict(self, key, pm, reason):
+        """Kills an idle manager's process and notifies listeners; caller must hold the idle manager lock.
+
+        Args:
+            key (str): manager's key
+            pm (PersistentManagerBase): manager
+            reason (str): "lru", "idle_ttl", "memory_cap" or "unused_prewarm"
+        """
+        idle_time = time.monotonic() - pm.last_used
+        pm.kill_process()
+        del self.persistent_managers[key]
+        self._prewarmed.pop(key, None)
+        event = {
+            "type": "persistent_evicted",
+            "key": key,
+            "language": pm.language,
+            "group_id": pm.group_id,
+            "reason": reason,
+            "idle_time": idle_time,
+        }
+        for listener, group in list(self._listeners):
+            if group is None or group == pm.acquisition_tag.group:
+                listener(event)
+
     def new_persistent_manager(self, constructor, logger, args, group_id):
         """Creates a new persistent manager.
 
@@ -590,25 +946,41 @@ class _PersistentManagerFactory(metaclass=Singleton):
         Returns:
             PersistentManagerBase: persistent manager or None if factory has been closed
         """
-        while not persistent_process_semaphore.acquire(timeout=0.5):
-            if not self._factory_open:
-                return None
+        wanted_key = _wanted_key(args, group_id)
+        with self._idle_manager_lock:
+            prewarming = self._prewarming.get(wanted_key)
+        if prewarming is not None:
+            prewarming.wait()
+        with self._idle_manager_lock:
+            pm = self._reuse_persistent_manager(self._get_idle_persistent_managers(), logger, args, group_id)
+            if pm:
+                return pm
+            self._wanted[wanted_key] += 1
+        try:
+            while not persistent_process_semaphore.acquire(timeout=0.5):
+                if not self._factory_open:
+                    return None
+                with self._idle_manager_lock:
+                    idle_pms = self._get_idle_persistent_managers()
+                    # Try to reuse
+                    pm = self._reuse_persistent_manager(idle_pms, logger, args, group_id)
+                    if pm:
+                        return pm
+                    # Evict the least recently used idle pm that no one else is waiting for
+                    candidates = self._eviction_candidates(idle_pms)
+                    if candidates:
+                        self._evict(*candidates[0], "lru")
+        finally:
             with self._idle_manager_lock:
-                idle_pms = self._get_idle_persistent_managers()
-                # Try to reuse
-                pm = self._reuse_persistent_manager(idle_pms, logger, args, group_id)
-                if pm:
-                    return pm
-                # Kill an idle pm if any
-                if idle_pms:
-                    key, pm = idle_pms[0]
-                    pm.kill_process()
-                    del self.persistent_managers[key]
+                self._wanted[wanted_key] -= 1
+                if self._wanted[wanted_key] <= 0:
+                    del self._wanted[wanted_key]
         # We got permission to create a new process
         # Try to reuse one last time just in case things changed quickly
         idle_pms = self._get_idle_persistent_managers()
         pm = self._reuse_persistent_manager(idle_pms, logger, args, group_id)
         if pm:
+            persistent_process_semaphore.release()  # The reused process holds a permit already.
             return pm
         # No luck, just create the new process
         key = uuid.uuid4().hex
@@ -623,6 +995,62 @@ class _PersistentManagerFactory(metaclass=Singleton):
             logger.msg_persistent_execution.emit(msg)
         return pm
 
+    def prewarm_persistent_manager(self, constructor, args, group_id):
+        """Starts a persistent process in the background ahead of the execution that is going to need it.
+
+        The process is left idle in the pool where :meth:`new_persistent_manager` takes it over.
+        Nothing is started if the factory is closed, a matching idle process exists already
+        or no persistent process permit is available right away.
+
+        Args:
+            constructor (Callable): the persistent manager constructor
+            args (list): the arguments to launch the persistent process
+            group_id (str): Item group for sharing this persistent process
+
+        Returns:
+            bool: True if a new process was started, False otherwise
+        """
+        wanted_key = _wanted_key(args, group_id)
+        with self._idle_manager_lock:
+            if not self._factory_open or wanted_key in self._prewarming:
+                return False
+            for _, pm in self._get_idle_persistent_managers():
+                if pm.args == args and pm.group_id == group_id:
+                    return False
+            if not persistent_process_semaphore.acquire(timeout=0.0):
+                return False
+            prewarming = self._prewarming[wanted_key] = threading.Event()
+        try:
+            try:
+                pm = constructor(args, group_id)
+            except OSError:
+                persistent_process_semaphore.release()
+                return False
+            pm.set_running_until_completion(False)
+            key = uuid.uuid4().hex
+            with self._idle_manager_lock:
+                self.persistent_managers[key] = pm
+                self._prewarmed[key] = current_acquisition_tag()
+            return True
+        finally:
+            with self._idle_manager_lock:
+                del self._prewarming[wanted_key]
+            prewarming.set()
+
+    def discard_prewarmed(self, tag):
+        """Kills pre-warmed processes that no execution has taken over.
+
+        Args:
+            tag (AcquisitionTag): acquisition tag that was current when the processes were pre-warmed
+        """
+        with self._idle_manager_lock:
+            for key, prewarm_tag in list(self._prewarmed.items()):
+                pm = self.persistent_managers.get(key)
+                if pm is None:
+                    del self._prewarmed[key]
+                elif prewarm_tag == tag and not pm.is_running_until_completion():
+                    self._evict(key, pm, "unused_prewarm")
+
     def restart_persistent(self, key):
         """Restart a persistent process.
 
@@ -738,9 +1166,39 @@ class _PersistentManagerFactory(metaclass=Singleton):
         self._factory_open.value = False
 
 
+def _wanted_key(args, group_id):
+    """Returns a hashable key for given persistent process arguments and group."""
+    return tuple(args), group_id
+
+
 _persistent_manager_factory = _PersistentManagerFactory()
 
 
+def configure_persistent_pool(idle_ttl, memory_cap):
+    """See _PersistentManagerFactory."""
+    _persistent_manager_factory.configure_pool(idle_ttl, memory_cap)
+
+
+def add_persistent_pool_listener(listener, group=None):
+    """See _PersistentManagerFactory."""
+    _persistent_manager_factory.add_listener(listener, group)
+
+
+def remove_persistent_pool_listener(listener):
+    """See _PersistentManagerFactory."""
+    _persistent_manager_factory.remove_listener(listener)
+
+
+def prewarm_persistent_manager(constructor, args, group_id):
+    """See _PersistentManagerFactory."""
+    return _persistent_manager_factory.prewarm_persistent_manager(constructor, args, group_id)
+
+
+def discard_prewarmed_persistent_managers(tag):
+    """See _PersistentManagerFactory."""
+    _persistent_manager_factory.discard_prewarmed(tag)
+
+
 def restart_persistent(key):
     """See _PersistentManagerFactory."""
     yield from _persistent_manager_factory.restart_persistent(key)
@@ -816,6 +1274,7 @@ class PersistentExecutionManagerBase(ExecutionManagerBase):
             self.persistent_manager_factory, logger, args, group_id
         )
         self._kill_completed = kill_completed_processes
+        self._stopped = False
 
     @property
     def alias(self):
@@ -836,32 +1295,63 @@ class PersistentExecutionManagerBase(ExecutionManagerBase):
         if self._persistent_manager is None:
             return -1
         self._persistent_manager.set_running_until_completion(True)
+        output_limiter = make_output_limiter(self._logger)
+        sampler = ProcessSampler(self._persistent_manager.pid)
         try:
             msg = dict(type="execution_started", args=" ".join(self._args))
             self._logger.msg_persistent_execution.emit(msg)
             fmt_alias = "# Running " + self._alias.rstrip()
             self._logger.msg_persistent_execution.emit(dict(type="stdin", data=fmt_alias))
-            for cmd in self._commands:
-                try:
-                    for msg in self._persistent_manager.issue_command(cmd):
-                        if msg["type"] != "stdin":
-                            self._logger.msg_persistent_execution.emit(msg)
-                except PersistentIsDead:
-                    self.killed = True
-                    return -1
-                self.killed = not self._persistent_manager.is_persistent_alive()
-                if not self._persistent_manager.command_successful:
-                    return -1
+            try:
+                for msg in self._persistent_manager.issue_batch(self._commands):
+                    if msg["type"] == "stdin":
+                        continue
+                    if msg["type"] in ("stdout", "stderr"):
+                        if not output_limiter.admit(msg["data"], msg["type"]):
+                            continue
+                        self._emit_suppressed_summary(output_limiter)
+                    self._logger.msg_persistent_execution.emit(msg)
+            except PersistentIsDead:
+                self.killed = True
+                return -1
+            self.killed = not self._persistent_manager.is_persistent_alive()
+            if self._stopped or not self._persistent_manager.command_successful:
+                return -1
             return 0
         finally:
+            emit_resource_usage(self._logger, "persistent", sampler.stop())
+            self._finish_output(output_limiter)
             self._persistent_manager.set_running_until_completion(False)
             if self._kill_completed and not self.killed:
                 self._persistent_manager.kill_process()
                 self.killed = True
                 self._logger.msg_persistent_execution.emit({"type": "persistent_killed"})
 
+    def _emit_suppressed_summary(self, output_limiter):
+        """Emits a warning if output lines have been suppressed by the output limiter.
+
+        Args:
+            output_limiter (OutputLimiter): output limiter
+        """
+        summary = output_limiter.take_suppressed_summary()
+        if summary is not None:
+            self._logger.msg_warning.emit(summary)
+
+    def _finish_output(self, output_limiter):
+        """Emits a final warning and forwards the tail of output suppressed by the output limiter.
+
+        Args:
+            output_limiter (OutputLimiter): output limiter
+        """
+        summary, tail = output_limiter.finish()
+        if summary is not None:
+            self._logger.msg_warning.emit(summary)
+        for stream, data in tail:
+            self._logger.msg_persistent_execution.emit({"type": stream, "data": data})
+
     def stop_execution(self):
         """See base class."""
+        self._stopped = True
         if self._persistent_manager is not None:
             self._persistent_manager.interrupt_persistent()
             if self._kill_completed:
@@ -12,11 +12,20 @@
 
 """Contains the ProcessExecutionManager class."""
 
+from functools import partial
 import subprocess
 import sys
-from threading import Thread
+from threading import Event, Lock
+import time
 from ..utils.execution_resources import one_shot_process_semaphore
+from ..utils.output_limiter import make_output_limiter
+from ..utils.output_multiplexer import output_multiplexer
+from ..utils.resource_usage import emit_resource_usage, wait_for_process
 from .execution_manager_base import ExecutionManagerBase
+from .interpreter_pool import python_interpreter_pool
+
+OUTPUT_FINISH_TIMEOUT = 5.0
+"""Time in seconds to wait for remaining output after the process has exited."""
 
 
 class ProcessExecutionManager(ExecutionManagerBase):
@@ -35,21 +44,30 @@ class ProcessExecutionManager(ExecutionManagerBase):
         self._args = args
         self._workdir = workdir
         self._stopped = False
+        self._output_limiter = None
+        self._output_finished = Event()
+        self._open_stream_count = 0
+        self._output_lock = Lock()
 
     def run_until_complete(self):
         self._stopped = False
+        self._output_limiter = make_output_limiter(self._logger)
         cf = subprocess.CREATE_NO_WINDOW if sys.platform == "win32" else 0  # Don't show console when frozen
         with one_shot_process_semaphore:
             if self._stopped:
                 return 0
+            start_time = time.monotonic()
             try:
-                self._process = subprocess.Popen(
-                    [self._program] + self._args,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    cwd=self._workdir,
-                    creationflags=cf,
-                )
+                if python_interpreter_pool.can_run(self._program, self._args, self._workdir):
+                    self._process = python_interpreter_pool.start(self._program, self._args, self._workdir)
+                else:
+                    self._process = subprocess.Popen(
+                        [self._program] + self._args,
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        cwd=self._workdir,
+                        creationflags=cf,
+                    )
             except OSError as e:
                 msg = dict(type="execution_failed_to_start", error=str(e), program=self._program)
                 self._logger.msg_standard_execution.emit(msg)
@@ -58,25 +76,65 @@ class ProcessExecutionManager(ExecutionManagerBase):
             self._logger.msg_standard_execution.emit(msg)
             running = "# Running" + " ".join([self._program] + self._args)
             self._logger.msg_standard_execution.emit({"type": "stdin", "data": running})
-            Thread(target=self._log_stdout, args=(self._process.stdout,), daemon=True).start()
-            Thread(target=self._log_stderr, args=(self._process.stderr,), daemon=True).start()
-            return self._process.wait()
+            self._output_finished.clear()
+            self._open_stream_count = 2
+            for stream, stream_name in ((self._process.stdout, "stdout"), (self._process.stderr, "stderr")):
+                output_multiplexer.add_stream(
+                    stream, partial(self._log_line, stream_name), partial(self._finish_output, stream)
+                )
+            return_code, usage = wait_for_process(self._process, start_time)
+            # Child processes may keep the pipes open, so don't wait for the rest of the output indefinitely
+            self._output_finished.wait(OUTPUT_FINISH_TIMEOUT)
+            emit_resource_usage(self._logger, "process", usage)
+            return return_code
 
     def stop_execution(self):
         self._stopped = True
         if self._process is not None:
             self._process.terminate()
 
-    def _log_stdout(self, stdout):
-        for line in iter(stdout.readline, b""):
-            line = line.decode("UTF8", "replace").strip()
-            self._logger.msg_proc.emit(line)
-            self._logger.msg_standard_execution.emit({"type": "stdout", "data": line})
-        stdout.close()
+    def _emit_suppressed_summary(self):
+        """Emits a warning if output lines have been suppressed by the output limiter."""
+        summary = self._output_limiter.take_suppressed_summary()
+        if summary is not None:
+            self._logger.msg_warning.emit(summary)
 
-    def _log_stderr(self, stderr):
-        for line in iter(stderr.readline, b""):
-            line = line.decode("UTF8", "replace").strip()
+    def _emit_line(self, stream, line):
+        """Forwards a line of output to the logger.
+
+        Args:
+            stream (str): "stdout" or "stderr"
+            line (str): line of output
+        """
+        if stream == "stdout":
+            self._logger.msg_proc.emit(line)
+        else:
             self._logger.msg_proc_error.emit(line)
-            self._logger.msg_standard_execution.emit({"type": "stderr", "data": line})
-        stderr.close()
+        self._logger.msg_standard_execution.emit({"type": stream, "data": line})
+
+    def _finish_output(self, stream):
+        """Closes the stream; once both streams are closed, forwards the tail of suppressed output."""
+        stream.close()
+        with self._output_lock:
+            self._open_stream_count -= 1
+            if self._open_stream_count > 0:
+                return
+        summary, tail = self._output_limiter.finish()
+        if summary is not None:
+            self._logger.msg_warning.emit(summary)
+        for stream_name, line in tail:
+            self._emit_line(stream_name, line)
+        self._output_finished.set()
+
+    def _log_line(self, stream_name, line):
+        """Forwards a line read from the process unless the output limiter suppresses it.
+
+        Args:
+            stream_name (str): "stdout" or "stderr"
+            line (str): line of output
+        """
+        line = line.strip()
+        if not self._output_limiter.admit(line, stream_name):
+            return
+        self._emit_suppressed_summary()
+        self._emit_line(stream_name, line)
@@ -18,6 +18,12 @@ using REPL.Terminals
 using REPL.LineEdit
 
 _exception = false
+const FIELD_SEP = '\u1f'  # Unit separator
+const COMMAND_SEP = '\u1e'  # Record separator
+const BATCH_TIMEOUT = 60.0  # Time in seconds to wait for a batch to arrive over the control channel
+_channel = nothing
+_send_lock = ReentrantLock()
+_batches = Dict{String,Tuple{Bool,Vector{String}}}()
 # History related stuff. This works with julia 1.0 to 1.6 at least
 term = TTYTerminal("", stdin, IOBuffer(), stderr)
 repl = LineEditREPL(term, false)
@@ -33,12 +39,24 @@ function set_exception(value)
 	global _exception = value
 end
 
-function ping(host, port)
-	s = connect(host, port)
-    write(s, _exception ? "error" : "ok")
-    close(s)
+function _send_frame(sock, fields...)
+	data = Vector{UInt8}(join(fields, FIELD_SEP))
+	lock(_send_lock) do
+		write(sock, hton(UInt32(length(data))))
+		write(sock, data)
+		flush(sock)
+	end
+end
+
+function _receive_frame(sock)
+	size = ntoh(read(sock, UInt32))
+	split(String(read(sock, size)), FIELD_SEP)
+end
+
+function ping(token)
+	_send_frame(_channel, "idle", string(token), _exception ? "error" : "ok")
     REPL.history_reset_state(hist)
-end	
+end
 
 function completions(text)
 	text = string(text)
@@ -72,32 +90,73 @@ end
 _is_complete(expr::Expr) = (expr.head === :incomplete) ? "false" : "true"
 _is_complete(other) = "true"
 
-function start_server(host, port)
+function stage_batch(batch_id, history, parts...)
+	commands = String.(split(join(parts, FIELD_SEP), COMMAND_SEP))
+	_batches[string(batch_id)] = (history == "true", commands)
+	""
+end
+
+function run_batch(batch_id)
+	if timedwait(() -> haskey(_batches, batch_id), BATCH_TIMEOUT; pollint=0.001) !== :ok
+		error("batch $batch_id never arrived")
+	end
+	history, commands = pop!(_batches, batch_id)
+	for command in commands
+		history && add_history(command)
+		try
+			value = _include_command(command)
+			if value !== nothing && !REPL.ends_with_semicolon(command)
+				Base.invokelatest(display, value)
+			end
+		catch err
+			set_exception(true)
+			showerror(stderr, err, _user_backtrace(catch_backtrace()))
+			println(stderr)
+			return nothing
+		end
+	end
+	nothing
+end
+
+# Soft scope (Julia 1.5+) lets loops in batched commands assign globals just like typed commands
+function _include_command(command)
+	if isdefined(REPL, :softscope)
+		include_string(REPL.softscope, Main, command, "REPL")
+	else
+		include_string(Main, command, "REPL")
+	end
+end
+
+function _user_backtrace(backtrace)
+	frames = stacktrace(backtrace)
+	last = findfirst(frame -> frame.func === Symbol("top-level scope"), frames)
+	last === nothing ? frames : frames[1:last]
+end
+
+function start_control_channel(host, port)
 	handlers = Dict(
 		"completions" => completions,
 		"add_history" => add_history,
 		"history_item" => history_item,
-		"is_complete" => is_complete
+		"is_complete" => is_complete,
+		"stage_batch" => stage_batch
 	)
-	req_args_sep = '\u1f'  # Unit separator
-	args_sep = '\u91'  # Private Use 1
+	global _channel = connect(host, port)
+	Sockets.nagle(_channel, false)
 	@async begin
-		server = listen(getaddrinfo(host), port)
-		while true
-			sock = accept(server)
-			data = String(readavailable(sock))
-			request, args = split(data, req_args_sep; limit=2)
-			args = split(args, args_sep)	
-			handler = get(handlers, request, nothing)
-			if handler === nothing
-				close(sock)
-				continue
+		while isopen(_channel)
+			fields = try
+				_receive_frame(_channel)
+			catch
+				break
 			end
-			response = handler(args...)
+			request_id = fields[1]
+			handler = get(handlers, fields[2], nothing)
+			response = handler === nothing ? "" : handler(fields[3:end]...)
 			try
-				write(sock, response * "\n")
-				flush(sock)
+				_send_frame(_channel, "response", request_id, response isa AbstractString ? response : "")
 			catch
+				break
 			end
 		end
 	end
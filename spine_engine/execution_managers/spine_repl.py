@@ -10,9 +10,11 @@
 # this program. If not, see <http://www.gnu.org/licenses/>.
 ######################################################################################################################
 
+import ast
 import code
 import socket
-import socketserver
+import struct
+import sys
 import threading
 
 try:
@@ -24,31 +26,68 @@ try:
 except ModuleNotFoundError:
     readline = None
 
-
-class SpineDBServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
-    allow_reuse_address = True
-
-
-class _RequestHandler(socketserver.BaseRequestHandler):
-    def handle(self):
-        data = self.request.recv(1024).decode("UTF8")
-        req_args_sep = "\u001f"  # Unit separator
-        args_sep = "\u0091"  # Private Use 1
-        request, args = data.split(req_args_sep)
-        args = args.split(args_sep)
-        handler = {
-            "completions": completions,
-            "add_history": add_history,
-            "history_item": history_item,
-            "is_complete": is_complete,
-        }.get(request)
-        if handler is None:
-            return
-        response = handler(*args)
+_FIELD_SEP = "\u001f"  # Unit separator
+_COMMAND_SEP = "\u001e"  # Record separator
+_HEADER = struct.Struct("!I")
+_BATCH_TIMEOUT = 60.0
+"""Time in seconds to wait for a batch to arrive over the control channel."""
+_channel = None
+_send_lock = threading.Lock()
+_batches = {}
+_batches_arrived = threading.Condition()
+
+
+def _send_frame(sock, *fields):
+    """Sends a length-prefixed frame of separated fields."""
+    data = _FIELD_SEP.join(fields).encode("UTF8")
+    with _send_lock:
+        sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _receive_exactly(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _receive_frame(sock):
+    """Receives a frame and returns its fields or None if the connection was closed."""
+    header = _receive_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _receive_exactly(sock, _HEADER.unpack(header)[0])
+    if data is None:
+        return None
+    return data.decode("UTF8").split(_FIELD_SEP)
+
+
+def _serve_requests(sock):
+    handlers = {
+        "completions": completions,
+        "add_history": add_history,
+        "history_item": history_item,
+        "is_complete": is_complete,
+        "stage_batch": stage_batch,
+    }
+    while True:
         try:
-            self.request.sendall(bytes(response, "UTF8"))
-        except:
-            pass
+            fields = _receive_frame(sock)
+        except OSError:
+            break
+        if fields is None:
+            break
+        request_id, request, *args = fields
+        handler = handlers.get(request)
+        response = handler(*args) if handler is not None else None
+        try:
+            _send_frame(sock, "response", request_id, response or "")
+        except OSError:
+            break
 
 
 def completions(text):
@@ -91,13 +130,59 @@ def is_complete(cmd):
     return "true"
 
 
-def start_server(address):
+def stage_batch(batch_id, history, *parts):
+    """Stores batch commands until :func:`run_batch` executes them.
+
+    Args:
+        batch_id (str): batch identifier
+        history (str): "true" if commands should be added to history, "false" otherwise
+        *parts (str): commands separated by record separators and split at field separators
+    """
+    with _batches_arrived:
+        _batches[batch_id] = history == "true", _FIELD_SEP.join(parts).split(_COMMAND_SEP)
+        _batches_arrived.notify_all()
+
+
+def run_batch(batch_id):
+    """Executes staged commands one by one in the interactive namespace like the REPL would.
+
+    Values of expression statements are displayed.
+    Execution stops at the first command that raises; its traceback is printed without this function's frames.
+
+    Args:
+        batch_id (str): batch identifier
     """
+    with _batches_arrived:
+        if not _batches_arrived.wait_for(lambda: batch_id in _batches, timeout=_BATCH_TIMEOUT):
+            raise RuntimeError(f"batch {batch_id} never arrived")
+        history, commands = _batches.pop(batch_id)
+    namespace = vars(sys.modules["__main__"])
+    for command in commands:
+        if history:
+            add_history(command)
+        try:
+            for statement in ast.parse(command, "<stdin>").body:
+                code_object = compile(ast.Interactive(body=[statement]), "<stdin>", "single")
+                exec(code_object, namespace)  # pylint: disable=exec-used
+        except SystemExit:
+            raise
+        except BaseException as error:  # pylint: disable=broad-except
+            set_exception(True)
+            traceback = None if isinstance(error, SyntaxError) else error.__traceback__.tb_next
+            sys.excepthook(type(error), error.with_traceback(traceback), traceback)
+            return
+
+
+def start_control_channel(address):
+    """Connects to the engine and starts serving its requests.
+
     Args:
-        address (tuple(str,int)): Server address
+        address (tuple(str,int)): engine's control channel address
     """
-    server = SpineDBServer(address, _RequestHandler)
-    server_thread = threading.Thread(target=server.serve_forever)
+    global _channel  # pylint: disable=global-statement
+    _channel = socket.create_connection(address)
+    _channel.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    server_thread = threading.Thread(target=_serve_requests, args=(_channel,))
     server_thread.daemon = True
     server_thread.start()
 
@@ -109,9 +194,8 @@ def set_exception(value):
     _exception[0] = value
 
 
-def ping(host, port):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.connect((host, port))
-        s.sendall(b"error" if _exception[0] else b"ok")
+def ping(token):
+    """Notifies the engine that the command identified by token has finished."""
+    _send_frame(_channel, "idle", str(token), "error" if _exception[0] else "ok")
     global _history_offset  # pylint: disable=global-statement
     _history_offset = -1
@@ -12,7 +12,7 @@
 """Provides connection classes for linking project items."""
 
 from __future__ import annotations
-from collections.abc import Iterable
+from collections.abc import Collection, Iterable
 from contextlib import ExitStack
 from dataclasses import asdict, dataclass, field
 from multiprocessing import Lock
@@ -173,8 +173,8 @@ class ConnectionBase:
             resources: destination item's resources
         """
 
-    def make_logger(self, queue: Queue) -> None:
-        self._logger = QueueLogger(queue, self.name, None, None)
+    def make_logger(self, queue: Queue, event_types: Collection[str] | None = None) -> None:
+        self._logger = QueueLogger(queue, self.name, None, event_types=event_types)
 
     def emit_flash(self) -> None:
         self._logger.flash.emit()
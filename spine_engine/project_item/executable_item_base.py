@@ -91,6 +91,15 @@ class ExecutableItemBase:
         """
         return True
 
+    def prewarm(self):
+        """Starts persistent processes or kernels this item is going to execute in, ahead of execution.
+
+        The engine calls this in a background thread while upstream items are running
+        if pre-warming has been enabled in settings.
+        Subclasses can implement this method using e.g. ``prewarm_persistent_manager()``
+        or ``prewarm_kernel_manager()``; the default implementation does nothing.
+        """
+
     def update(self, forward_resources, backward_resources):
         """Executes tasks that should be done before going into a next iteration of the loop."""
         return True
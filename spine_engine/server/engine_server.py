@@ -22,13 +22,18 @@ from typing import Literal, TypeAlias
 import uuid
 import zmq
 from zmq.auth.thread import ThreadAuthenticator
+from spine_engine.server.execution_queue import ExecutionQueue
 from spine_engine.server.persistent_execution_service import PersistentExecutionService
 from spine_engine.server.ping_service import PingService
+from spine_engine.server.project_assembler_service import ProjectAssemblerService
 from spine_engine.server.project_extractor_service import ProjectExtractorService
 from spine_engine.server.project_remover_service import ProjectRemoverService
 from spine_engine.server.project_retriever_service import ProjectRetrieverService
-from spine_engine.server.remote_execution_service import RemoteExecutionService
+from spine_engine.server.remote_execution_service import FILE_TRANSFER_VERSION, RemoteExecutionService
 from spine_engine.server.request import Request
+from spine_engine.server.upload_chunk_service import UploadChunkService
+from spine_engine.server.util.blob_store import BlobStore
+from spine_engine.server.util.chunked_upload import ChunkedUploads, UploadError
 from spine_engine.server.util.server_message import ServerMessage
 
 
@@ -43,13 +48,22 @@ Protocol: TypeAlias = Literal["tcp"]
 class EngineServer(threading.Thread):
     """A server for receiving execution requests from Spine Toolbox."""
 
-    def __init__(self, protocol: Protocol, port: int, sec_model: ServerSecurityModel, sec_folder: str):
+    def __init__(
+        self,
+        protocol: Protocol,
+        port: int,
+        sec_model: ServerSecurityModel,
+        sec_folder: str,
+        max_executions: int | None = None,
+    ):
         """
         Args:
             protocol: Protocol to be used by the server.
             port: Port to bind the server to
             sec_model: Security model state
             sec_folder: Folder, where security files have been stored.
+            max_executions: Maximum number of concurrent DAG executions; defaults to the number of CPUs.
+                Further execution requests wait in a queue.
         """
         super().__init__(target=self.serve, name="EngineServerThread")
         if sec_model == ServerSecurityModel.NONE:
@@ -78,6 +92,9 @@ class EngineServer(threading.Thread):
         self.ctrl_msg_sender = self._zmq_context.socket(zmq.PAIR)
         self.ctrl_msg_sender.bind("inproc://ctrl_msg")  # inproc:// transport requires a bind() before connect()
         self.persistent_exec_mngrs = dict()
+        self._chunked_uploads: ChunkedUploads | None = None
+        self._project_blob_store: BlobStore | None = None
+        self._execution_queue = ExecutionQueue(max_executions if max_executions is not None else os.cpu_count() or 1)
         self.start()  # Start serving
 
     def close(self) -> None:
@@ -131,10 +148,51 @@ class EngineServer(threading.Thread):
                     print(f"{request.cmd().upper()} request from client {request.connection_id()}")
                     job_id = uuid.uuid4().hex  # Job Id for execution worker
                     if request.cmd() == "ping":
-                        worker = PingService(self._zmq_context, request, job_id)
-                    elif request.cmd() == "prepare_execution":
+                        PingService.respond(frontend, request)
+                        continue
+                    if request.cmd() == "prepare_execution":
                         worker = ProjectExtractorService(self._zmq_context, request, job_id)
+                    elif request.cmd() == "begin_upload":
+                        self._handle_upload_request(frontend, request)
+                        continue
+                    elif request.cmd() == "upload_chunk":
+                        worker = UploadChunkService(self._zmq_context, request, job_id, self._uploads())
+                    elif request.cmd() in ("sync_manifest", "upload_blobs"):
+                        self._handle_blob_request(frontend, request)
+                        continue
+                    elif request.cmd() == "assemble_project":
+                        worker = ProjectAssemblerService(self._zmq_context, request, job_id, self._blob_store())
+                    elif request.cmd() == "finish_upload":
+                        try:
+                            # The extractor verifies the checksum of the whole file in its own thread.
+                            upload = self._uploads().finish(request.request_id())
+                        except UploadError as e:
+                            request.send_response(frontend, ("upload_failed", str(e), e.offset))
+                            continue
+                        worker = ProjectExtractorService(
+                            self._zmq_context, request, job_id, upload=upload, uploads=self._uploads()
+                        )
                     elif request.cmd() == "start_execution":
+                        engine_data = request.data()
+                        priority = engine_data.pop("priority", 0) if isinstance(engine_data, dict) else 0
+                        if not isinstance(priority, int) or isinstance(priority, bool):
+                            msg = f"Starting DAG execution failed. Priority must be an integer, not {priority!r}."
+                            self.send_init_failed_reply(frontend, request.connection_id(), msg)
+                            continue
+                        file_transfer_version = (
+                            engine_data.pop("file_transfer_version", 1) if isinstance(engine_data, dict) else 1
+                        )
+                        if (
+                            not isinstance(file_transfer_version, int)
+                            or isinstance(file_transfer_version, bool)
+                            or not 1 <= file_transfer_version <= FILE_TRANSFER_VERSION
+                        ):
+                            msg = (
+                                f"Starting DAG execution failed. Unsupported file transfer version "
+                                f"{file_transfer_version!r}, server supports versions 1 to {FILE_TRANSFER_VERSION}."
+                            )
+                            self.send_init_failed_reply(frontend, request.connection_id(), msg)
+                            continue
                         project_dir = project_dirs.get(request.request_id(), None)  # Get project dir based on job_id
                         if not project_dir:
                             print(f"Project for job_id:{request.request_id()} not found")
@@ -151,7 +209,13 @@ class EngineServer(threading.Thread):
                             project_dir,
                             persistent_exec_mngr_q,
                             self.port,
+                            file_transfer_version,
                         )
+                        workers[job_id] = worker
+                        if not self._execution_queue.submit(job_id, worker, priority):
+                            print(f"Execution slots full, job {job_id} queued")
+                            self._send_queue_positions(frontend)
+                            continue
                     elif request.cmd() == "stop_execution":
                         worker = workers.get(request.request_id(), None)  # Get DAG execution worker based on job Id
                         if not worker:
@@ -159,6 +223,12 @@ class EngineServer(threading.Thread):
                             msg = f"Stopping DAG execution failed. Worker for job_id:{request.request_id()} not found."
                             self.send_init_failed_reply(frontend, request.connection_id(), msg)
                             continue
+                        if self._execution_queue.remove(request.request_id()) is not None:
+                            del workers[request.request_id()]
+                            worker.close()
+                            request.send_response(frontend, ("server_status_msg", "DAG worker stopped"))
+                            self._send_queue_positions(frontend)
+                            continue
                         worker.stop_engine()
                         request.send_response(frontend, ("server_status_msg", "DAG worker stopped"))
                         continue
@@ -183,6 +253,9 @@ class EngineServer(threading.Thread):
                             self.send_init_failed_reply(frontend, request.connection_id(), msg)
                             continue
                         worker = ProjectRetrieverService(self._zmq_context, request, job_id, project_dir)
+                    elif request.cmd() == "project_chunk_ack":
+                        self._acknowledge_project_chunks(workers, request)
+                        continue
                     elif request.cmd() == "execute_in_persistent":
                         exec_mngr_key = request.data()[0]
                         exec_mngr = self.persistent_exec_mngrs.get(exec_mngr_key, None)
@@ -216,7 +289,7 @@ class EngineServer(threading.Thread):
                     internal_msg = json.loads(message.pop().decode("utf-8"))
                     if internal_msg[1] != "in_progress":
                         finished_worker = workers.pop(internal_msg[0])
-                        if isinstance(finished_worker, ProjectExtractorService):
+                        if isinstance(finished_worker, (ProjectExtractorService, ProjectAssemblerService)):
                             project_dirs[internal_msg[0]] = internal_msg[1]
                         if isinstance(finished_worker, RemoteExecutionService):
                             # Store refs to exec. managers
@@ -226,6 +299,11 @@ class EngineServer(threading.Thread):
                                     self.persistent_exec_mngrs[k] = v
                             except queue.Empty:
                                 pass
+                            started_workers = self._execution_queue.finish(internal_msg[0])
+                            for started_worker in started_workers:
+                                started_worker.start()
+                            if started_workers:
+                                self._send_queue_positions(frontend)
                         finished_worker.close()
                         finished_worker.join()
                     print(f"Sending msg to client {message[0]}")
@@ -233,6 +311,9 @@ class EngineServer(threading.Thread):
                 if socks.get(ctrl_msg_listener) == zmq.POLLIN:
                     print("Closing server...")
                     self.kill_persistent_exec_mngrs()
+                    for queued_worker in self._execution_queue.clear():
+                        workers.pop(queued_worker.job_id, None)
+                        queued_worker.close()
                     if len(workers) > 0:
                         print(f"WARNING: Some workers still running:{workers.keys()}")
                     break
@@ -244,6 +325,100 @@ class EngineServer(threading.Thread):
         frontend.close()
         backend.close()
 
+    def _uploads(self) -> ChunkedUploads:
+        """Returns bookkeeping of chunked project uploads."""
+        if self._chunked_uploads is None:
+            root_dir = os.path.join(ProjectExtractorService.INTERNAL_PROJECT_DIR, ".uploads")
+            self._chunked_uploads = ChunkedUploads(root_dir)
+        return self._chunked_uploads
+
+    def _blob_store(self) -> BlobStore:
+        """Returns the store of project files received through manifest synchronization."""
+        if self._project_blob_store is None:
+            root_dir = os.path.join(ProjectExtractorService.INTERNAL_PROJECT_DIR, ".blobs")
+            self._project_blob_store = BlobStore(root_dir)
+        return self._project_blob_store
+
+    def _handle_blob_request(self, socket: zmq.Socket, request: Request) -> None:
+        """Tells client which files of a project manifest the server is missing or stores uploaded files.
+
+        Args:
+            socket: Frontend socket
+            request: 'sync_manifest' or 'upload_blobs' request
+        """
+        data = request.data()
+        blob_store = self._blob_store()
+        try:
+            if request.cmd() == "sync_manifest":
+                if not isinstance(data, dict) or not isinstance(data.get("manifest"), dict):
+                    raise ValueError("Project manifest missing")
+                blob_store.prune()
+                request.send_response(socket, ("blobs_missing", blob_store.missing(data["manifest"].values())))
+                return
+            blobs = request.msg()[2:]
+            if not isinstance(data, list) or len(data) != len(blobs):
+                raise ValueError("Number of digests does not match the number of files")
+            blob_store.add(zip(data, blobs))
+            request.send_response(socket, ("blobs_stored", len(blobs)))
+        except (OSError, ValueError) as e:
+            request.send_response(socket, ("upload_failed", f"{type(e).__name__}: {e}", None))
+
+    def _handle_upload_request(self, socket: zmq.Socket, request: Request) -> None:
+        """Starts or resumes a chunked project upload.
+
+        Args:
+            socket: Frontend socket
+            request: 'begin_upload' request
+        """
+        data = request.data()
+        try:
+            if not isinstance(data, dict):
+                raise UploadError("Malformed upload request")
+            upload = self._uploads().begin(
+                data.get("project_name"),
+                data.get("file_name"),
+                data.get("size"),
+                data.get("sha256"),
+                data.get("upload_id"),
+            )
+            request.send_response(socket, ("upload_started", upload.upload_id, upload.offset()))
+        except UploadError as e:
+            request.send_response(socket, ("upload_failed", str(e), e.offset))
+        except OSError as e:
+            request.send_response(socket, ("upload_failed", f"{type(e).__name__}: {e}", None))
+
+    @staticmethod
+    def _acknowledge_project_chunks(workers: dict, request: Request) -> None:
+        """Gives the client's project retriever credit to send more chunks.
+
+        Acknowledgements that arrive after the retriever has finished are ignored.
+
+        Args:
+            workers: mapping from job id to worker
+            request: acknowledgement request
+        """
+        count = request.data()
+        if not isinstance(count, int) or isinstance(count, bool) or count <= 0:
+            print(f"Invalid chunk acknowledgement {count!r} - ignoring")
+            return
+        for worker in workers.values():
+            if (
+                isinstance(worker, ProjectRetrieverService)
+                and worker.request.request_id() == request.request_id()
+                and worker.request.connection_id() == request.connection_id()
+            ):
+                worker.acknowledge(count)
+                return
+
+    def _send_queue_positions(self, socket: zmq.Socket) -> None:
+        """Tells clients of queued executions their current positions in the execution queue.
+
+        Args:
+            socket: Frontend socket
+        """
+        for job_id, worker, position in self._execution_queue.positions():
+            worker.request.send_response(socket, ("remote_execution_queued", position, job_id))
+
     def kill_persistent_exec_mngrs(self) -> None:
         """Kills all persistent (execution) manager processes."""
         n_exec_mngrs = len(self.persistent_exec_mngrs)
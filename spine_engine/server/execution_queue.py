@@ -0,0 +1,116 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+
+"""Contains the ExecutionQueue class that limits the number of concurrent DAG executions on the server."""
+
+from __future__ import annotations
+import heapq
+import itertools
+from typing import Any
+
+
+class ExecutionQueue:
+    """Execution slots and a queue of execution jobs waiting for a free slot.
+
+    Jobs with higher priority get a slot first; jobs with equal priority get it in submission order.
+    """
+
+    def __init__(self, max_executions: int):
+        """
+        Args:
+            max_executions: number of execution slots
+        """
+        self._max_executions = max(1, max_executions)
+        self._running = set()
+        self._waiting = []
+        self._counter = itertools.count()
+
+    @property
+    def max_executions(self) -> int:
+        return self._max_executions
+
+    def n_running(self) -> int:
+        """Returns the number of jobs holding a slot."""
+        return len(self._running)
+
+    def n_waiting(self) -> int:
+        """Returns the number of jobs waiting for a slot."""
+        return len(self._waiting)
+
+    def submit(self, job_id: str, worker: Any, priority: int = 0) -> bool:
+        """Gives job a slot if one is free, otherwise puts it in the queue.
+
+        Args:
+            job_id: job id
+            worker: worker that executes the job
+            priority: job priority; larger numbers get a slot first
+
+        Returns:
+            True if the job got a slot and its worker should be started, False if it was queued
+        """
+        if len(self._running) < self._max_executions and not self._waiting:
+            self._running.add(job_id)
+            return True
+        heapq.heappush(self._waiting, (-priority, next(self._counter), job_id, worker))
+        return False
+
+    def finish(self, job_id: str) -> list[Any]:
+        """Frees the slot of a finished job and hands free slots to waiting jobs.
+
+        Args:
+            job_id: id of finished job
+
+        Returns:
+            workers that got a slot and should be started
+        """
+        self._running.discard(job_id)
+        started = []
+        while self._waiting and len(self._running) < self._max_executions:
+            _, _, next_job_id, worker = heapq.heappop(self._waiting)
+            self._running.add(next_job_id)
+            started.append(worker)
+        return started
+
+    def remove(self, job_id: str) -> Any | None:
+        """Removes a waiting job from the queue.
+
+        Args:
+            job_id: job id
+
+        Returns:
+            removed job's worker or None if the job was not waiting
+        """
+        for i, entry in enumerate(self._waiting):
+            if entry[2] == job_id:
+                del self._waiting[i]
+                heapq.heapify(self._waiting)
+                return entry[3]
+        return None
+
+    def positions(self) -> list[tuple[str, Any, int]]:
+        """Returns waiting jobs with their 1-based positions in the queue.
+
+        Returns:
+            job id, worker and position for each waiting job in the order they will get a slot
+        """
+        return [(entry[2], entry[3], position) for position, entry in enumerate(sorted(self._waiting), start=1)]
+
+    def clear(self) -> list[Any]:
+        """Empties the queue.
+
+        Returns:
+            workers of the jobs that were waiting
+        """
+        workers = [entry[3] for entry in self._waiting]
+        self._waiting.clear()
+        return workers
@@ -38,8 +38,17 @@ class PingService(threading.Thread, ServiceBase):
     def run(self):
         """Replies to a ping command."""
         self.worker_socket.connect("inproc://backend")
-        reply_msg = ServerMessage("ping", self.request.request_id(), "", None)
         internal_msg = json.dumps((self.job_id, "completed"))
-        conn_id = self.request.connection_id()
-        rep = reply_msg.to_bytes()
-        self.request.send_multipart_reply(self.worker_socket, conn_id, rep, internal_msg)
+        self.respond(self.worker_socket, self.request, internal_msg)
+
+    @staticmethod
+    def respond(socket, request, internal_msg=None):
+        """Sends a ping reply without starting a service thread.
+
+        Args:
+            socket (zmq.Socket): Socket for sending the reply
+            request (Request): Ping request
+            internal_msg (str, optional): Internal server message as JSON string
+        """
+        reply_msg = ServerMessage("ping", request.request_id(), "", None)
+        request.send_multipart_reply(socket, request.connection_id(), reply_msg.to_bytes(), internal_msg)
@@ -0,0 +1,90 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+"""
+Contains a class for assembling a project directory on server from blobs in the server's blob store.
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from spine_engine.server.project_extractor_service import ProjectExtractorService
+from spine_engine.server.service_base import ServiceBase
+from spine_engine.server.util.project_snapshot import write_snapshot
+from spine_engine.server.util.server_message import ServerMessage
+
+
+class ProjectAssemblerService(threading.Thread, ServiceBase):
+    """Class for handling 'assemble_project' requests."""
+
+    def __init__(self, context, request, job_id, blob_store):
+        """Initializes instance.
+
+        Args:
+            context (zmq.Context): Server context
+            request (Request): Client request
+            job_id (str): Worker thread Id
+            blob_store (BlobStore): Store containing the project files
+        """
+        super().__init__(name="ProjectAssemblerServiceThread")
+        ServiceBase.__init__(self, context, request, job_id)
+        self._blob_store = blob_store
+
+    def run(self):
+        """Copies the files listed in request's manifest into a new project directory
+        and sends a response back to client."""
+        self.worker_socket.connect("inproc://backend")
+        data = self.request.data()
+        if not isinstance(data, dict) or not data.get("project_name"):
+            print("Project name missing from request. Cannot create a local project directory.")
+            self.send_completed_with_error("Project name missing")
+            return
+        manifest = data.get("manifest")
+        if not isinstance(manifest, dict):
+            print("Project manifest missing from request")
+            self.send_completed_with_error("Project manifest missing")
+            return
+        local_project_dir = os.path.join(
+            ProjectExtractorService.INTERNAL_PROJECT_DIR, data["project_name"] + "__" + uuid.uuid4().hex
+        )
+        try:
+            os.makedirs(local_project_dir)
+        except OSError:
+            print(f"Creating project directory '{local_project_dir}' failed")
+            msg = f"Server failed in creating a project directory for the received project '{local_project_dir}'"
+            self.send_completed_with_error(msg)
+            return
+        print(f"Assembling {len(manifest)} files to: {local_project_dir}")
+        try:
+            self._blob_store.materialize(manifest, local_project_dir)
+        except (OSError, ValueError) as e:
+            print(f"Assembling project failed: {type(e).__name__}: {e}")
+            shutil.rmtree(local_project_dir, ignore_errors=True)
+            msg = f"{type(e).__name__}: {e}. - Assembling project failed on Server"
+            self.send_completed_with_error(msg)
+            return
+        try:
+            write_snapshot(local_project_dir)
+        except OSError as e:
+            print(f"[OSError] Recording project snapshot failed: {e}")
+        reply_msg = ServerMessage(self.request.cmd(), self.job_id, "", None)
+        internal_msg = json.dumps((self.job_id, local_project_dir))
+        self.request.send_multipart_reply(
+            self.worker_socket, self.request.connection_id(), reply_msg.to_bytes(), internal_msg
+        )
+
+    def send_completed_with_error(self, msg):
+        """Sends completed message to frontend for relaying to client when something goes wrong."""
+        error_event = "remote_execution_init_failed", msg
+        self.request.send_response(self.worker_socket, error_event, (self.job_id, "completed"))
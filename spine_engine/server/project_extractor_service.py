@@ -16,49 +16,67 @@ Contains a class for extracting a project ZIP file into a new directory on serve
 
 import json
 import os
+import shutil
 import threading
 import uuid
 import zmq  # pylint: disable=unused-import
 from spine_engine.server.service_base import ServiceBase
+from spine_engine.server.util.chunked_upload import UploadError
+from spine_engine.server.util.project_snapshot import write_snapshot
 from spine_engine.server.util.server_message import ServerMessage
 from spine_engine.server.util.zip_handler import ZipHandler
 from spine_engine.utils.helpers import get_file_size
 
 
 class ProjectExtractorService(threading.Thread, ServiceBase):
-    """Class for handling 'prepare_execution' requests."""
+    """Class for handling 'prepare_execution' and 'finish_upload' requests."""
 
     # Root directory, where all projects will be extracted and executed
     INTERNAL_PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "received_projects")
 
-    def __init__(self, context, request, job_id):
+    def __init__(self, context, request, job_id, upload=None, uploads=None):
         """Initializes instance.
 
         Args:
             context (zmq.Context): Server context
             request (Request): Client request
             job_id (str): Worker thread Id
+            upload (ProjectUpload, optional): Finished chunked upload that replaces the ZIP file in the request
+            uploads (ChunkedUploads, optional): Upload bookkeeping; required if upload is given
         """
         super(ProjectExtractorService, self).__init__(name="ProjectExtractorServiceThread")
         ServiceBase.__init__(self, context, request, job_id)
+        self._upload = upload
+        self._uploads = uploads
 
     def run(self):
         """Extracts the project into a new directory and sends a response back to client."""
         self.worker_socket.connect("inproc://backend")
-        dir_name = self.request.data()
-        file_names = self.request.filenames()
-        if not len(file_names) == 1:  # No file name included
-            print("Received msg contained no file name for the ZIP file")
-            self.send_completed_with_error("Project ZIP file name missing")
-            return
-        if not dir_name:
-            print("Project name missing from request. Cannot create a local project directory.")
-            self.send_completed_with_error("Project name missing")
-            return
-        if not self.request.zip_file():
-            print("Project ZIP file missing from request")
-            self.send_completed_with_error("Project ZIP file missing")
-            return
+        if self._upload is not None:
+            try:
+                self._uploads.verify(self._upload)
+            except UploadError as e:
+                self.request.send_response(
+                    self.worker_socket, ("upload_failed", str(e), e.offset), (self.job_id, "completed")
+                )
+                return
+            dir_name = self._upload.project_name
+            file_names = [self._upload.file_name]
+        else:
+            dir_name = self.request.data()
+            file_names = self.request.filenames()
+            if not len(file_names) == 1:  # No file name included
+                print("Received msg contained no file name for the ZIP file")
+                self.send_completed_with_error("Project ZIP file name missing")
+                return
+            if not dir_name:
+                print("Project name missing from request. Cannot create a local project directory.")
+                self.send_completed_with_error("Project name missing")
+                return
+            if not self.request.zip_file():
+                print("Project ZIP file missing from request")
+                self.send_completed_with_error("Project ZIP file missing")
+                return
         # Make a new local project directory based on project name in request
         local_project_dir = os.path.join(
             ProjectExtractorService.INTERNAL_PROJECT_DIR, dir_name + "__" + uuid.uuid4().hex
@@ -71,22 +89,34 @@ class ProjectExtractorService(threading.Thread, ServiceBase):
             msg = f"Server failed in creating a project directory for the received project '{local_project_dir}'"
             self.send_completed_with_error(msg)
             return
-        # Save the received ZIP file
         zip_path = os.path.join(local_project_dir, file_names[0])
-        try:
-            with open(zip_path, "wb") as f:
-                f.write(self.request.zip_file())
-        except Exception as e:
-            print(f"Saving the received file to '{zip_path}' failed. [{type(e).__name__}: {e}")
-            msg = f" [{type(e).__name__}] Server failed in saving the received file to '{zip_path}'"
-            self.send_completed_with_error(msg)
-            return
-        # Check that the size of received bytes and the saved ZIP file match
-        if not len(self.request.zip_file()) == os.path.getsize(zip_path):
-            print(
-                f"Error: Size mismatch in saving ZIP file. Received bytes:{len(self.request.zip_file())}. "
-                f"ZIP file size:{os.path.getsize(zip_path)}"
-            )
+        if self._upload is not None:
+            # Move the uploaded ZIP file instead of copying it
+            try:
+                shutil.move(self._upload.path, zip_path)
+            except OSError as e:
+                print(f"Moving the uploaded file to '{zip_path}' failed. [{type(e).__name__}: {e}")
+                msg = f" [{type(e).__name__}] Server failed in moving the uploaded file to '{zip_path}'"
+                self.send_completed_with_error(msg)
+                return
+            finally:
+                self._uploads.remove(self._upload)
+        else:
+            # Save the received ZIP file
+            try:
+                with open(zip_path, "wb") as f:
+                    f.write(self.request.zip_file())
+            except Exception as e:
+                print(f"Saving the received file to '{zip_path}' failed. [{type(e).__name__}: {e}")
+                msg = f" [{type(e).__name__}] Server failed in saving the received file to '{zip_path}'"
+                self.send_completed_with_error(msg)
+                return
+            # Check that the size of received bytes and the saved ZIP file match
+            if not len(self.request.zip_file()) == os.path.getsize(zip_path):
+                print(
+                    f"Error: Size mismatch in saving ZIP file. Received bytes:{len(self.request.zip_file())}. "
+                    f"ZIP file size:{os.path.getsize(zip_path)}"
+                )
         # Extract the saved file
         print(f"Extracting {file_names[0]} [{get_file_size(os.path.getsize(zip_path))}] to: {local_project_dir}")
         try:
@@ -101,6 +131,10 @@ class ProjectExtractorService(threading.Thread, ServiceBase):
             os.remove(zip_path)
         except OSError:
             print(f"[OSError] File: {zip_path} was not removed")
+        try:
+            write_snapshot(local_project_dir)
+        except OSError as e:
+            print(f"[OSError] Recording project snapshot failed: {e}")
         reply_msg = ServerMessage(self.request.cmd(), self.job_id, "", None)
         internal_msg = json.dumps((self.job_id, local_project_dir))
         self.request.send_multipart_reply(
@@ -19,6 +19,7 @@ import shutil
 import threading
 import zmq  # pylint: disable=unused-import
 from spine_engine.server.service_base import ServiceBase
+from spine_engine.server.util.project_snapshot import remove_snapshot
 
 
 class ProjectRemoverService(threading.Thread, ServiceBase):
@@ -41,6 +42,7 @@ class ProjectRemoverService(threading.Thread, ServiceBase):
         """Removes a used project directory from server."""
         self.worker_socket.connect("inproc://backend")
         int_msg = (self.job_id, "completed")
+        remove_snapshot(self.project_dir)
         if not os.path.isdir(self.project_dir):
             print(f"Project dir {self.project_dir} has been removed already.")
             self.request.send_response(self.worker_socket, ("server_event", "ok"), int_msg)
@@ -16,16 +16,82 @@ Contains a class for sending a finished project back to client.
 
 import json
 import os
-import shutil
 import threading
+import zipfile
 import zmq  # pylint: disable=unused-import
 from spine_engine.server.service_base import ServiceBase
+from spine_engine.server.util.project_snapshot import changed_files
 from spine_engine.server.util.server_message import ServerMessage
 from spine_engine.utils.helpers import get_file_size
 
+RETRIEVE_CHUNK_SIZE = 1024 * 1024
+"""Size of the ZIP chunks sent to client."""
+RETRIEVE_WINDOW = 8
+"""Number of chunks sent before the service waits for the client to acknowledge them."""
+RETRIEVE_ACK_TIMEOUT = 60.0
+"""Seconds to wait for an acknowledgement before giving up the transmission."""
+
+COMPRESSED_FILE_EXTENSIONS = frozenset(
+    (
+        ".7z",
+        ".bz2",
+        ".docx",
+        ".gif",
+        ".gz",
+        ".jpeg",
+        ".jpg",
+        ".mp4",
+        ".npz",
+        ".parquet",
+        ".png",
+        ".pptx",
+        ".rar",
+        ".whl",
+        ".xlsx",
+        ".xz",
+        ".zip",
+        ".zst",
+    )
+)
+"""Extensions of files that are stored in the ZIP as is because compressing them again gains nothing."""
+
+
+class _ChunkStream:
+    """Write-only file-like object that sends written data to client in chunks."""
+
+    def __init__(self, send_chunk):
+        """
+        Args:
+            send_chunk (Callable): function that sends a chunk of bytes
+        """
+        self._send_chunk = send_chunk
+        self._buffer = bytearray()
+        self.size = 0
+
+    def write(self, data):
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= RETRIEVE_CHUNK_SIZE:
+            self._send_chunk(bytes(self._buffer[:RETRIEVE_CHUNK_SIZE]))
+            del self._buffer[:RETRIEVE_CHUNK_SIZE]
+        return len(data)
+
+    def flush(self):
+        if self._buffer:
+            self._send_chunk(bytes(self._buffer))
+            self._buffer.clear()
+
 
 class ProjectRetrieverService(threading.Thread, ServiceBase):
-    """Class for transmitting a project back to client."""
+    """Class for transmitting a project back to client.
+
+    The project is zipped on the fly and sent as a sequence of 'project_chunk' replies
+    followed by a 'project_retrieved' reply that lists the deleted files.
+    At most RETRIEVE_WINDOW chunks are sent ahead of the client's 'project_chunk_ack' requests
+    so a slow client cannot make the server buffer, or the frontend drop, the whole project.
+    If request data contains a 'manifest' (relative path to SHA-256 mapping), only files that differ
+    from it are sent; with 'incremental' set, only files that changed since upload are sent.
+    """
 
     def __init__(self, context, request, job_id, project_dir):
         """Initializes instance.
@@ -39,35 +105,79 @@ class ProjectRetrieverService(threading.Thread, ServiceBase):
         super(ProjectRetrieverService, self).__init__(name="ProjectRetrieverServiceThread")
         ServiceBase.__init__(self, context, request, job_id)
         self.project_dir = project_dir
+        self._credit = RETRIEVE_WINDOW
+        self._credit_condition = threading.Condition()
+
+    def acknowledge(self, count):
+        """Lets the service send more chunks.
+
+        Args:
+            count (int): number of chunks the client has received
+        """
+        with self._credit_condition:
+            self._credit += count
+            self._credit_condition.notify()
 
     def run(self):
         """Replies to a retrieve_project command."""
         self.worker_socket.connect("inproc://backend")
-        zip_fname = "project_package"  # make_archive() adds extension (.zip)
-        dest_dir = os.path.join(self.project_dir, os.pardir)  # Parent dir of project_dir
-        zip_path = os.path.join(dest_dir, zip_fname)
+        options = self.request.data()
+        if not isinstance(options, dict):
+            options = {}
+        try:
+            if options.get("manifest") is not None:
+                files, deleted = changed_files(self.project_dir, options["manifest"])
+            elif options.get("incremental"):
+                files, deleted = changed_files(self.project_dir)
+            else:
+                files, deleted = changed_files(self.project_dir, {})
+        except OSError as e:
+            msg = f"Scanning project {self.project_dir} failed: {e}"
+            print(msg)
+            self.send_completed_with_error(msg)
+            return
+        print(f"Transmitting {len(files)} files of {self.project_dir} to client")
+        stream = _ChunkStream(self._send_chunk)
         try:
-            shutil.make_archive(zip_path, "zip", self.project_dir)
-        except OSError:
-            msg = f"Zipping project {self.project_dir} to {zip_path} failed"
+            with zipfile.ZipFile(stream, "w", allowZip64=True) as zip_file:
+                for path, relative_path in files:
+                    already_compressed = os.path.splitext(path)[1].lower() in COMPRESSED_FILE_EXTENSIONS
+                    compression = zipfile.ZIP_STORED if already_compressed else zipfile.ZIP_DEFLATED
+                    zip_file.write(path, relative_path, compress_type=compression)
+            stream.flush()
+        except TimeoutError as e:
+            msg = f"Transmitting project {self.project_dir} failed: {e}"
             print(msg)
             self.send_completed_with_error(msg)
             return
-        zip_fpath = os.path.abspath(os.path.join(self.project_dir, os.pardir, zip_fname + ".zip"))
-        if not os.path.isfile(zip_fpath):
-            msg = f"Zip file {zip_fpath} does not exist"
+        except OSError as e:
+            msg = f"Zipping project {self.project_dir} failed: {e}"
             print(msg)
             self.send_completed_with_error(msg)
             return
-        file_size = get_file_size(os.path.getsize(zip_fpath))
-        print(f"Transmitting file [{file_size}]: {zip_fpath} to client")
-        # Read file into bytes string and transmit
-        with open(zip_fpath, "rb") as f:
-            file_data = f.read()
-        reply_msg = ServerMessage(self.request.cmd(), self.request.request_id(), "", ["project_package.zip"])
+        print(f"Transmitted [{get_file_size(stream.size)}] to client")
+        info = json.dumps(("project_retrieved", {"deleted": deleted, "size": stream.size}))
+        reply_msg = ServerMessage(self.request.cmd(), self.request.request_id(), info, ["project_package.zip"])
         internal_msg = json.dumps((self.job_id, "completed"))
+        self.request.send_multipart_reply(
+            self.worker_socket, self.request.connection_id(), reply_msg.to_bytes(), internal_msg
+        )
+
+    def _send_chunk(self, chunk):
+        """Sends a chunk of the project ZIP file to client.
+
+        Args:
+            chunk (bytes): chunk
+        """
+        with self._credit_condition:
+            if not self._credit_condition.wait_for(lambda: self._credit > 0, timeout=RETRIEVE_ACK_TIMEOUT):
+                raise TimeoutError(f"client has not acknowledged chunks in {RETRIEVE_ACK_TIMEOUT} seconds")
+            self._credit -= 1
+        info = json.dumps(("project_chunk", len(chunk)))
+        reply_msg = ServerMessage(self.request.cmd(), self.request.request_id(), info, ["project_package.zip"])
+        internal_msg = json.dumps((self.job_id, "in_progress"))
         self.request.send_multipart_reply_with_file(
-            self.worker_socket, self.request.connection_id(), reply_msg.to_bytes(), file_data, internal_msg
+            self.worker_socket, self.request.connection_id(), reply_msg.to_bytes(), chunk, internal_msg
         )
 
     def send_completed_with_error(self, msg):
@@ -11,20 +11,43 @@
 ######################################################################################################################
 """Contains RemoteExecutionService class that executes a single DAG on the Spine Engine Server."""
 
+from collections import deque
+import hashlib
+import mmap
 import os
 import threading
 import zmq
 from spine_engine import SpineEngine
 from spine_engine.server.service_base import ServiceBase
-from spine_engine.server.util.event_data_converter import EventDataConverter
+from spine_engine.server.util.event_pusher import EVENT_SEND_HWM, EventPusher
 from spine_engine.utils.helpers import get_file_size
 
+OUTPUT_CHUNK_SIZE = 4 * 1024 * 1024
+"""Size of the chunks output files are sent to the client in."""
+MAX_CHUNKS_IN_FLIGHT = 4
+"""Maximum number of chunks queued in the push socket before sending waits for the client."""
+FILE_TRANSFER_VERSION = 2
+"""Latest version of the output file transfer protocol.
+
+Version 1 sends every output file as a single frame, version 2 streams it in chunks.
+Clients declare the version they support in 'start_execution' engine data.
+"""
+
 
 class RemoteExecutionService(threading.Thread, ServiceBase):
     """Executes a DAG contained in the client request. Project must
     be on server before running this service."""
 
-    def __init__(self, context, request, job_id, project_dir, persistent_exec_mngr_q, frontend_port):
+    def __init__(
+        self,
+        context,
+        request,
+        job_id,
+        project_dir,
+        persistent_exec_mngr_q,
+        frontend_port,
+        file_transfer_version=FILE_TRANSFER_VERSION,
+    ):
         """
         Args:
             context (zmq.Context): Context for this handler.
@@ -33,16 +56,19 @@ class RemoteExecutionService(threading.Thread, ServiceBase):
             project_dir (str): Absolute path to a server directory where the project has been extracted to
             persistent_exec_mngr_q (queue.Queue): Queue for storing persistent exec. managers (consumed in frontend)
             frontend_port (int): Server frontend port number
+            file_transfer_version (int): version of the output file transfer protocol the client supports
         """
         super().__init__(name="RemoteExecutionServiceThread")
         ServiceBase.__init__(self, context, request, job_id)
         self.engine = None
         self.push_socket = self.context.socket(zmq.PUSH)  # Transmits events and files directly to client
+        self.push_socket.setsockopt(zmq.SNDHWM, EVENT_SEND_HWM)
         self.local_project_dir = project_dir
         self.persistent_keys = dict()  # Mapping of item_name to a persistent execution manager key
         self.persistent_exec_mngrs = dict()  # Mapping of per. execution manager key to per. execution manager
         self.persist_q = persistent_exec_mngr_q
         self.frontend_port = frontend_port
+        self.file_transfer_version = file_transfer_version
         self.items = list()
 
     def collect_persistent_keys(self, event_type, data):
@@ -82,7 +108,7 @@ class RemoteExecutionService(threading.Thread, ServiceBase):
 
     def run(self):
         """Sends an execution started response to start execution request. Runs Spine Engine
-        and sends the events to the client using a publish socket."""
+        and sends the events to the client in batches using a push socket."""
         self.worker_socket.connect("inproc://backend")
         # Bind to specific port range, so we know which ports to open for containers
         # min_port is inclusive, max_port is exclusive
@@ -98,30 +124,37 @@ class RemoteExecutionService(threading.Thread, ServiceBase):
         )
         converted_data = self.convert_input(engine_data, self.local_project_dir)
         self.engine = SpineEngine(**converted_data)
+        event_pusher = EventPusher(self.push_socket)  # Owns push socket until closed
+        event_pusher.start()
         try:
-            while True:
-                event_type, data = self.engine.get_event()  # Get next event and associated data from spine engine
-                self.collect_persistent_keys(event_type, data)
-                self.collect_persistent_console_managers(event_type, data, self.engine._running_items)
-                self.collect_running_items(self.engine._running_items)
-                json_event = EventDataConverter.convert(event_type, data)
-                self.push_socket.send_multipart([json_event.encode("utf-8")])  # Blocks until the client pulls
-                if event_type == "dag_exec_finished":
-                    break
+            finished = False
+            while not finished:
+                for event_type, data in self.engine.get_events():
+                    self.collect_persistent_keys(event_type, data)
+                    self.collect_persistent_console_managers(event_type, data, self.engine._running_items)
+                    self.collect_running_items(self.engine._running_items)
+                    event_pusher.push(event_type, data)  # Never blocks, even if the client lags behind
+                    if event_type == "dag_exec_finished":
+                        finished = True
+                        break
         except StopIteration:
-            # Raised by SpineEngine._get_event_stream() generator if we try to get_event() after
+            # Raised by SpineEngine._get_event_stream() generator if we try to get_events() after
             # "dag_exec_finished" has been processed
             print("[DEBUG] Handled StopIteration exception")
+            event_pusher.close()
             self.send_completed()
             return
         except Exception as e:
             print(f"Execution failed: {type(e).__name__}: {e}")
-            json_error_event = EventDataConverter.convert(
+            event_pusher.push(
                 "server_execution_error", f"{type(e).__name__}: {e}. - Project execution failed on Server"
             )
-            self.push_socket.send_multipart([json_error_event.encode("utf-8")])
+            event_pusher.close()
             self.send_completed()
             return
+        event_pusher.close()
+        if event_pusher.dropped_count:
+            print(f"[DEBUG] Dropped {event_pusher.dropped_count} low-priority events of DAG [{self.job_id}]")
         if data != "USER_STOPPED":
             resources = self.collect_resources()
             self.persist_q.put(self.persistent_exec_mngrs)  # Put new persistent execution managers to queue
@@ -130,21 +163,100 @@ class RemoteExecutionService(threading.Thread, ServiceBase):
                 if type_and_pir[0] == "Data Connection":
                     continue
                 for resource in type_and_pir[1]:
-                    if resource.hasfilepath:
-                        with open(resource.path, "rb") as f:
-                            file_data = f.read()
-                        _, fname = os.path.split(resource.path)
-                        fsize = get_file_size(os.path.getsize(resource.path))
-                        self.push_socket.send_multipart([b"incoming_file", f"{fname} [{fsize}]".encode("utf-8")])
-                        path_rel_to_project_dir = os.path.relpath(resource.path, self.local_project_dir)
-                        b_fpath = path_rel_to_project_dir.replace(os.sep, "/").encode("utf-8")  # Replace "\" with "/"
-                        self.push_socket.send_multipart([b_fpath, file_data])
+                    if not resource.hasfilepath:
+                        continue
+                    if self.file_transfer_version >= 2:
+                        self.send_file(resource.path)
+                    else:
+                        self.send_whole_file(resource.path)
             self.push_socket.send_multipart([b"END", b""])
             print(f"Executing DAG [{self.job_id}] completed")
         else:
             print(f"Executing DAG [{self.job_id}] stopped")
         self.send_completed()
 
+    def send_file(self, path):
+        """Streams a file to the client in chunks.
+
+        The client receives an ``[b"incoming_file", b"<name> [<size>]"]`` notification followed by
+        ``[b"file_chunk", <relative path>, <offset>, <chunk>]`` messages and a closing
+        ``[b"file_end", <relative path>, <sha256 hex digest>]`` message.
+        Chunks are sent directly from a memory map of the file without copying and
+        at most MAX_CHUNKS_IN_FLIGHT of them wait in the socket at any time.
+
+        Args:
+            path (str): Absolute path to the file
+        """
+        size = os.path.getsize(path)
+        self._notify_incoming_file(path, size)
+        b_fpath = self._relative_path(path)
+        digest = hashlib.sha256()
+        if size > 0:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                in_flight = deque()
+                try:
+                    for offset in range(0, len(view), OUTPUT_CHUNK_SIZE):
+                        chunk = view[offset : offset + OUTPUT_CHUNK_SIZE]
+                        digest.update(chunk)
+                        if len(in_flight) == MAX_CHUNKS_IN_FLIGHT:
+                            self._release_sent_chunk(in_flight.popleft())
+                        frames = [b"file_chunk", b_fpath, str(offset).encode("ascii"), chunk]
+                        tracker = self.push_socket.send_multipart(frames, copy=False, track=True)
+                        in_flight.append((tracker, chunk))
+                finally:
+                    while in_flight:
+                        self._release_sent_chunk(in_flight.popleft())
+                    view.release()
+        self.push_socket.send_multipart([b"file_end", b_fpath, digest.hexdigest().encode("ascii")])
+
+    def send_whole_file(self, path):
+        """Sends a file to the client in a single message as file transfer version 1 clients expect.
+
+        The client receives an ``[b"incoming_file", b"<name> [<size>]"]`` notification followed by
+        a ``[<relative path>, <file contents>]`` message.
+
+        Args:
+            path (str): Absolute path to the file
+        """
+        with open(path, "rb") as f:
+            file_data = f.read()
+        self._notify_incoming_file(path, len(file_data))
+        self.push_socket.send_multipart([self._relative_path(path), file_data])
+
+    def _notify_incoming_file(self, path, size):
+        """Tells the client that a file is about to be sent.
+
+        Args:
+            path (str): Absolute path to the file
+            size (int): file size in bytes
+        """
+        _, fname = os.path.split(path)
+        self.push_socket.send_multipart([b"incoming_file", f"{fname} [{get_file_size(size)}]".encode("utf-8")])
+
+    def _relative_path(self, path):
+        """Returns file's path relative to project directory as the client expects it.
+
+        Args:
+            path (str): Absolute path to the file
+
+        Returns:
+            bytes: forward slash separated relative path
+        """
+        path_rel_to_project_dir = os.path.relpath(path, self.local_project_dir)
+        return path_rel_to_project_dir.replace(os.sep, "/").encode("utf-8")  # Replace "\" with "/"
+
+    @staticmethod
+    def _release_sent_chunk(tracked_chunk):
+        """Waits until ZMQ no longer needs a chunk and releases the chunk's buffer.
+
+        Args:
+            tracked_chunk (tuple): message tracker and chunk
+        """
+        tracker, chunk = tracked_chunk
+        tracker.wait()
+        chunk.release()
+
     def send_completed(self):
         """Sends a 'completed' message to frontend to notify that this worker has finished and it can be cleaned up.
         This message should not to be relayed to client.
@@ -15,6 +15,7 @@ Start script for Spine Engine Server.
 
 """
 
+import os
 import sys
 import time
 from spine_engine.server.engine_server import EngineServer, ServerSecurityModel
@@ -26,16 +27,18 @@ def main(argv):
         print(
             f"Spine Engine Server\n\nUsage:\n  python {argv[0]} <port>\n"
             f"or\n  python {argv[0]} <port> stonehouse <path_to_security_folder>\n"
-            f"to enable security."
+            f"to enable security.\n\nSet SPINE_ENGINE_MAX_EXECUTIONS to limit the number of concurrent executions."
         )
         return
     server = None
     try:
         port = int(argv[1])
+        max_executions = os.environ.get("SPINE_ENGINE_MAX_EXECUTIONS")
+        max_executions = int(max_executions) if max_executions else None
         if len(argv) == 2:
-            server = EngineServer("tcp", port, ServerSecurityModel.NONE, "")
+            server = EngineServer("tcp", port, ServerSecurityModel.NONE, "", max_executions)
         elif len(argv) == 4:
-            server = EngineServer("tcp", port, ServerSecurityModel.STONEHOUSE, argv[3])
+            server = EngineServer("tcp", port, ServerSecurityModel.STONEHOUSE, argv[3], max_executions)
     except Exception as e:
         print(f"{type(e).__name__}: {e}")
         return
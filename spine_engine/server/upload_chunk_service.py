@@ -0,0 +1,55 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+"""
+Contains a class for writing received chunks of project uploads to disk.
+"""
+
+import threading
+import zmq  # pylint: disable=unused-import
+from spine_engine.server.service_base import ServiceBase
+from spine_engine.server.util.chunked_upload import UploadError
+
+
+class UploadChunkService(threading.Thread, ServiceBase):
+    """Class for handling 'upload_chunk' requests."""
+
+    def __init__(self, context, request, job_id, uploads):
+        """Initializes instance.
+
+        Args:
+            context (zmq.Context): Server context
+            request (Request): Client request
+            job_id (str): Worker thread Id
+            uploads (ChunkedUploads): Upload bookkeeping
+        """
+        super(UploadChunkService, self).__init__(name="UploadChunkServiceThread")
+        ServiceBase.__init__(self, context, request, job_id)
+        self._uploads = uploads
+
+    def run(self):
+        """Checks and appends the chunk to the partial file and tells client where to continue."""
+        self.worker_socket.connect("inproc://backend")
+        data = self.request.data()
+        try:
+            if not isinstance(data, dict):
+                raise UploadError("Malformed upload request")
+            chunk = self.request.zip_file()
+            if chunk is None:
+                raise UploadError("Chunk missing from request")
+            offset = self._uploads.write_chunk(self.request.request_id(), data.get("offset"), chunk, data.get("sha256"))
+            info = ("upload_chunk_received", offset)
+        except UploadError as e:
+            info = ("upload_failed", str(e), e.offset)
+        except OSError as e:
+            info = ("upload_failed", f"{type(e).__name__}: {e}", None)
+        self.request.send_response(self.worker_socket, info, (self.job_id, "completed"))
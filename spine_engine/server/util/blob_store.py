@@ -0,0 +1,208 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+"""
+Contains a content-addressed store for project files received by the server.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+BLOB_TIMEOUT = 7 * 24 * 60 * 60
+"""Seconds since last use after which a blob is removed."""
+
+PRUNE_INTERVAL = 60 * 60
+"""Minimum number of seconds between two prunes of the store."""
+
+_INDEX_FILE = "index.json"
+
+
+def _valid_digest(digest):
+    return isinstance(digest, str) and len(digest) == 64 and all(c in "0123456789abcdef" for c in digest)
+
+
+def _checked_relative_path(path):
+    """Converts a manifest path to a native relative path refusing paths that point outside the project."""
+    if not isinstance(path, str) or not path:
+        raise ValueError("Empty path in manifest")
+    native_path = os.path.normpath(path.replace("/", os.sep))
+    if os.path.isabs(native_path) or os.path.splitdrive(native_path)[0] or native_path.split(os.sep)[0] == os.pardir:
+        raise ValueError(f"Invalid path in manifest: '{path}'")
+    return native_path
+
+
+class BlobStore:
+    """Project files stored by their SHA-256 digest.
+
+    Project directories are assembled by copying blobs, so unchanged files take no upload time.
+    Every project gets private copies because executions modify project files, databases in particular,
+    in place. The size and modification time of every blob is recorded when it is stored;
+    a blob whose file has been modified or truncated anyway no longer matches its record
+    and is reported as missing so that the client uploads it again.
+    """
+
+    def __init__(self, root_dir):
+        """
+        Args:
+            root_dir (str): Absolute path to the directory where blobs are stored
+        """
+        self._root_dir = root_dir
+        self._lock = threading.Lock()
+        self._index = None
+        self._last_prune = 0.0
+
+    def path(self, digest):
+        """Returns the absolute path to a blob.
+
+        Args:
+            digest (str): SHA-256 hex digest
+
+        Returns:
+            str: path to blob
+        """
+        return os.path.join(self._root_dir, digest[:2], digest[2:])
+
+    def missing(self, digests):
+        """Finds digests that do not have an intact blob in the store.
+
+        Args:
+            digests (Iterable of str): SHA-256 hex digests
+
+        Returns:
+            list of str: missing digests in the order they were given, without duplicates
+        """
+        with self._lock:
+            return self._missing(self._load_index(), digests)
+
+    def add(self, blobs):
+        """Stores blobs.
+
+        Args:
+            blobs (Iterable of tuple): pairs of SHA-256 hex digest and file contents
+        """
+        stored = []
+        try:
+            for digest, data in blobs:
+                if not _valid_digest(digest):
+                    raise ValueError(f"Invalid digest '{digest}'")
+                if hashlib.sha256(data).hexdigest() != digest:
+                    raise ValueError(f"Checksum mismatch in blob {digest}")
+                blob_path = self.path(digest)
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix=".tmp")
+                with os.fdopen(file_descriptor, "wb") as blob_file:
+                    blob_file.write(data)
+                os.replace(temp_path, blob_path)
+                stored.append(digest)
+        finally:
+            now = time.time()
+            with self._lock:
+                index = self._load_index()
+                for digest in stored:
+                    stat = os.stat(self.path(digest))
+                    index[digest] = [stat.st_size, stat.st_mtime_ns, now]
+                self._save_index()
+
+    def materialize(self, manifest, target_dir):
+        """Creates project files in target directory by copying blobs.
+
+        Args:
+            manifest (dict): mapping from project relative paths with forward slashes to SHA-256 hex digests
+            target_dir (str): Absolute path to project directory
+        """
+        with self._lock:
+            index = self._load_index()
+            missing = self._missing(index, manifest.values())
+            if missing:
+                raise ValueError(f"{len(missing)} files missing from blob store")
+            # Blobs are marked used before copying so prune() cannot remove them meanwhile.
+            now = time.time()
+            for digest in set(manifest.values()):
+                index[digest][2] = now
+            self._save_index()
+        for path, digest in manifest.items():
+            file_path = os.path.join(target_dir, _checked_relative_path(path))
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            try:
+                shutil.copyfile(self.path(digest), file_path)
+            except FileNotFoundError:
+                raise ValueError(f"Blob {digest} missing from blob store")
+
+    def prune(self, force=False):
+        """Removes blobs that have not been used for BLOB_TIMEOUT seconds.
+
+        Args:
+            force (bool): if True, prunes even if the store was pruned less than PRUNE_INTERVAL seconds ago
+        """
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_prune < PRUNE_INTERVAL:
+                return
+            self._last_prune = now
+            index = self._load_index()
+            for digest, (_, _, last_used) in list(index.items()):
+                if now - last_used < BLOB_TIMEOUT:
+                    continue
+                try:
+                    os.remove(self.path(digest))
+                except OSError:
+                    pass
+                del index[digest]
+            self._save_index()
+
+    def _missing(self, index, digests):
+        """See :meth:`missing`; caller must hold the lock."""
+        missing = []
+        seen = set()
+        for digest in digests:
+            if digest in seen:
+                continue
+            seen.add(digest)
+            if not _valid_digest(digest):
+                raise ValueError(f"Invalid digest '{digest}'")
+            if not self._is_intact(index, digest):
+                missing.append(digest)
+        return missing
+
+    def _is_intact(self, index, digest):
+        """Checks that blob exists and has not been modified since it was stored; caller must hold the lock."""
+        record = index.get(digest)
+        if record is None:
+            return False
+        try:
+            stat = os.stat(self.path(digest))
+        except OSError:
+            return False
+        return stat.st_size == record[0] and stat.st_mtime_ns == record[1]
+
+    def _load_index(self):
+        """Loads blob records from disk; caller must hold the lock."""
+        if self._index is None:
+            try:
+                with open(os.path.join(self._root_dir, _INDEX_FILE), encoding="utf-8") as index_file:
+                    self._index = json.load(index_file)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        """Writes blob records to disk; caller must hold the lock."""
+        os.makedirs(self._root_dir, exist_ok=True)
+        file_descriptor, temp_path = tempfile.mkstemp(dir=self._root_dir, suffix=".tmp")
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as index_file:
+            json.dump(self._index, index_file)
+        os.replace(temp_path, os.path.join(self._root_dir, _INDEX_FILE))
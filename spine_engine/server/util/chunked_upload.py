@@ -0,0 +1,247 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+"""
+Contains classes for receiving project ZIP files in chunks that are streamed directly to disk.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from spine_engine.server.util.hashing import file_digest
+
+UPLOAD_TIMEOUT = 24 * 60 * 60
+"""Seconds after the last received chunk until an unfinished upload is discarded."""
+
+_META_FILE = "upload.json"
+_PART_FILE = "upload.part"
+
+
+class UploadError(Exception):
+    """Raised when an upload request cannot be fulfilled."""
+
+    def __init__(self, msg, offset=None):
+        """
+        Args:
+            msg (str): Error message
+            offset (int, optional): Offset where the client should continue uploading
+        """
+        super().__init__(msg)
+        self.offset = offset
+
+
+class ProjectUpload:
+    """A project ZIP file being received in chunks."""
+
+    def __init__(self, upload_id, directory, project_name, file_name, size, sha256=None):
+        """
+        Args:
+            upload_id (str): Upload Id
+            directory (str): Absolute path to the directory holding the partial file
+            project_name (str): Project name
+            file_name (str): Name of the ZIP file
+            size (int): Total size of the ZIP file in bytes
+            sha256 (str, optional): Hex digest of the whole ZIP file
+        """
+        self.upload_id = upload_id
+        self.directory = directory
+        self.project_name = project_name
+        self.file_name = file_name
+        self.size = size
+        self.sha256 = sha256
+        self.lock = threading.Lock()
+        """Serializes appending chunks to the partial file."""
+
+    @property
+    def path(self):
+        """Absolute path to the partial file."""
+        return os.path.join(self.directory, _PART_FILE)
+
+    def offset(self):
+        """Returns the number of bytes received so far."""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def to_dict(self):
+        return {
+            "project_name": self.project_name,
+            "file_name": self.file_name,
+            "size": self.size,
+            "sha256": self.sha256,
+        }
+
+
+class ChunkedUploads:
+    """Bookkeeping of project uploads in progress.
+
+    Every upload gets its own directory under ``root_dir`` where chunks are appended to a partial file
+    and upload metadata is stored, so an interrupted upload can be resumed even after a server restart.
+    The methods are thread-safe. Chunks of different uploads are written concurrently.
+    """
+
+    def __init__(self, root_dir):
+        """
+        Args:
+            root_dir (str): Absolute path to the directory where uploads are stored
+        """
+        self._root_dir = root_dir
+        self._uploads = dict()
+        self._lock = threading.RLock()
+
+    def begin(self, project_name, file_name, size, sha256=None, upload_id=None):
+        """Starts a new upload or resumes an existing one.
+
+        Args:
+            project_name (str): Project name
+            file_name (str): Name of the ZIP file
+            size (int): Total size of the ZIP file in bytes
+            sha256 (str, optional): Hex digest of the whole ZIP file
+            upload_id (str, optional): Id of an upload to resume
+
+        Returns:
+            ProjectUpload: new or resumed upload
+        """
+        with self._lock:
+            return self._begin(project_name, file_name, size, sha256, upload_id)
+
+    def _begin(self, project_name, file_name, size, sha256, upload_id):
+        """See :meth:`begin`."""
+        self.discard_stale()
+        if upload_id:
+            upload = self._get(upload_id)
+            if upload.size != size or (sha256 and upload.sha256 != sha256):
+                raise UploadError(f"Upload {upload_id} was started for a different file")
+            return upload
+        if not project_name:
+            raise UploadError("Project name missing")
+        file_name = os.path.basename(file_name or "")
+        if not file_name:
+            raise UploadError("Project ZIP file name missing")
+        if not isinstance(size, int) or size < 0:
+            raise UploadError("Invalid project ZIP file size")
+        upload_id = uuid.uuid4().hex
+        directory = os.path.join(self._root_dir, upload_id)
+        upload = ProjectUpload(upload_id, directory, project_name, file_name, size, sha256)
+        os.makedirs(upload.directory)
+        with open(os.path.join(upload.directory, _META_FILE), "w", encoding="utf-8") as meta_file:
+            json.dump(upload.to_dict(), meta_file)
+        open(upload.path, "wb").close()
+        self._uploads[upload_id] = upload
+        return upload
+
+    def write_chunk(self, upload_id, offset, data, sha256):
+        """Appends a chunk to the partial file.
+
+        Args:
+            upload_id (str): Upload Id
+            offset (int): Position of the chunk in the ZIP file
+            data (bytes): Chunk
+            sha256 (str): Hex digest of the chunk
+
+        Returns:
+            int: offset of the next chunk
+        """
+        checksum_matches = hashlib.sha256(data).hexdigest() == sha256
+        with self._lock:
+            upload = self._get(upload_id)
+        with upload.lock:
+            expected_offset = upload.offset()
+            if offset != expected_offset:
+                raise UploadError(f"Expected chunk at offset {expected_offset}, got {offset}", expected_offset)
+            if not checksum_matches:
+                raise UploadError(f"Checksum mismatch in chunk at offset {offset}", expected_offset)
+            if offset + len(data) > upload.size:
+                raise UploadError(f"Chunk at offset {offset} exceeds file size {upload.size}", expected_offset)
+            with open(upload.path, "ab") as part_file:
+                part_file.write(data)
+            return offset + len(data)
+
+    def finish(self, upload_id):
+        """Checks that the whole file has been received and stops tracking the upload.
+
+        The upload's checksum is left for the caller to check with :meth:`verify`
+        and its directory for the caller to remove with :meth:`remove`.
+
+        Args:
+            upload_id (str): Upload Id
+
+        Returns:
+            ProjectUpload: finished upload
+        """
+        with self._lock:
+            upload = self._get(upload_id)
+            with upload.lock:
+                offset = upload.offset()
+            if offset != upload.size:
+                raise UploadError(f"Upload incomplete: received {offset} of {upload.size} bytes", offset)
+            self._uploads.pop(upload_id, None)
+            return upload
+
+    def verify(self, upload):
+        """Checks finished upload's checksum and removes the upload if the checksum does not match.
+
+        This reads the whole file, so it should be called from a worker thread.
+
+        Args:
+            upload (ProjectUpload): finished upload
+        """
+        if upload.sha256 and file_digest(upload.path) != upload.sha256:
+            self.remove(upload)
+            raise UploadError("Checksum mismatch in received project ZIP file")
+
+    def remove(self, upload):
+        """Removes upload's directory.
+
+        Args:
+            upload (ProjectUpload): upload
+        """
+        with self._lock:
+            self._uploads.pop(upload.upload_id, None)
+        shutil.rmtree(upload.directory, ignore_errors=True)
+
+    def discard_stale(self):
+        """Removes uploads that have not received chunks for UPLOAD_TIMEOUT seconds."""
+        if not os.path.isdir(self._root_dir):
+            return
+        deadline = time.time() - UPLOAD_TIMEOUT
+        with self._lock:
+            for upload_id in os.listdir(self._root_dir):
+                directory = os.path.join(self._root_dir, upload_id)
+                paths = [os.path.join(directory, _PART_FILE), os.path.join(directory, _META_FILE), directory]
+                try:
+                    last_modified = max(os.path.getmtime(path) for path in paths if os.path.exists(path))
+                except ValueError:
+                    continue
+                if last_modified < deadline:
+                    self._uploads.pop(upload_id, None)
+                    shutil.rmtree(directory, ignore_errors=True)
+
+    def _get(self, upload_id):
+        """Returns upload by its id loading it from disk if necessary; caller must hold the lock."""
+        upload = self._uploads.get(upload_id)
+        if upload is not None:
+            return upload
+        directory = os.path.join(self._root_dir, os.path.basename(upload_id))
+        try:
+            with open(os.path.join(directory, _META_FILE), encoding="utf-8") as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            raise UploadError(f"Upload {upload_id} not found")
+        upload = ProjectUpload(upload_id, directory, **meta)
+        self._uploads[upload_id] = upload
+        return upload
@@ -65,6 +65,31 @@ class EventDataConverter:
         fixed_event = fix_event_data((event_dict["event_type"], data))
         return fixed_event
 
+    @staticmethod
+    def join_batch(json_events):
+        """Joins events converted by convert() into a single JSON list.
+
+        Args:
+            json_events (Iterable of str): JSON strings returned by convert()
+
+        Returns:
+            str: JSON string
+        """
+        return "[" + ", ".join(json_events) + "]"
+
+    @staticmethod
+    def deconvert_batch(batch_data):
+        """Converts a bytes object created from the output of join_batch() back to event_type, data pairs.
+
+        Args:
+            batch_data (bytes): Event types and data as bytes
+
+        Returns:
+            list of tuple: Event type and data pairs
+        """
+        event_dicts = json.loads(batch_data.decode("utf-8"))
+        return [fix_event_data((event_dict["event_type"], event_dict["data"])) for event_dict in event_dicts]
+
 
 def break_event_data(event_type, data):
     """Makes values in data dictionary suitable for converting them to JSON strings.
@@ -0,0 +1,170 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""Contains EventPusher class that sends engine events to a remote client in batches."""
+
+from collections import deque
+import threading
+import zmq
+from spine_engine.server.util.event_data_converter import EventDataConverter
+from spine_engine.utils.output_limiter import DEFAULT_TAIL_LENGTH
+
+EVENT_SEND_HWM = 64
+"""High-water mark of the push socket i.e. how many messages wait in ZMQ before sending blocks."""
+MAX_BUFFERED_EVENTS = 1024
+"""Number of buffered events after which low-priority events are dropped and process output is summarized."""
+MAX_BATCH_SIZE = 256
+"""Maximum number of events sent in a single message."""
+LOW_PRIORITY_EVENT_TYPES = frozenset(("resource_usage_msg", "process_limiter_msg", "persistent_pool_msg"))
+"""Event types that may be dropped when the client cannot keep up."""
+OUTPUT_EVENT_TYPES = frozenset(
+    ("standard_execution_msg", "kernel_execution_msg", "persistent_execution_msg", "process_msg")
+)
+"""Event types whose process output is summarized when the client cannot keep up."""
+_OUTPUT_STREAMS = frozenset(("stdout", "stderr"))
+_PROCESS_MSG_TYPES = frozenset(("msg", "msg_error"))
+
+
+def _is_output(event_type, data):
+    """Checks if event carries a line of process output.
+
+    Args:
+        event_type (str): event type
+        data (dict or str): event data
+
+    Returns:
+        bool: True if event is process output, False otherwise
+    """
+    if event_type not in OUTPUT_EVENT_TYPES or not isinstance(data, dict):
+        return False
+    if event_type == "process_msg":
+        return data.get("msg_type") in _PROCESS_MSG_TYPES
+    return data.get("type") in _OUTPUT_STREAMS
+
+
+class EventPusher(threading.Thread):
+    """Sends events to the client through a push socket in a thread of its own.
+
+    Events are converted to JSON when they are pushed and buffered. Whatever has accumulated since
+    the previous send goes out as a single ``[b"events", <JSON list of events>]`` message,
+    so a lagging client receives fewer but larger messages and never blocks the caller of :meth:`push`.
+    When more than MAX_BUFFERED_EVENTS events are waiting, events with a type in
+    LOW_PRIORITY_EVENT_TYPES are dropped, and process output carried by OUTPUT_EVENT_TYPES is counted
+    instead of buffered, so the buffer cannot grow without limit whatever the executed tools print. Once the buffer has been sent or before the next event of another type,
+    the client gets a warning with the number of suppressed lines followed by the last DEFAULT_TAIL_LENGTH
+    of them. Other events are kept in the buffer.
+    If sending fails, the pusher tries to send a ``server_execution_error`` event and discards further events.
+
+    The push socket must not be used by other threads before :meth:`close` has returned.
+    """
+
+    def __init__(self, push_socket, max_buffered_events=MAX_BUFFERED_EVENTS):
+        """
+        Args:
+            push_socket (zmq.Socket): socket connected to the client
+            max_buffered_events (int): number of buffered events after which events are dropped or summarized
+        """
+        super().__init__(name="EventPusherThread", daemon=True)
+        self._push_socket = push_socket
+        self._max_buffered_events = max_buffered_events
+        self._events = deque()
+        self._suppressed_output = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self._failed = False
+        self.dropped_count = 0
+
+    def push(self, event_type, data):
+        """Queues an event for sending.
+
+        Args:
+            event_type (str): event type
+            data (dict or str): event data
+        """
+        with self._condition:
+            if self._failed:
+                return
+            buffer_full = len(self._events) >= self._max_buffered_events
+            if buffer_full and event_type in LOW_PRIORITY_EVENT_TYPES:
+                self.dropped_count += 1
+                return
+            if _is_output(event_type, data):
+                key = (event_type, data.get("item_name"), data.get("filter_id"))
+                if buffer_full or key in self._suppressed_output:
+                    # Keeps suppressing until the summary has been queued so output stays in order.
+                    suppressed = self._suppressed_output.setdefault(key, [0, deque(maxlen=DEFAULT_TAIL_LENGTH)])
+                    suppressed[0] += 1
+                    suppressed[1].append(data)
+                    return
+            elif self._suppressed_output and event_type not in LOW_PRIORITY_EVENT_TYPES:
+                self._queue_suppressed_output()
+        json_event = EventDataConverter.convert(event_type, data)
+        with self._condition:
+            if self._failed:
+                return
+            self._events.append(json_event)
+            self._condition.notify()
+
+    def close(self):
+        """Sends the remaining events and waits for the thread to finish."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self.is_alive():
+            self.join()
+
+    def run(self):
+        """Sends queued events in batches until closed."""
+        try:
+            self._send_events()
+        except Exception as e:  # pylint: disable=broad-except
+            with self._condition:
+                self._failed = True
+                self._events.clear()
+                self._suppressed_output.clear()
+            print(f"Sending events to client failed: {type(e).__name__}: {e}")
+            error = EventDataConverter.convert(
+                "server_execution_error", f"{type(e).__name__}: {e}. - Sending events to client failed on Server"
+            )
+            try:
+                self._push_socket.send_multipart(
+                    [b"events", EventDataConverter.join_batch([error]).encode("utf-8")], zmq.NOBLOCK
+                )
+            except zmq.ZMQError:
+                pass
+
+    def _send_events(self):
+        """Sends queued events in batches until closed and the buffer is empty."""
+        while True:
+            with self._condition:
+                while not self._events and not self._suppressed_output and not self._closed:
+                    self._condition.wait()
+                if not self._events:
+                    self._queue_suppressed_output()
+                if not self._events:
+                    return
+                batch = [self._events.popleft() for _ in range(min(len(self._events), MAX_BATCH_SIZE))]
+            json_batch = EventDataConverter.join_batch(batch)
+            self._push_socket.send_multipart([b"events", json_batch.encode("utf-8")])  # Blocks at high-water mark
+
+    def _queue_suppressed_output(self):
+        """Queues a warning and the tail of suppressed output of every execution; caller must hold the lock."""
+        for (event_type, item_name, filter_id), (count, tail) in self._suppressed_output.items():
+            warning = {
+                "item_name": item_name,
+                "filter_id": filter_id,
+                "msg_type": "msg_warning",
+                "msg_text": f"{count} lines of output suppressed because the client could not keep up; "
+                f"the last {len(tail)} follow",
+            }
+            self._events.append(EventDataConverter.convert("event_msg", warning))
+            self._events.extend(EventDataConverter.convert(event_type, data) for data in tail)
+        self._suppressed_output.clear()
@@ -0,0 +1,113 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+"""
+Contains functions for finding which files of a project on server have changed.
+"""
+
+import json
+import os
+from spine_engine.server.util.hashing import file_digest
+
+
+def snapshot_path(project_dir):
+    """Returns the path of the file that records the state of a project directory at upload time.
+
+    The file lives next to the project directory so it never becomes part of the project.
+
+    Args:
+        project_dir (str): Absolute path to project directory
+
+    Returns:
+        str: path to snapshot file
+    """
+    return os.path.normpath(project_dir) + ".snapshot.json"
+
+
+def _project_files(project_dir):
+    """Yields absolute and forward slash separated relative paths of all files in project directory."""
+    for root, _, file_names in os.walk(project_dir):
+        for file_name in file_names:
+            path = os.path.join(root, file_name)
+            yield path, os.path.relpath(path, project_dir).replace(os.sep, "/")
+
+
+def _stat_record(path):
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def write_snapshot(project_dir):
+    """Records size and modification time of every file in project directory.
+
+    Args:
+        project_dir (str): Absolute path to project directory
+    """
+    snapshot = {relative_path: _stat_record(path) for path, relative_path in _project_files(project_dir)}
+    with open(snapshot_path(project_dir), "w", encoding="utf-8") as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+
+
+def remove_snapshot(project_dir):
+    """Removes project directory's snapshot if it exists.
+
+    Args:
+        project_dir (str): Absolute path to project directory
+    """
+    try:
+        os.remove(snapshot_path(project_dir))
+    except OSError:
+        pass
+
+
+def _stat_matches(path, record):
+    return _stat_record(path) == record
+
+
+def _digest_matches(path, digest):
+    return file_digest(path) == digest
+
+
+def changed_files(project_dir, manifest=None):
+    """Finds files that have been added, modified or deleted.
+
+    Files are compared to the given client manifest by content.
+    Without a manifest, they are compared to the snapshot taken at upload by size and modification time;
+    if there is no snapshot either, all files count as added.
+
+    Args:
+        project_dir (str): Absolute path to project directory
+        manifest (dict, optional): mapping from forward slash separated relative paths to SHA-256 hex digests
+
+    Returns:
+        tuple: list of (absolute path, relative path) pairs of added or modified files
+            and list of relative paths of deleted files
+    """
+    if manifest is None:
+        try:
+            with open(snapshot_path(project_dir), encoding="utf-8") as snapshot_file:
+                baseline = json.load(snapshot_file)
+        except (OSError, ValueError):
+            baseline = {}
+        is_unchanged = _stat_matches
+    else:
+        baseline = manifest
+        is_unchanged = _digest_matches
+    changed = []
+    existing = set()
+    for path, relative_path in _project_files(project_dir):
+        existing.add(relative_path)
+        record = baseline.get(relative_path)
+        if record is None or not is_unchanged(path, record):
+            changed.append((path, relative_path))
+    deleted = sorted(relative_path for relative_path in baseline if relative_path not in existing)
+    return changed, deleted
@@ -29,12 +29,57 @@ class ServerMessage:
         - Prepare project execution
             request: ServerMessage("prepare_execution", "1", <project_name>, [project_package.zip]) + file as bytes
             response: ServerMessage("prepare_execution, job_id, "", None)
+        - Chunked project upload
+            request: ServerMessage("begin_upload", "1", {"project_name", "file_name", "size", "sha256",
+                "upload_id"}, None); give "upload_id" to resume an interrupted upload
+            response: ServerMessage("begin_upload", "1", ("upload_started", upload_id, offset), [])
+            request: ServerMessage("upload_chunk", upload_id, {"offset", "sha256"}, None) + chunk as bytes
+            response: ServerMessage("upload_chunk", upload_id, ("upload_chunk_received", next_offset), [])
+                or ("upload_failed", error, expected_offset)
+            request: ServerMessage("finish_upload", upload_id, "", None)
+            response: ServerMessage("finish_upload", job_id, "", None)
+                or ServerMessage("finish_upload", upload_id, ("upload_failed", error, offset), [])
+                if the upload is incomplete or the checksum of the whole file does not match
+        - Project synchronization via the server's blob store
+            request: ServerMessage("sync_manifest", "1", {"manifest": {<relative path>: <sha256>}}, None)
+            response: ServerMessage("sync_manifest", "1", ("blobs_missing", [<sha256>, ...]), [])
+            request: ServerMessage("upload_blobs", "1", [<sha256>, ...], None) + one frame of bytes per digest
+            response: ServerMessage("upload_blobs", "1", ("blobs_stored", <count>), [])
+            request: ServerMessage("assemble_project", "1", {"project_name", "manifest"}, None)
+            response: ServerMessage("assemble_project", job_id, "", None)
         - Start DAG execution
-            request: ServerMessage("start_execution", job_id, engine_data, None)
-            response: ServerMessage("start_execution", job_id, ("remote_execution_started", publish_port), [])
+            request: ServerMessage("start_execution", job_id, engine_data, None); engine_data may contain
+                an integer "file_transfer_version" (default 1, see below) and an integer "priority",
+                larger numbers get an execution slot first (default 0); unsupported file transfer versions
+                get a "server_init_failed" reply
+            response: ServerMessage("start_execution", job_id, ("remote_execution_started", publish_port, job_id), [])
+                or, if all execution slots are taken,
+                ServerMessage("start_execution", job_id, ("remote_execution_queued", position, job_id), [])
+                where position is the 1-based place in the execution queue; further "remote_execution_queued"
+                replies follow whenever the position changes and "remote_execution_started" when the job
+                gets a slot
+            events: pushed to a PULL socket that the client connects to publish_port as
+                [b"events", <JSON list of [event_type, data] pairs>] messages;
+                after "dag_exec_finished" every output file is announced with
+                [b"incoming_file", b"<file name> [<size>]"] and sent as
+                    file transfer version 1: [<project relative path>, <file contents>]
+                    file transfer version 2: [b"file_chunk", <project relative path>, <offset>, <chunk bytes>]
+                        frames (none for empty files) followed by
+                        [b"file_end", <project relative path>, <sha256 hex digest>];
+                the stream ends with [b"END", b""]
         - Retrieve finished project
-            request: ServerMessage("retrieve_project", job_id, "", [])
-            response ServerMessage("retrieve_project, job_id, "", ["project_package.zip"]) + file as bytes
+            request: ServerMessage("retrieve_project", job_id, options, []); options is an empty dict
+                for the whole project, {"incremental": true} for files changed since upload or
+                {"manifest": {<relative path>: <sha256>}} for files that differ from the client's copy
+            response: a sequence of
+                ServerMessage("retrieve_project", job_id, ("project_chunk", <chunk size>), ["project_package.zip"])
+                + chunk of the project ZIP file as bytes, followed by
+                ServerMessage("retrieve_project", job_id, ("project_retrieved", {"deleted": [<relative path>, ...],
+                "size": <ZIP file size>}), ["project_package.zip"])
+                or ("project_retriever_service_failed", error)
+            request: ServerMessage("project_chunk_ack", job_id, <number of chunks received>, None)
+                the server sends at most RETRIEVE_WINDOW chunks ahead of the acknowledgements and gives up
+                if none arrives in RETRIEVE_ACK_TIMEOUT seconds (see project_retriever_service); no response
 
         Args:
             command (str): Command to be executed at the server
@@ -14,11 +14,18 @@
 Contains static methods for handling ZIP files.
 """
 
+from concurrent.futures import ThreadPoolExecutor
 import os
 import shutil
 from zipfile import ZipFile
 from spine_engine.utils.helpers import get_file_size
 
+PARALLEL_EXTRACTION_THRESHOLD = 1024 * 1024
+"""Uncompressed size in bytes above which ZIP members are extracted in worker threads."""
+MAX_EXTRACTION_WORKERS = 8
+"""Maximum number of worker threads used in extraction."""
+_COPY_BUFFER_SIZE = 1024 * 1024
+
 
 class ZipHandler:
     """ZIP file handler."""
@@ -47,6 +54,10 @@ class ZipHandler:
     def extract(zip_file, output_folder):
         """Extracts the contents of a ZIP file to the provided folder.
 
+        Members are decompressed only once; their CRCs are verified while they are being written
+        and a corrupted member raises ``zipfile.BadZipFile``. Members larger than
+        PARALLEL_EXTRACTION_THRESHOLD are extracted in worker threads.
+
         Args:
             zip_file (str): Absolute path to ZIP file to be extracted.
             output_folder (str): Absolute path to destination directory
@@ -57,14 +68,65 @@ class ZipHandler:
         if file_size < 100:
             raise ValueError(f"'{zip_file}' possibly corrupted. File size too small [{get_file_size(file_size)}]")
         with ZipFile(zip_file, "r") as zip_obj:
-            try:
-                first_bad_file = zip_obj.testzip()  # Test ZIP file integrity before extraction (debugging)
-                if not first_bad_file:
-                    zip_obj.extractall(output_folder)
+            large_members = []
+            for info in zip_obj.infolist():
+                target = ZipHandler._target_path(info.filename, output_folder)
+                if target is None:
+                    continue
+                if info.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if info.file_size > PARALLEL_EXTRACTION_THRESHOLD:
+                    large_members.append((info, target))
                 else:
-                    print(f"'{zip_file}' integrity test failure. First bad file: {first_bad_file}")
-            except Exception as e:
-                raise e
+                    ZipHandler._extract_member(zip_obj, info, target)
+            if len(large_members) == 1:
+                ZipHandler._extract_member(zip_obj, *large_members[0])
+            elif large_members:
+                n_workers = min(MAX_EXTRACTION_WORKERS, len(large_members), os.cpu_count() or 1)
+                with ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix="ZipExtractor") as executor:
+                    futures = [
+                        executor.submit(ZipHandler._extract_member, zip_obj, info, target)
+                        for info, target in large_members
+                    ]
+                    for future in futures:
+                        future.result()
+
+    @staticmethod
+    def _target_path(member_name, output_folder):
+        """Returns the path a ZIP member is extracted to, refusing to leave output folder like ZipFile.extract().
+
+        Args:
+            member_name (str): member's name in the archive
+            output_folder (str): destination directory
+
+        Returns:
+            str: target path or None if the member name contains nothing but path separators and relative parts
+        """
+        arcname = member_name.replace("/", os.sep)
+        if os.path.altsep:
+            arcname = arcname.replace(os.path.altsep, os.sep)
+        arcname = os.path.splitdrive(arcname)[1]
+        arcname = os.sep.join(part for part in arcname.split(os.sep) if part not in ("", os.curdir, os.pardir))
+        if os.sep == "\\":
+            # Same private helper ZipFile.extract() uses to replace characters Windows does not allow in names.
+            arcname = ZipFile._sanitize_windows_name(arcname, os.sep)  # pylint: disable=protected-access
+        if not arcname:
+            return None
+        return os.path.join(output_folder, arcname)
+
+    @staticmethod
+    def _extract_member(zip_obj, info, target):
+        """Decompresses a member to target path verifying its CRC.
+
+        Args:
+            zip_obj (ZipFile): archive
+            info (ZipInfo): member
+            target (str): destination file path
+        """
+        with zip_obj.open(info) as source, open(target, "wb") as destination:
+            shutil.copyfileobj(source, destination, _COPY_BUFFER_SIZE)
 
     @staticmethod
     def delete_folder(folder):
@@ -20,6 +20,7 @@ import multiprocessing as mp
 import os
 import threading
 from typing import TYPE_CHECKING, Literal, TypeAlias
+import uuid
 import networkx as nx
 from spinedb_api import append_filter_config, name_from_dict
 from spinedb_api.filters.execution_filter import ExecutionDescriptor, execution_filter_config
@@ -27,9 +28,15 @@ from spinedb_api.filters.scenario_filter import scenario_name_from_dict
 from spinedb_api.filters.tools import filter_config
 from spinedb_api.spine_db_server import db_server_manager
 from .exception import EngineInitFailed
+from .execution_managers.interpreter_pool import DEFAULT_POOL_SIZE, python_interpreter_pool
+from .execution_managers.kernel_execution_manager import configure_kernel_pool, discard_prewarmed_kernel_managers
 from .execution_managers.persistent_execution_manager import (
+    add_persistent_pool_listener,
+    configure_persistent_pool,
     disable_persistent_process_creation,
+    discard_prewarmed_persistent_managers,
     enable_persistent_process_creation,
+    remove_persistent_pool_listener,
 )
 from .jumpster import (
     Failure,
@@ -47,7 +54,16 @@ from .project_item.executable_item_base import ExecutableItemBase
 from .project_item.project_item_resource import ProjectItemResource
 from .project_item.project_item_specification import ProjectItemSpecification
 from .project_item_loader import ProjectItemLoader
-from .utils.execution_resources import one_shot_process_semaphore, persistent_process_semaphore
+from .utils.execution_resources import (
+    DEFAULT_MAX_LOAD_PER_CPU,
+    DEFAULT_MEMORY_PER_PROCESS,
+    DEFAULT_MIN_FREE_MEMORY,
+    AcquisitionTag,
+    AdaptiveLimit,
+    acquisition_tag,
+    one_shot_process_semaphore,
+    persistent_process_semaphore,
+)
 from .utils.helpers import (
     AppSettings,
 )
@@ -59,9 +75,11 @@ from .utils.helpers import (
     make_connections,
     make_dag,
     required_items_for_execution,
+    shorten,
 )
 from .utils.helpers import ExecutionDirection as ED
-from .utils.queue_logger import QueueLogger
+from .utils.output_limiter import DEFAULT_OUTPUT_BURST, output_rate_limit, read_output_log
+from .utils.queue_logger import DEFAULT_BATCH_DELAY, DEFAULT_BATCH_SIZE, BatchingQueue, PromptBroker, QueueLogger
 
 if TYPE_CHECKING:
     from multiprocessing.synchronize import Lock as LockType
@@ -95,8 +113,11 @@ EventType: TypeAlias = Literal[
     "flash",
     "kernel_execution_msg",
     "persistent_execution_msg",
+    "persistent_pool_msg",
+    "process_limiter_msg",
     "process_msg",
     "prompt",
+    "resource_usage_msg",
     "server_status_msg",
     "standard_execution_msg",
 ]
@@ -118,6 +139,7 @@ class SpineEngine:
         project_dir: str | None = None,
         execution_permits: ExecutionPermits | None = None,
         debug: bool = False,
+        event_types: Iterable[EventType] | None = None,
     ):
         """
         Args:
@@ -131,11 +153,21 @@ class SpineEngine:
             execution_permits : A mapping from item name to a boolean value, False indicating that
                 the item is not executed
             debug: Whether debug mode is active or not.
+            event_types: Event types the consumer subscribes to; other events are dropped at the source.
+                "dag_exec_finished" is always included. If None, all events are emitted.
 
         Raises:
             EngineInitFailed: Raised if initialization fails
         """
-        self._queue = mp.Queue()
+        self._settings = AppSettings(settings if settings is not None else {})
+        self._event_types = frozenset(event_types) | {"dag_exec_finished"} if event_types is not None else None
+        # Items always emit resource usage so it gets recorded even if the consumer has not subscribed to it.
+        self._item_event_types = self._event_types | {"resource_usage_msg"} if event_types is not None else None
+        self._queue = BatchingQueue(
+            mp.Queue(),
+            int(self._settings.value("engineSettings/eventBatchSize", DEFAULT_BATCH_SIZE)),
+            float(self._settings.value("engineSettings/eventBatchDelay", DEFAULT_BATCH_DELAY)),
+        )
         if items is None:
             items = {}
         self._items = items
@@ -156,7 +188,6 @@ class SpineEngine:
             self._connections
         )  # Mapping of a source node (item) to a list of destination nodes (items)
         self._check_write_index()
-        self._settings = AppSettings(settings if settings is not None else {})
         _set_resource_limits(self._settings, SpineEngine._resource_limit_lock)
         enable_persistent_process_creation()
         self._project_dir = project_dir
@@ -176,7 +207,7 @@ class SpineEngine:
         self._jumps = filter_unneeded_jumps(jumps, items_by_jump, execution_permits)
         validate_jumps(self._jumps, items_by_jump, self._dag)
         for x in self._connections + self._jumps:
-            x.make_logger(self._queue)
+            x.make_logger(self._queue, self._event_types)
         for x in self._jumps:
             x.set_engine(self)
         self._forth_injectors = inverted(self._back_injectors)
@@ -184,13 +215,24 @@ class SpineEngine:
         self._state = SpineEngineState.SLEEPING
         self._debug = debug
         self._running_items = []
-        self._prompt_queues = {}
-        self._answered_prompts = {}
+        self._prompt_broker = PromptBroker()
         self.resources_per_item = {}  # Tuples of (forward resources, backward resources) from last execution
+        self.resource_usage: dict[tuple[str, str], list[dict]] = {}
+        """Resource usage records of executions keyed by (item name, filter id)."""
         self._timestamp = create_timestamp()
+        self._acquisition_tag = AcquisitionTag(
+            f"engine-{uuid.uuid4().hex}", int(self._settings.value("engineSettings/processPriority", 0))
+        )
         self._db_server_manager_queue = None
+        self._prewarm_thread = None
+        self._prewarm_stop = threading.Event()
+        self._prewarm_lock = threading.Lock()
+        self._prewarm_finished = False
+        self._started_items: set[str] = set()
+        """Names of items whose forward execution has started; these are not pre-warmed anymore."""
         self._thread = threading.Thread(target=self.run)
         self._event_stream = self._get_event_stream()
+        self._pending_events: list[tuple[EventType, dict]] = []
 
     def _descendants(self, name: str) -> Iterator[str]:
         """Yields descendant item names.
@@ -279,13 +321,49 @@ class SpineEngine:
         Note that this method is called multiple times for each item:
         Once for the backward pipeline, and once for each filtered execution in the forward pipeline."""
         item_dict = self._items[item_name]
-        prompt_queue = mp.Queue()
-        self._prompt_queues[id(prompt_queue)] = prompt_queue
+        silent = direction is ED.BACKWARD
+        logs_dir = self._item_logs_dir(item_name) if not silent and self._project_dir else None
         logger = QueueLogger(
-            self._queue, item_name, prompt_queue, self._answered_prompts, silent=direction is ED.BACKWARD
+            self._queue,
+            item_name,
+            self._prompt_broker,
+            silent=silent,
+            logs_dir=logs_dir,
+            event_types=self._item_event_types,
         )
         return self.do_make_item(item_name, item_dict, logger)
 
+    def _item_logs_dir(self, item_name: str) -> str:
+        """Returns path to item's logs directory."""
+        return os.path.join(self._project_dir, ".spinetoolbox", "items", shorten(item_name), "logs")
+
+    def read_output_log(self, path: str, offset: int, length: int) -> bytes:
+        """Reads a byte range from an item's output log.
+
+        Only the tail of excessive process output is forwarded as events;
+        the full output can be fetched piecewise from the log file referenced by the suppression warning.
+
+        Args:
+            path: path to log file
+            offset: start of the range
+            length: maximum number of bytes to read
+
+        Returns:
+            bytes read
+        """
+        if not self._project_dir:
+            raise ValueError("output logs are not written when engine has no project directory")
+        path = os.path.realpath(path)
+        items_dir = os.path.realpath(os.path.join(self._project_dir, ".spinetoolbox", "items"))
+        if os.path.commonpath((path, items_dir)) != items_dir:
+            raise ValueError(f"{path} is not an output log of this project")
+        return read_output_log(path, offset, length)
+
+    def _make_silent_item(self, item_name: str) -> ExecutableItemBase:
+        """Creates an item whose logger does not put anything into the event queue."""
+        logger = QueueLogger(self._queue, item_name, None, silent=True)
+        return self.do_make_item(item_name, self._items[item_name], logger)
+
     def do_make_item(self, item_name: str, item_dict: dict, logger: QueueLogger) -> ExecutableItemBase:
         item_type = item_dict["type"]
         executable_item_class = self._executable_item_classes[item_type]
@@ -296,32 +374,60 @@ class SpineEngine:
     def get_event(self) -> tuple[EventType, dict]:
         """Returns the next event in the stream. Calling this after receiving the event of type "dag_exec_finished"
         will raise StopIterationError."""
+        if not self._pending_events:
+            self._pending_events = next(self._event_stream)
+        return self._pending_events.pop(0)
+
+    def get_events(self) -> list[tuple[EventType, dict]]:
+        """Returns the next batch of events in the stream.
+
+        The batch contains at least one event. The last batch ends with the event of type "dag_exec_finished";
+        calling this after receiving that batch will raise StopIterationError."""
+        if self._pending_events:
+            events = self._pending_events
+            self._pending_events = []
+            return events
         return next(self._event_stream)
 
     def state(self):
         """Returns Spine Engine state."""
         return self._state
 
-    def _get_event_stream(self) -> Iterator[tuple[EventType, dict]]:
-        """Yields events (event_type, event_data).
+    def _get_event_stream(self) -> Iterator[list[tuple[EventType, dict]]]:
+        """Yields batches of events (event_type, event_data).
 
         TODO: Describe the events in depth.
 
         Yields:
-            tuple: event type and data
+            list of event type and data tuples
         """
         self._thread.start()
+        forward_resource_usage = self._event_types is None or "resource_usage_msg" in self._event_types
         while True:
-            msg = self._queue.get()
-            if msg[0] == "dag_exec_finished":
-                break
-            yield msg
-        yield msg
-        self._thread.join()
-
-    def answer_prompt(self, prompter_id: str, answer: str) -> None:
+            batch = self._queue.get()
+            self._record_resource_usage(batch)
+            if not forward_resource_usage:
+                batch = [msg for msg in batch if msg[0] != "resource_usage_msg"]
+                if not batch:
+                    continue
+            for i, msg in enumerate(batch):
+                if msg[0] == "dag_exec_finished":
+                    yield batch[: i + 1]
+                    self._thread.join()
+                    return
+            yield batch
+
+    def _record_resource_usage(self, batch: list[tuple[EventType, dict]]) -> None:
+        """Stores resource usage events from given batch."""
+        for event_type, data in batch:
+            if event_type == "resource_usage_msg":
+                usage = dict(data)
+                key = usage.pop("item_name"), usage.pop("filter_id")
+                self.resource_usage.setdefault(key, []).append(usage)
+
+    def answer_prompt(self, prompter_id: int, answer: str) -> None:
         """Answers the prompt for the specified prompter id."""
-        self._prompt_queues[prompter_id].put(answer)
+        self._prompt_broker.answer(prompter_id, answer)
 
     def wait(self) -> None:
         """Waits until engine execution has finished."""
@@ -330,33 +436,96 @@ class SpineEngine:
 
     def run(self) -> None:
         """Starts db server manager the engine."""
-        with db_server_manager() as self._db_server_manager_queue:
-            self._do_run()
+        quota = self._settings.value("engineSettings/maxProcessesPerEngine", "")
+        add_persistent_pool_listener(self._put_pool_eviction, self._acquisition_tag.group)
+        for semaphore in (one_shot_process_semaphore, persistent_process_semaphore):
+            semaphore.add_listener(self._put_limiter_decision, self._acquisition_tag.group)
+            if quota:
+                semaphore.set_quota(self._acquisition_tag.group, int(quota))
+        try:
+            with db_server_manager() as self._db_server_manager_queue, acquisition_tag(self._acquisition_tag):
+                self._do_run()
+        finally:
+            remove_persistent_pool_listener(self._put_pool_eviction)
+            for semaphore in (one_shot_process_semaphore, persistent_process_semaphore):
+                semaphore.remove_listener(self._put_limiter_decision)
+                semaphore.discard_group(self._acquisition_tag.group)
+            self._queue.close()
 
     def _do_run(self) -> None:
         """Runs this engine."""
         self._state = SpineEngineState.RUNNING
-        for event in execute_pipeline_iterator(self._pipeline):
-            self._process_event(event)
+        if self._settings.value("engineSettings/prewarmPersistent", "false") == "true":
+            self._prewarm_thread = threading.Thread(target=self._prewarm_items, name="Prewarm", daemon=True)
+            self._prewarm_thread.start()
+        try:
+            for event in execute_pipeline_iterator(self._pipeline):
+                self._process_event(event)
+        finally:
+            self._finish_prewarming()
         if self._state == SpineEngineState.RUNNING:
             self._state = SpineEngineState.COMPLETED
         self._queue.put(("dag_exec_finished", str(self._state)))
 
+    def _prewarm_items(self) -> None:
+        """Lets permitted items start their persistent processes and kernels in DAG order.
+
+        Items that have started executing already are skipped.
+        If execution finishes first, the processes and kernels started here are discarded once pre-warming stops.
+        """
+        try:
+            with acquisition_tag(self._acquisition_tag):
+                for item_name in nx.topological_sort(self._dag):
+                    if self._prewarm_stop.is_set() or self._state != SpineEngineState.RUNNING:
+                        break
+                    if not self._execution_permits[item_name] or item_name in self._started_items:
+                        continue
+                    try:
+                        item = self._make_silent_item(item_name)
+                        if item.ready_to_execute(self._settings):
+                            item.prewarm()
+                    except Exception:  # pylint: disable=broad-except
+                        # Pre-warming is speculative; the item reports any errors when it executes.
+                        continue
+        finally:
+            with self._prewarm_lock:
+                self._prewarm_finished = True
+                execution_finished = self._prewarm_stop.is_set()
+            if execution_finished:
+                self._discard_prewarmed()
+
+    def _finish_prewarming(self) -> None:
+        """Stops pre-warming without waiting for a process or kernel that is still starting.
+
+        Pre-warmed processes and kernels no item took over are shut down right away
+        if pre-warming has finished already, otherwise the pre-warming thread shuts them down when it finishes.
+        """
+        if self._prewarm_thread is None:
+            return
+        with self._prewarm_lock:
+            self._prewarm_stop.set()
+            prewarming_finished = self._prewarm_finished
+        if prewarming_finished:
+            self._discard_prewarmed()
+
+    def _discard_prewarmed(self) -> None:
+        """Shuts down pre-warmed processes and kernels no item took over."""
+        discard_prewarmed_persistent_managers(self._acquisition_tag)
+        discard_prewarmed_kernel_managers(self._acquisition_tag)
+
     def _process_event(self, event: JumpsterEvent) -> None:
         """Processes events from a pipeline."""
         if event.event_type == JumpsterEventType.STEP_START:
-            self._queue.put(("exec_started", {"item_name": event.item_name, "direction": event.direction}))
+            self._put_event("exec_started", {"item_name": event.item_name, "direction": event.direction})
         elif event.event_type == JumpsterEventType.STEP_FAILURE and self._state != SpineEngineState.USER_STOPPED:
             self._state = SpineEngineState.FAILED
-            self._queue.put(
-                (
-                    "exec_finished",
-                    {
-                        "item_name": event.item_name,
-                        "direction": event.direction,
-                        "item_state": ItemExecutionFinishState.FAILURE,
-                    },
-                )
+            self._put_event(
+                "exec_finished",
+                {
+                    "item_name": event.item_name,
+                    "direction": event.direction,
+                    "item_state": ItemExecutionFinishState.FAILURE,
+                },
             )
             if self._debug:
                 error = event.error
@@ -364,17 +533,28 @@ class SpineEngine:
                 print("".join(error.stack + [error.message]))
                 print("(reported by SpineEngine in debug mode)")
         elif event.event_type == JumpsterEventType.STEP_FINISH:
-            self._queue.put(
-                (
-                    "exec_finished",
-                    {
-                        "item_name": event.item_name,
-                        "direction": event.direction,
-                        "item_state": event.item_finish_state,
-                    },
-                )
+            self._put_event(
+                "exec_finished",
+                {
+                    "item_name": event.item_name,
+                    "direction": event.direction,
+                    "item_state": event.item_finish_state,
+                },
             )
 
+    def _put_limiter_decision(self, decision: dict) -> None:
+        """Forwards an adaptive process limiter decision as an event."""
+        self._put_event("process_limiter_msg", decision)
+
+    def _put_pool_eviction(self, eviction: dict) -> None:
+        """Forwards a persistent process eviction as an event."""
+        self._put_event("persistent_pool_msg", eviction)
+
+    def _put_event(self, event_type: EventType, data: dict) -> None:
+        """Puts an event into the event queue if the consumer has subscribed to its type."""
+        if self._event_types is None or event_type in self._event_types:
+            self._queue.put((event_type, data))
+
     def stop(self) -> None:
         """Stops the engine."""
         self._state = SpineEngineState.USER_STOPPED
@@ -386,15 +566,13 @@ class SpineEngine:
     def _stop_item(self, item: ExecutableItemBase) -> None:
         """Stops given project item."""
         item.stop_execution()
-        self._queue.put(
-            (
-                "exec_finished",
-                {
-                    "item_name": item.name,
-                    "direction": ED.FORWARD,
-                    "item_state": ItemExecutionFinishState.STOPPED,
-                },
-            )
+        self._put_event(
+            "exec_finished",
+            {
+                "item_name": item.name,
+                "direction": ED.FORWARD,
+                "item_state": ItemExecutionFinishState.STOPPED,
+            },
         )
 
     def _make_pipeline(self) -> PipelineDefinition:
@@ -511,6 +689,7 @@ class SpineEngine:
         Returns:
             Execution finish state, output resources.
         """
+        self._started_items.add(item_name)
         item = self.make_item(item_name, ED.NONE)
         if not item.ready_to_execute(self._settings):
             if not self._execution_permits[item_name]:
@@ -566,7 +745,8 @@ class SpineEngine:
         """
         self._running_items.append(item)
         if self._execution_permits[item.name]:
-            item_finish_state = item.execute(filtered_forward_resources, filtered_backward_resources, item_lock)
+            with acquisition_tag(self._acquisition_tag):
+                item_finish_state = item.execute(filtered_forward_resources, filtered_backward_resources, item_lock)
             item.finish_execution(item_finish_state)
         else:
             item.exclude_execution(filtered_forward_resources, filtered_backward_resources, item_lock)
@@ -950,8 +1130,32 @@ def _get_items_by_jump(jumps: list[Jump], dag: nx.DiGraph) -> dict[Jump, set]:
     return items_by_jump
 
 
+def _make_adaptive_limit(settings: AppSettings, max_processes_key: str) -> AdaptiveLimit:
+    """Creates an adaptive process limit from settings.
+
+    Args:
+        settings: Engine settings
+        max_processes_key: settings key of the upper bound for the limit
+
+    Returns:
+        adaptive limit
+    """
+    megabyte = 1024 * 1024
+    min_free_memory = int(settings.value("engineSettings/minFreeMemoryMB", DEFAULT_MIN_FREE_MEMORY // megabyte))
+    memory_per_process = int(
+        settings.value("engineSettings/memoryPerProcessMB", DEFAULT_MEMORY_PER_PROCESS // megabyte)
+    )
+    return AdaptiveLimit(
+        int(settings.value(max_processes_key, os.cpu_count())),
+        min_free_memory=min_free_memory * megabyte,
+        memory_per_process=memory_per_process * megabyte,
+        max_load_per_cpu=float(settings.value("engineSettings/maxLoadPerCpu", DEFAULT_MAX_LOAD_PER_CPU)),
+    )
+
+
 def _set_resource_limits(settings: AppSettings, lock: LockType) -> None:
-    """Sets limits for simultaneous single-shot and persistent processes.
+    """Sets limits for simultaneous single-shot and persistent processes as well as for process output rate,
+    and configures the pools of pre-started Python interpreters and kernels and eviction of idle persistent processes.
 
     May potentially kill existing persistent processes.
 
@@ -965,6 +1169,8 @@ def _set_resource_limits(settings: AppSettings, lock: LockType) -> None:
             limit = "unlimited"
         elif process_limiter == "auto":
             limit = os.cpu_count()
+        elif process_limiter == "adaptive":
+            limit = _make_adaptive_limit(settings, "engineSettings/maxProcesses")
         else:
             limit = int(settings.value("engineSettings/maxProcesses", os.cpu_count()))
         one_shot_process_semaphore.set_limit(limit)
@@ -973,6 +1179,29 @@ def _set_resource_limits(settings: AppSettings, lock: LockType) -> None:
             limit = "unlimited"
         elif persistent_limiter == "auto":
             limit = os.cpu_count()
+        elif persistent_limiter == "adaptive":
+            limit = _make_adaptive_limit(settings, "engineSettings/maxPersistentProcesses")
         else:
             limit = int(settings.value("engineSettings/maxPersistentProcesses", os.cpu_count()))
         persistent_process_semaphore.set_limit(limit)
+        output_limiter = settings.value("engineSettings/outputLimiter", "unlimited")
+        if output_limiter == "unlimited":
+            output_rate_limit.set_limit("unlimited")
+        else:
+            lines_per_second = float(settings.value("engineSettings/maxOutputLinesPerSecond", 1000))
+            burst = int(settings.value("engineSettings/maxOutputBurstLines", DEFAULT_OUTPUT_BURST))
+            output_rate_limit.set_limit(lines_per_second, burst)
+        if settings.value("engineSettings/pythonInterpreterPool", "false") == "true":
+            pool_size = int(settings.value("engineSettings/pythonInterpreterPoolSize", DEFAULT_POOL_SIZE))
+            preload_modules = settings.value("engineSettings/pythonPreloadModules", "")
+            python_interpreter_pool.configure(
+                True, pool_size, [name.strip() for name in preload_modules.split(",") if name.strip()]
+            )
+        else:
+            python_interpreter_pool.configure(False)
+        idle_ttl = settings.value("engineSettings/persistentIdleTimeout", "")
+        memory_cap = settings.value("engineSettings/persistentPoolMemoryMB", "")
+        configure_persistent_pool(
+            float(idle_ttl) if idle_ttl else None, int(memory_cap) * 1024 * 1024 if memory_cap else None
+        )
+        configure_kernel_pool(int(settings.value("engineSettings/kernelPoolSize", 0)))
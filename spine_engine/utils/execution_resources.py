@@ -12,78 +12,450 @@
 
 """Utilities for managing execution resources such as processes."""
 
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+import itertools
+import math
+import os
 import threading
-from typing import Literal
+import time
+from typing import Final, Literal
+
+DEFAULT_MIN_FREE_MEMORY: Final[int] = 1024 * 1024 * 1024
+"""Default amount of memory in bytes that adaptive limits keep free."""
+DEFAULT_MEMORY_PER_PROCESS: Final[int] = 512 * 1024 * 1024
+"""Default amount of memory in bytes that adaptive limits reserve for each new process."""
+DEFAULT_MAX_LOAD_PER_CPU: Final[float] = 2.0
+"""Default one-minute load average per CPU above which adaptive limits admit no new processes."""
+ADAPTIVE_POLL_INTERVAL: Final[float] = 0.5
+"""Interval in seconds at which waiting threads re-check an adaptive limit."""
+
+LimiterListener = Callable[[dict], None]
+Reclaimer = Callable[[], bool]
+
+
+@dataclass(frozen=True)
+class AcquisitionTag:
+    """Identifies who is acquiring a resource semaphore."""
+
+    group: str | None = None
+    """Group, e.g. an engine, whose processes share a quota and a fair share of the limit."""
+    priority: int = 0
+    """Priority class; waiters with higher priority are admitted first."""
+
+
+_DEFAULT_TAG: Final[AcquisitionTag] = AcquisitionTag()
+_thread_state = threading.local()
+
+
+def current_acquisition_tag() -> AcquisitionTag:
+    """Returns the acquisition tag of the calling thread.
+
+    Returns:
+        tag set by the innermost :func:`acquisition_tag` context or a default tag
+    """
+    return getattr(_thread_state, "tag", _DEFAULT_TAG)
+
+
+@contextmanager
+def acquisition_tag(tag: AcquisitionTag) -> Iterator[AcquisitionTag]:
+    """Sets the acquisition tag that semaphores use by default in the calling thread.
+
+    Args:
+        tag: acquisition tag
+
+    Yields:
+        the tag
+    """
+    previous = current_acquisition_tag()
+    _thread_state.tag = tag
+    try:
+        yield tag
+    finally:
+        _thread_state.tag = previous
+
+
+def available_memory() -> int | None:
+    """Returns the amount of memory available for new processes.
+
+    Returns:
+        available memory in bytes or None if it cannot be determined on this platform
+    """
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def load_per_cpu() -> float | None:
+    """Returns the one-minute load average divided by the number of CPUs.
+
+    Returns:
+        load per CPU or None if load average is not available on this platform
+    """
+    try:
+        load = os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+    return load / (os.cpu_count() or 1)
+
+
+class AdaptiveLimit:
+    """Process limit that follows available system memory and load.
+
+    The effective limit is the number of running processes plus the number of new processes
+    that fit into available memory, given that each new process takes ``memory_per_process`` bytes
+    and ``min_free_memory`` bytes must be left free. No new processes are admitted while load per CPU
+    exceeds ``max_load_per_cpu``. The effective limit never exceeds ``max_processes``
+    and a single process is always admitted when none are running so executions cannot stall.
+
+    On platforms where memory or load cannot be measured, the respective constraint is ignored.
+    """
+
+    def __init__(
+        self,
+        max_processes: int,
+        min_free_memory: int = DEFAULT_MIN_FREE_MEMORY,
+        memory_per_process: int = DEFAULT_MEMORY_PER_PROCESS,
+        max_load_per_cpu: float = DEFAULT_MAX_LOAD_PER_CPU,
+        memory_probe: Callable[[], int | None] = available_memory,
+        load_probe: Callable[[], float | None] = load_per_cpu,
+    ):
+        """
+        Args:
+            max_processes: upper bound for the effective limit
+            min_free_memory: memory in bytes to keep free
+            memory_per_process: memory in bytes reserved for each new process
+            max_load_per_cpu: load per CPU above which no new processes are admitted
+            memory_probe: function that returns available memory in bytes
+            load_probe: function that returns load per CPU
+        """
+        self.max_processes = max(1, max_processes)
+        self._min_free_memory = min_free_memory
+        self._memory_per_process = max(1, memory_per_process)
+        self._max_load_per_cpu = max_load_per_cpu
+        self._memory_probe = memory_probe
+        self._load_probe = load_probe
+
+    def evaluate(self, process_count: int) -> dict:
+        """Computes the effective limit for current system state.
+
+        Args:
+            process_count: number of running processes
+
+        Returns:
+            dictionary with keys "effective_limit", "available_memory" and "load_per_cpu"
+        """
+        memory = self._memory_probe()
+        load = self._load_probe()
+        limit = self.max_processes
+        if memory is not None:
+            headroom = max(0, memory - self._min_free_memory)
+            limit = min(limit, process_count + headroom // self._memory_per_process)
+        if load is not None and load > self._max_load_per_cpu:
+            limit = min(limit, process_count)
+        return {"effective_limit": max(1, limit), "available_memory": memory, "load_per_cpu": load}
+
+
+class _Ticket:
+    """A waiter's place in a semaphore's queue."""
+
+    __slots__ = ("sequence", "tag", "enqueue_time", "granted")
+
+    def __init__(self, sequence: int, tag: AcquisitionTag):
+        self.sequence = sequence
+        self.tag = tag
+        self.enqueue_time = time.monotonic()
+        self.granted = False
 
 
 class ResourceSemaphore:
-    """A bit more flexible semaphore than the one found in the standard threading module."""
+    """A bit more flexible semaphore than the one found in the standard threading module.
+
+    Waiters are queued with tickets and admitted in order of priority. Within a priority class,
+    the waiter whose group holds the fewest processes goes first, so groups such as engines that share
+    the semaphore get fair shares; ties are broken in FIFO order. Groups may additionally have quotas.
+    """
 
-    def __init__(self):
+    def __init__(self, name: str = ""):
+        """
+        Args:
+            name: name that identifies the semaphore in limiter decisions
+        """
+        self.name = name
         self._max_processes = 1
-        self._start_process_condition = threading.Condition()
+        self._condition = threading.Condition()
         self._process_count = 0
-        self._process_count_lock = threading.Lock()
+        self._processes_by_group: Counter[str | None] = Counter()
+        self._quotas: dict[str, int] = {}
+        self._waiting: list[_Ticket] = []
+        self._sequence = itertools.count()
+        self._effective_limit = None
+        self._listeners: list[tuple[LimiterListener, str | None]] = []
+        self._reclaimers: list[Reclaimer] = []
+        self._acquisition_count = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
 
-    def acquire(self, timeout: float | None = None) -> bool:
+    def acquire(self, timeout: float | None = None, tag: AcquisitionTag | None = None) -> bool:
         """Waits for process count to drop below the limit.
 
         Args:
             timeout: timeout in seconds
+            tag: acquisition tag; defaults to calling thread's tag
 
         Returns:
             True if semaphore was acquired, False if there were too many processes and a timeout occurred
         """
-        with self._process_count_lock:
-            if self._max_processes == "unlimited":
-                self._process_count += 1
+        if tag is None:
+            tag = current_acquisition_tag()
+        with self._condition:
+            ticket = _Ticket(next(self._sequence), tag)
+            self._waiting.append(ticket)
+            self._dispatch(tag.group)
+            if not ticket.granted and (timeout is None or timeout > 0.0):
+                self._reclaim(ticket)
+            if ticket.granted:
                 return True
-        with self._start_process_condition:
-            return self._start_process_condition.wait_for(self._check_and_update_process_count, timeout)
+            adaptive = isinstance(self._max_processes, AdaptiveLimit)
+            if adaptive:
+                self._notify_listeners("deferred", tag.group)
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            while not ticket.granted:
+                # System state changes without notification so adaptive limits must be re-checked periodically.
+                wait_time = ADAPTIVE_POLL_INTERVAL if adaptive else None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0.0:
+                        self._waiting.remove(ticket)
+                        self._dispatch(tag.group)
+                        return False
+                    wait_time = min(wait_time, remaining) if wait_time is not None else remaining
+                self._condition.wait(wait_time)
+                if not ticket.granted and isinstance(self._max_processes, AdaptiveLimit):
+                    self._dispatch(tag.group)
+            return True
 
     def __enter__(self):
         return self.acquire()
 
-    def _check_and_update_process_count(self) -> bool:
-        """Atomically checks if process count is less than the limit and if so, increments it by one.
+    def release(self, tag: AcquisitionTag | None = None) -> None:
+        """Decrements process count and admits waiting threads.
 
-        Returns:
-            True if process count was incremented, False otherwise
+        Args:
+            tag: tag that was used to acquire the semaphore; defaults to calling thread's tag
         """
-        with self._process_count_lock:
-            if self._process_count < self._max_processes:
-                self._process_count += 1
-                return True
-            return False
-
-    def release(self) -> None:
-        """Decrements process count and notifies other threads."""
-        with self._process_count_lock:
+        if tag is None:
+            tag = current_acquisition_tag()
+        with self._condition:
             self._process_count -= 1
             if self._process_count < 0:
                 raise RuntimeError("Logic error: process counter negative.")
-        with self._start_process_condition:
-            self._start_process_condition.notify()
+            if self._processes_by_group[tag.group] > 0:
+                self._processes_by_group[tag.group] -= 1
+                if not self._processes_by_group[tag.group]:
+                    del self._processes_by_group[tag.group]
+            self._dispatch(tag.group)
 
     def __exit__(self, exc_type, exc_value, traceback):
         self.release()
         return False
 
-    def set_limit(self, limit: int | Literal["unlimited"]) -> None:
+    def _dispatch(self, group: str | None = None) -> None:
+        """Admits waiters while there is capacity; caller must hold the condition.
+
+        Args:
+            group: group whose action triggered the dispatch or None if it was not triggered by a group
+        """
+        if not self._waiting:
+            return
+        limit = self._current_limit(group)
+        granted = False
+        while self._waiting and self._process_count < limit:
+            ticket = self._next_ticket()
+            if ticket is None:
+                break
+            self._waiting.remove(ticket)
+            ticket.granted = True
+            self._process_count += 1
+            self._processes_by_group[ticket.tag.group] += 1
+            wait_time = time.monotonic() - ticket.enqueue_time
+            self._acquisition_count += 1
+            self._total_wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+            granted = True
+        if granted:
+            self._condition.notify_all()
+
+    def _reclaim(self, ticket: _Ticket) -> None:
+        """Lets reclaimers free permits until given ticket gets granted; caller must hold the condition.
+
+        Args:
+            ticket: waiting ticket
+        """
+        for reclaimer in list(self._reclaimers):
+            while not ticket.granted and reclaimer():
+                pass
+            if ticket.granted:
+                return
+
+    def _current_limit(self, group: str | None = None) -> float:
+        """Returns current maximum process count; caller must hold the condition.
+
+        Args:
+            group: group that listeners of a possible limit change decision are filtered by
+        """
+        if self._max_processes == "unlimited":
+            return math.inf
+        if not isinstance(self._max_processes, AdaptiveLimit):
+            return self._max_processes
+        decision = self._max_processes.evaluate(self._process_count)
+        limit = decision["effective_limit"]
+        if limit != self._effective_limit:
+            self._effective_limit = limit
+            self._notify_listeners("limit_changed", group, decision)
+        return limit
+
+    def _next_ticket(self) -> _Ticket | None:
+        """Picks the next waiter to admit; caller must hold the condition.
+
+        Returns:
+            ticket or None if all waiters' groups have reached their quotas
+        """
+        eligible = [
+            ticket
+            for ticket in self._waiting
+            if ticket.tag.group not in self._quotas
+            or self._processes_by_group[ticket.tag.group] < self._quotas[ticket.tag.group]
+        ]
+        if not eligible:
+            return None
+        return min(
+            eligible,
+            key=lambda ticket: (-ticket.tag.priority, self._processes_by_group[ticket.tag.group], ticket.sequence),
+        )
+
+    def set_quota(self, group: str, quota: int | None) -> None:
+        """Sets the maximum number of processes a group may hold at once.
+
+        Args:
+            group: group name
+            quota: maximum number of processes or None to remove the quota
+        """
+        with self._condition:
+            if quota is None:
+                self._quotas.pop(group, None)
+            else:
+                self._quotas[group] = max(1, quota)
+            self._dispatch(group)
+
+    def discard_group(self, group: str) -> None:
+        """Forgets the quota and the process accounting of a group that will not acquire anymore.
+
+        Processes that were acquired by the group keep counting towards the limit until they are released.
+
+        Args:
+            group: group name
+        """
+        with self._condition:
+            self._quotas.pop(group, None)
+            self._processes_by_group.pop(group, None)
+            self._dispatch()
+
+    def metrics(self) -> dict:
+        """Returns queue and wait time statistics.
+
+        Returns:
+            dictionary with keys "limit", "process_count", "queue_depth", "acquisitions", "mean_wait_time",
+            "max_wait_time", "processes_by_group" and "waiting_by_group"
+        """
+        with self._condition:
+            limit = self._max_processes
+            if isinstance(limit, AdaptiveLimit):
+                limit = self._effective_limit if self._effective_limit is not None else limit.max_processes
+            return {
+                "limit": limit,
+                "process_count": self._process_count,
+                "queue_depth": len(self._waiting),
+                "acquisitions": self._acquisition_count,
+                "mean_wait_time": (self._total_wait_time / self._acquisition_count if self._acquisition_count else 0.0),
+                "max_wait_time": self._max_wait_time,
+                "processes_by_group": {group: count for group, count in self._processes_by_group.items() if count},
+                "waiting_by_group": dict(Counter(ticket.tag.group for ticket in self._waiting)),
+            }
+
+    def add_listener(self, listener: LimiterListener, group: str | None = None) -> None:
+        """Adds a function that gets called with a dictionary describing each adaptive limiter decision.
+
+        Listeners are called from the thread that acquires the semaphore and must not block.
+        A listener with a group receives only the decisions made on behalf of that group
+        and the decisions that no group triggered.
+
+        Args:
+            listener: listener to add
+            group: group to receive decisions for or None to receive all decisions
+        """
+        with self._condition:
+            self._listeners.append((listener, group))
+
+    def remove_listener(self, listener: LimiterListener) -> None:
+        """Removes a listener.
+
+        Args:
+            listener: listener to remove
+        """
+        with self._condition:
+            self._listeners = [(added, group) for added, group in self._listeners if added != listener]
+
+    def add_reclaimer(self, reclaimer: Reclaimer) -> None:
+        """Adds a function that frees a permit held by an idle resource when a waiter cannot be admitted.
+
+        Reclaimers are called only on behalf of waiters that are willing to wait.
+        They are called with the semaphore locked, must not block
+        and return True if they released a permit, False if they had nothing to free.
+
+        Args:
+            reclaimer: reclaimer to add
+        """
+        with self._condition:
+            self._reclaimers.append(reclaimer)
+
+    def _notify_listeners(self, decision_type: str, group: str | None, decision: dict | None = None) -> None:
+        """Calls listeners with given decision; caller must hold the condition.
+
+        Args:
+            decision_type: "limit_changed" or "deferred"
+            group: group on whose behalf the decision was made or None
+            decision: result of :meth:`AdaptiveLimit.evaluate`
+        """
+        data = {"limiter": self.name, "decision": decision_type, "process_count": self._process_count}
+        if decision is None:
+            data["effective_limit"] = self._effective_limit
+        else:
+            data.update(decision)
+        for listener, listener_group in list(self._listeners):
+            if listener_group is None or group is None or listener_group == group:
+                listener(data)
+
+    def set_limit(self, limit: int | Literal["unlimited"] | AdaptiveLimit) -> None:
         """Sets maximum number of processes.
 
         Args:
-            limit: maximum number of processes or "unlimited"
+            limit: maximum number of processes, "unlimited" or an adaptive limit
         """
-        with self._process_count_lock:
+        with self._condition:
             if limit == self._max_processes:
                 return
-            previous = self._max_processes
             self._max_processes = limit
-        if limit == "unlimited" or (previous != "unlimited" and limit > previous):
-            with self._start_process_condition:
-                self._start_process_condition.notify_all()
+            self._effective_limit = None
+            self._dispatch()
 
 
-one_shot_process_semaphore = ResourceSemaphore()
-persistent_process_semaphore = ResourceSemaphore()
+one_shot_process_semaphore = ResourceSemaphore("one_shot")
+persistent_process_semaphore = ResourceSemaphore("persistent")
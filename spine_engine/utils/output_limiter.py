@@ -0,0 +1,485 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+"""Utilities for logging process output to disk, limiting the rate at which it is forwarded as events
+and coalescing it into batches."""
+
+from collections import deque
+from collections.abc import Callable
+from hashlib import sha1
+import os
+from pathlib import Path
+import tempfile
+import threading
+import time
+from typing import Final, Literal, TextIO
+import weakref
+from .helpers import create_log_file_timestamp
+
+DEFAULT_OUTPUT_BURST: Final[int] = 1000
+"""Default number of lines that can be forwarded at once before rate limiting kicks in."""
+DEFAULT_TAIL_LENGTH: Final[int] = 100
+"""Default number of last suppressed lines that are forwarded when execution finishes."""
+DEFAULT_MAX_LOG_BYTES: Final[int] = 10 * 1024 * 1024
+"""Default size of an output log file before it gets rotated."""
+DEFAULT_LOG_BACKUP_COUNT: Final[int] = 3
+"""Default number of rotated output log files to keep."""
+DEFAULT_COALESCE_WINDOW: Final[float] = 0.05
+"""Default time in seconds output chunks are collected before they are forwarded together."""
+DEFAULT_COALESCE_SIZE: Final[int] = 64 * 1024
+"""Default number of collected characters that get forwarded regardless of the window."""
+
+
+class OutputLog:
+    """Rotating on-disk log of an item's process output.
+
+    The log file is created in item's logs directory when the first line gets written.
+    When the file grows beyond ``max_bytes``, it is renamed by appending ``.1`` to its name
+    (older backups are shifted to ``.2``, ``.3`` etc.) and a new file is started.
+    """
+
+    def __init__(
+        self, logs_dir: str, max_bytes: int = DEFAULT_MAX_LOG_BYTES, backup_count: int = DEFAULT_LOG_BACKUP_COUNT
+    ):
+        """
+        Args:
+            logs_dir: absolute path to item's logs directory
+            max_bytes: maximum size of the log file before rotation
+            backup_count: number of rotated files to keep
+        """
+        self._logs_dir = logs_dir
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._filter_id = ""
+        self._path = None
+        self._file: TextIO | None = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"logs_dir": self._logs_dir, "max_bytes": self._max_bytes, "backup_count": self._backup_count}
+
+    def __setstate__(self, state):
+        self.__init__(state["logs_dir"], state["max_bytes"], state["backup_count"])
+
+    @property
+    def path(self) -> str | None:
+        """Path to current log file or None if nothing has been written yet."""
+        return self._path
+
+    def set_filter_id(self, filter_id: str) -> None:
+        """Sets the filter id of the execution that owns the log.
+
+        Args:
+            filter_id: filter id
+        """
+        with self._lock:
+            self._filter_id = filter_id
+
+    def write(self, line: str) -> None:
+        """Appends a line to the log.
+
+        Args:
+            line: line to write
+        """
+        with self._lock:
+            if self._file is None:
+                self._open()
+            self._file.write(line)
+            if not line.endswith("\n"):
+                self._file.write("\n")
+            if self._max_bytes > 0 and self._file.tell() >= self._max_bytes:
+                self._rotate()
+
+    def flush(self) -> None:
+        """Flushes buffered lines to disk."""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self) -> None:
+        """Closes the log file; subsequent writes will reopen it."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def read(self, offset: int, length: int) -> bytes:
+        """Reads a byte range from the current log file.
+
+        Args:
+            offset: start of the range
+            length: maximum number of bytes to read
+
+        Returns:
+            bytes read
+        """
+        self.flush()
+        if self._path is None:
+            return b""
+        return read_output_log(self._path, offset, length)
+
+    def _open(self) -> None:
+        """Opens the log file; caller must hold the lock."""
+        if self._path is None:
+            Path(self._logs_dir).mkdir(parents=True, exist_ok=True)
+            suffix = "_" + sha1(bytes(self._filter_id, "utf8")).hexdigest() if self._filter_id else ""
+            self._path = os.path.join(self._logs_dir, f"output_{create_log_file_timestamp()}{suffix}.log")
+        self._file = open(self._path, "a", encoding="utf-8")
+
+    def _rotate(self) -> None:
+        """Moves current log file to a backup and starts a new one; caller must hold the lock."""
+        self._file.close()
+        self._file = None
+        if self._backup_count > 0:
+            for i in range(self._backup_count - 1, 0, -1):
+                backup = f"{self._path}.{i}"
+                if os.path.exists(backup):
+                    os.replace(backup, f"{self._path}.{i + 1}")
+            os.replace(self._path, self._path + ".1")
+        else:
+            os.remove(self._path)
+        self._open()
+
+
+def read_output_log(path: str, offset: int, length: int) -> bytes:
+    """Reads a byte range from an output log file.
+
+    Args:
+        path: path to log file
+        offset: start of the range
+        length: maximum number of bytes to read
+
+    Returns:
+        bytes read; empty if offset is beyond the end of file
+    """
+    with open(path, "rb") as log_file:
+        log_file.seek(max(0, offset))
+        return log_file.read(max(0, length))
+
+
+class OutputLimiter:
+    """Token bucket limiter for lines of process output.
+
+    Up to ``burst`` lines are admitted immediately; after that, lines are admitted at ``lines_per_second``.
+    Every line is written to the output log if one is given; otherwise lines that are not admitted
+    are written to a temporary spool file. The last ``tail_length`` suppressed lines are kept in memory
+    so they can be forwarded when execution finishes.
+    The spool file is removed when the limiter is garbage collected or :meth:`discard` is called.
+    """
+
+    def __init__(
+        self,
+        lines_per_second: float | Literal["unlimited"] = "unlimited",
+        burst: int = DEFAULT_OUTPUT_BURST,
+        output_log: OutputLog | None = None,
+        tail_length: int = DEFAULT_TAIL_LENGTH,
+    ):
+        """
+        Args:
+            lines_per_second: maximum sustained rate of admitted lines or "unlimited"
+            burst: maximum number of lines admitted at once
+            output_log: log that receives all lines
+            tail_length: number of last suppressed lines to keep
+        """
+        self._lines_per_second = lines_per_second
+        self._burst = max(1, burst)
+        self._tokens = float(self._burst)
+        self._last_refill = time.monotonic()
+        self._suppressed_count = 0
+        self._suppressed_tail = deque(maxlen=tail_length)
+        self._output_log = output_log
+        self._spool_path = None
+        self._spool_file = None
+        self._spool_finalizer = None
+        self._lock = threading.Lock()
+
+    @property
+    def spool_path(self) -> str | None:
+        """Path to the file containing suppressed lines or None if no lines have been suppressed."""
+        if self._output_log is not None:
+            return self._output_log.path
+        return self._spool_path
+
+    def admit(self, line: str, stream: str = "stdout") -> bool:
+        """Checks if a line of output should be forwarded.
+
+        Args:
+            line: line of output
+            stream: name of the stream the line came from, e.g. "stdout" or "stderr"
+
+        Returns:
+            True if line should be forwarded, False if it was suppressed
+        """
+        if self._output_log is not None:
+            self._output_log.write(line)
+        if self._lines_per_second == "unlimited":
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._lines_per_second)
+            self._last_refill = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            self._suppressed_count += 1
+            self._suppressed_tail.append((stream, line))
+            if self._output_log is None:
+                self._spool(line)
+            return False
+
+    def _spool(self, line: str) -> None:
+        """Writes a suppressed line to the spool file; caller must hold the lock."""
+        if self._spool_file is None:
+            if self._spool_path is None:
+                self._spool_file = tempfile.NamedTemporaryFile(
+                    "w", encoding="utf-8", prefix="spine_engine_output_", suffix=".log", delete=False
+                )
+                self._spool_path = self._spool_file.name
+                self._spool_finalizer = weakref.finalize(self, _remove_spool_file, self._spool_path)
+            else:
+                self._spool_file = open(self._spool_path, "a", encoding="utf-8")
+        self._spool_file.write(line)
+        if not line.endswith("\n"):
+            self._spool_file.write("\n")
+
+    def take_suppressed_summary(self) -> str | None:
+        """Returns a summary of lines suppressed since the last call and resets the counter.
+
+        Returns:
+            summary message or None if no lines have been suppressed
+        """
+        with self._lock:
+            return self._take_summary()
+
+    def _take_summary(self) -> str | None:
+        """Returns summary and resets counters; caller must hold the lock."""
+        if self._suppressed_count == 0:
+            return None
+        count = self._suppressed_count
+        self._suppressed_count = 0
+        if self._output_log is not None:
+            self._output_log.flush()
+        elif self._spool_file is not None:
+            self._spool_file.flush()
+        return f"{count} lines suppressed, full output in {self.spool_path}"
+
+    def finish(self) -> tuple[str | None, list[tuple[str, str]]]:
+        """Returns the final summary and the tail of suppressed lines, and closes files.
+
+        The tail holds the last suppressed lines of the whole execution, including lines
+        that were counted in earlier summaries.
+
+        Returns:
+            summary message or None if no lines were suppressed since the last summary,
+            and list of (stream, line) tuples
+        """
+        with self._lock:
+            tail = list(self._suppressed_tail)
+            summary = self._take_summary()
+        self.close()
+        return summary, tail
+
+    def close(self) -> None:
+        """Closes the spool file and the output log."""
+        with self._lock:
+            if self._spool_file is not None:
+                self._spool_file.close()
+                self._spool_file = None
+        if self._output_log is not None:
+            self._output_log.close()
+
+    def discard(self) -> None:
+        """Closes files and removes the spool file."""
+        self.close()
+        with self._lock:
+            if self._spool_finalizer is not None:
+                self._spool_finalizer()
+                self._spool_finalizer = None
+
+
+def _remove_spool_file(path: str) -> None:
+    """Removes a spool file if it still exists.
+
+    Args:
+        path: path to spool file
+    """
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class OutputRateLimit:
+    """Engine-wide limit for the rate of output lines forwarded per execution."""
+
+    def __init__(self):
+        self._lines_per_second = "unlimited"
+        self._burst = DEFAULT_OUTPUT_BURST
+        self._lock = threading.Lock()
+
+    def set_limit(self, lines_per_second: float | Literal["unlimited"], burst: int = DEFAULT_OUTPUT_BURST) -> None:
+        """Sets maximum output rate.
+
+        Args:
+            lines_per_second: maximum sustained rate in lines per second or "unlimited"
+            burst: maximum number of lines forwarded at once
+        """
+        with self._lock:
+            self._lines_per_second = lines_per_second
+            self._burst = burst
+
+    def make_limiter(self, output_log: OutputLog | None = None) -> OutputLimiter:
+        """Creates a limiter for a single execution.
+
+        Args:
+            output_log: log that receives all lines
+
+        Returns:
+            new output limiter
+        """
+        with self._lock:
+            return OutputLimiter(self._lines_per_second, self._burst, output_log)
+
+
+output_rate_limit = OutputRateLimit()
+
+
+def make_output_limiter(logger) -> OutputLimiter:
+    """Creates an output limiter for a single execution that writes to logger's output log if it has one.
+
+    Args:
+        logger (LoggerInterface): execution's logger
+
+    Returns:
+        OutputLimiter: new output limiter
+    """
+    output_log = getattr(logger, "output_log", None)
+    return output_rate_limit.make_limiter(output_log if isinstance(output_log, OutputLog) else None)
+
+
+def collapse_carriage_returns(text: str) -> str:
+    """Drops line contents that are overwritten by a later carriage return on the same line.
+
+    Only the final contents of an overwritten line are kept. A leading carriage return is retained
+    so the line still overwrites output forwarded earlier, as is a trailing one.
+
+    Args:
+        text: output text
+
+    Returns:
+        collapsed text
+    """
+    if "\r" not in text:
+        return text
+    lines = []
+    for line in text.split("\n"):
+        if "\r" in line:
+            parts = line.split("\r")
+            visible = [i for i, part in enumerate(parts) if part]
+            if not visible:
+                line = "\r"
+            else:
+                last = visible[-1]
+                line = ("\r" if last > 0 else "") + parts[last] + ("\r" if line.endswith("\r") else "")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class OutputCoalescer:
+    """Collects chunks of stream output and forwards them in batches.
+
+    Consecutive chunks of the same stream are joined, lines overwritten by carriage returns are collapsed,
+    and the result is forwarded once the oldest chunk has waited ``window`` seconds, the collected text
+    reaches ``max_chars`` characters or a chunk from another stream arrives.
+    Chunks are forwarded in the order they were added.
+    """
+
+    def __init__(
+        self,
+        forward: Callable[[str, str], None],
+        window: float = DEFAULT_COALESCE_WINDOW,
+        max_chars: int = DEFAULT_COALESCE_SIZE,
+    ):
+        """
+        Args:
+            forward: callable that receives stream name and coalesced text
+            window: maximum time in seconds a chunk is kept before forwarding
+            max_chars: maximum number of characters to collect before forwarding
+        """
+        self._forward = forward
+        self._window = window
+        self._max_chars = max_chars
+        self._condition = threading.Condition(threading.Lock())
+        self._stream = None
+        self._chunks = []
+        self._size = 0
+        self._started = 0.0
+        self._flusher = None
+        self._closed = False
+
+    def add(self, stream: str, text: str) -> None:
+        """Adds a chunk of output.
+
+        Args:
+            stream: name of the stream, e.g. "stdout" or "stderr"
+            text: chunk of output
+        """
+        with self._condition:
+            if self._chunks and stream != self._stream:
+                self._forward_chunks()
+            self._stream = stream
+            self._chunks.append(text)
+            self._size += len(text)
+            if self._closed or self._window <= 0.0 or self._size >= self._max_chars:
+                self._forward_chunks()
+                return
+            if len(self._chunks) == 1:
+                self._started = time.monotonic()
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                    self._flusher.start()
+                else:
+                    self._condition.notify()
+
+    def flush(self) -> None:
+        """Forwards collected output immediately."""
+        with self._condition:
+            self._forward_chunks()
+
+    def close(self) -> None:
+        """Forwards collected output and stops collecting; subsequent chunks are forwarded one by one."""
+        with self._condition:
+            self._forward_chunks()
+            self._closed = True
+            self._condition.notify()
+
+    def _forward_chunks(self) -> None:
+        """Forwards collected chunks; caller must hold the lock."""
+        if not self._chunks:
+            return
+        text = collapse_carriage_returns("".join(self._chunks))
+        self._chunks = []
+        self._size = 0
+        self._forward(self._stream, text)
+
+    def _flush_periodically(self) -> None:
+        """Target for the thread that forwards chunks that have waited for too long."""
+        with self._condition:
+            while True:
+                self._condition.wait_for(lambda: self._chunks or self._closed)
+                if self._closed:
+                    return
+                remaining = self._started + self._window - time.monotonic()
+                if remaining > 0.0:
+                    self._condition.wait(remaining)
+                    continue
+                self._forward_chunks()
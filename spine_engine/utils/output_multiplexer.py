@@ -0,0 +1,173 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+"""Contains the OutputMultiplexer that reads the output of child processes in a single thread."""
+
+from __future__ import annotations
+from collections.abc import Callable
+import codecs
+import os
+import selectors
+import sys
+import threading
+import traceback
+from typing import BinaryIO, Final
+
+LineCallback = Callable[[str], None]
+CloseCallback = Callable[[], None]
+
+CHUNK_SIZE: Final[int] = 64 * 1024
+"""Maximum number of bytes read from a stream at once."""
+_CAN_SELECT_PIPES: Final[bool] = sys.platform != "win32"
+
+
+class OutputMultiplexer:
+    """Reads the output streams of all managed child processes in a single thread.
+
+    Streams are read in chunks whenever the selector reports them readable.
+    Chunks are decoded incrementally and split into lines which are passed to the stream's line callback.
+    Once a stream reaches end-of-file, its close callback gets called.
+
+    The multiplexer reads from a duplicate of the stream's file descriptor,
+    so callers may close their stream at any time.
+    Windows cannot select on pipes; there each stream gets its own reader thread instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: list[_StreamReader] = []
+        self._selector = None
+        self._wakeup_fds = None
+        self._thread = None
+        self._pid = None
+
+    def add_stream(
+        self, stream: BinaryIO, line_callback: LineCallback, close_callback: CloseCallback | None = None
+    ) -> None:
+        """Starts reading lines from given stream.
+
+        Callbacks are called in the reader thread.
+
+        Args:
+            stream: binary output stream of a child process
+            line_callback: function that receives each decoded line without the line terminator
+            close_callback: function to call when the stream has been exhausted
+        """
+        if not _CAN_SELECT_PIPES:
+            threading.Thread(target=_read_lines, args=(stream, line_callback, close_callback), daemon=True).start()
+            return
+        reader = _StreamReader(os.dup(stream.fileno()), line_callback, close_callback)
+        with self._lock:
+            self._ensure_thread()
+            self._pending.append(reader)
+            os.write(self._wakeup_fds[1], b"\0")
+
+    def _ensure_thread(self) -> None:
+        """Starts the reader thread if it is not running in this process; caller must hold the lock."""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._pending = []
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_fds = os.pipe()
+        self._selector.register(self._wakeup_fds[0], selectors.EVENT_READ)
+        self._thread = threading.Thread(target=self._run, name="OutputMultiplexer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """Reads streams until the process exits."""
+        selector = self._selector
+        wakeup_fd = self._wakeup_fds[0]
+        while True:
+            for key, _ in selector.select():
+                if key.fd == wakeup_fd:
+                    os.read(wakeup_fd, CHUNK_SIZE)
+                    with self._lock:
+                        pending, self._pending = self._pending, []
+                    for reader in pending:
+                        selector.register(reader.fd, selectors.EVENT_READ, reader)
+                    continue
+                reader = key.data
+                try:
+                    data = os.read(reader.fd, CHUNK_SIZE)
+                except OSError:
+                    data = b""
+                if data:
+                    reader.feed(data)
+                else:
+                    selector.unregister(reader.fd)
+                    reader.finish()
+
+
+class _StreamReader:
+    """Decodes chunks of a stream into lines."""
+
+    def __init__(self, fd: int, line_callback: LineCallback, close_callback: CloseCallback | None):
+        """
+        Args:
+            fd: file descriptor to read from; owned by the reader
+            line_callback: function that receives each decoded line
+            close_callback: function to call when the stream has been exhausted
+        """
+        self.fd = fd
+        self._line_callback = line_callback
+        self._close_callback = close_callback
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._partial_line = ""
+
+    def feed(self, data: bytes) -> None:
+        """Passes the complete lines in data to the line callback.
+
+        Args:
+            data: chunk of output
+        """
+        *lines, self._partial_line = (self._partial_line + self._decoder.decode(data)).split("\n")
+        for line in lines:
+            _call_safely(self._line_callback, line)
+
+    def finish(self) -> None:
+        """Passes the last incomplete line to the line callback, closes the file descriptor
+        and calls the close callback."""
+        last_line = self._partial_line + self._decoder.decode(b"", final=True)
+        if last_line:
+            _call_safely(self._line_callback, last_line)
+        os.close(self.fd)
+        if self._close_callback is not None:
+            _call_safely(self._close_callback)
+
+
+def _call_safely(callback: Callable, *args) -> None:
+    """Calls callback printing the traceback of any exception so that it won't stop the reader thread."""
+    try:
+        callback(*args)
+    except Exception:  # pylint: disable=broad-except
+        traceback.print_exc()
+
+
+def _read_lines(stream: BinaryIO, line_callback: LineCallback, close_callback: CloseCallback | None) -> None:
+    """Reads stream line by line in the calling thread.
+
+    Args:
+        stream: binary stream
+        line_callback: function that receives each decoded line
+        close_callback: function to call when the stream has been exhausted
+    """
+    try:
+        for line in iter(stream.readline, b""):
+            line_callback(line.decode("UTF8", "replace").rstrip("\n"))
+    except ValueError:
+        pass
+    if close_callback is not None:
+        close_callback()
+
+
+output_multiplexer = OutputMultiplexer()
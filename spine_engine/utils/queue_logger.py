@@ -10,21 +10,181 @@
 # this program. If not, see <http://www.gnu.org/licenses/>.
 ######################################################################################################################
 
-"""The QueueLogger class."""
+"""The QueueLogger class, the BatchingQueue event transport and the PromptBroker."""
 
-from collections.abc import Callable
+from __future__ import annotations
+from collections.abc import Callable, Collection, Iterable
+import itertools
+import multiprocessing as mp
+from multiprocessing import util
 from multiprocessing.queues import Queue
+import os
+import threading
 import time
 from typing import Any, Final
+import warnings
+import weakref
+from .output_limiter import OutputLog
 
 Slot = Callable[[dict[str, Any]], None]
 
+DEFAULT_BATCH_SIZE: Final[int] = 200
+"""Default maximum number of events in a batch."""
+DEFAULT_BATCH_DELAY: Final[float] = 0.05
+"""Default maximum time in seconds an event waits in the batch buffer."""
+
+_batch_buffer_lock = threading.Lock()
+
+
+class BatchingQueue:
+    """A queue-like transport that coalesces events into batches before putting them into an underlying queue.
+
+    Each ``put()`` appends the event to a buffer which is put into the underlying queue as a single list
+    once it contains ``max_batch_size`` events or its oldest event is older than ``max_delay`` seconds.
+    Events whose type is in ``URGENT_EVENT_TYPES`` flush the buffer immediately.
+    Event order is preserved within the process that puts the events.
+
+    The instance can be passed to child processes; each process buffers its events separately
+    and flushes the buffer when it exits.
+    """
+
+    URGENT_EVENT_TYPES: Final[frozenset[str]] = frozenset(
+        ("dag_exec_finished", "exec_finished", "exec_started", "prompt", "server_status_msg")
+    )
+
+    def __init__(self, queue: Queue, max_batch_size: int = DEFAULT_BATCH_SIZE, max_delay: float = DEFAULT_BATCH_DELAY):
+        """
+        Args:
+            queue: underlying queue that receives lists of events
+            max_batch_size: maximum number of events in a batch
+            max_delay: maximum time in seconds an event is kept in the buffer
+        """
+        self._queue = queue
+        self._max_batch_size = max(1, max_batch_size)
+        self._max_delay = max_delay
+        self._pid = None
+        self._buffer = None
+        self._process_buffer()
+
+    def __getstate__(self):
+        return {"queue": self._queue, "max_batch_size": self._max_batch_size, "max_delay": self._max_delay}
+
+    def __setstate__(self, state):
+        self.__init__(state["queue"], state["max_batch_size"], state["max_delay"])
+
+    def _process_buffer(self) -> _BatchBuffer:
+        """Returns the batch buffer of current process creating a new one if needed."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._buffer
+        with _batch_buffer_lock:
+            if self._pid != pid:
+                self._buffer = _BatchBuffer(self._queue, self._max_batch_size, self._max_delay, self.URGENT_EVENT_TYPES)
+                util.Finalize(self, _BatchBuffer.close, args=(self._buffer,), exitpriority=20)
+                self._pid = pid
+        return self._buffer
+
+    def put(self, event: tuple[str, Any]) -> None:
+        """Puts an event into the batch buffer.
+
+        Args:
+            event: event type and data
+        """
+        self._process_buffer().put(event)
+
+    def get(self, block: bool = True, timeout: float | None = None) -> list[tuple[str, Any]]:
+        """Returns the next batch of events from the underlying queue.
+
+        Args:
+            block: if True, waits for a batch to become available
+            timeout: timeout in seconds when blocking
+
+        Returns:
+            list of events
+        """
+        return self._queue.get(block, timeout)
+
+    def flush(self) -> None:
+        """Puts buffered events into the underlying queue immediately."""
+        self._process_buffer().flush()
+
+    def close(self) -> None:
+        """Flushes the buffer and stops batching in current process.
+
+        Subsequent events are put into the underlying queue one by one.
+        """
+        self._process_buffer().close()
+
+
+class _BatchBuffer:
+    """Per-process event buffer of :class:`BatchingQueue`."""
+
+    def __init__(self, queue: Queue, max_batch_size: int, max_delay: float, urgent_event_types: frozenset[str]):
+        self._queue = queue
+        self._max_batch_size = max_batch_size
+        self._max_delay = max_delay
+        self._urgent_event_types = urgent_event_types
+        self._condition = threading.Condition(threading.Lock())
+        self._events = []
+        self._started = 0.0
+        self._flusher = None
+        self._closed = False
+
+    def put(self, event: tuple[str, Any]) -> None:
+        with self._condition:
+            if self._closed:
+                self._queue.put([event])
+                return
+            self._events.append(event)
+            if len(self._events) >= self._max_batch_size or event[0] in self._urgent_event_types:
+                self._flush_events()
+                return
+            if len(self._events) == 1:
+                self._started = time.monotonic()
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                    self._flusher.start()
+                else:
+                    self._condition.notify()
+
+    def flush(self) -> None:
+        with self._condition:
+            self._flush_events()
+
+    def close(self) -> None:
+        with self._condition:
+            self._flush_events()
+            self._closed = True
+            self._condition.notify()
+
+    def _flush_events(self) -> None:
+        """Puts buffered events into the queue; caller must hold the lock."""
+        if not self._events:
+            return
+        batch = self._events
+        self._events = []
+        self._queue.put(batch)
+
+    def _flush_periodically(self) -> None:
+        """Target for the thread that flushes events that have waited in the buffer for too long."""
+        with self._condition:
+            while True:
+                self._condition.wait_for(lambda: self._events or self._closed)
+                if self._closed:
+                    return
+                remaining = self._started + self._max_delay - time.monotonic()
+                if remaining > 0.0:
+                    self._condition.wait(remaining)
+                    continue
+                self._flush_events()
+
 
 class _MessageBase:
-    def __init__(self, queue: Queue, item_name: str, event_type: str):
+    def __init__(self, queue: Queue, item_name: str, event_type: str, enabled: bool = True):
         self._queue = queue
         self._event_type = event_type
         self._item_name = item_name
+        self._enabled = enabled
         self._filter_id = ""
         self._slots = []
 
@@ -38,8 +198,8 @@ class _MessageBase:
 
     def emit(self, msg: dict[str, Any]) -> None:
         msg = dict(filter_id=self._filter_id, **msg)
-        full_msg = (self._event_type, dict(item_name=self._item_name, **msg))
-        self._queue.put(full_msg)
+        if self._enabled:
+            self._queue.put((self._event_type, dict(item_name=self._item_name, **msg)))
         for slot in self._slots:
             slot(msg)
 
@@ -51,8 +211,8 @@ class _MessageBase:
 
 
 class _Message(_MessageBase):
-    def __init__(self, queue: Queue, item_name: str, event_type: str, msg_type: str):
-        super().__init__(queue, item_name, event_type)
+    def __init__(self, queue: Queue, item_name: str, event_type: str, msg_type: str, enabled: bool = True):
+        super().__init__(queue, item_name, event_type, enabled)
         self._msg_type = msg_type
 
     def emit(self, msg_text: str) -> None:
@@ -74,32 +234,207 @@ class SuppressedMessage:
         """Don't connect anything"""
 
 
-class _Prompt(_MessageBase):
-    _PENDING: Final[object] = object()
+class PromptBroker:
+    """Passes prompts from items to the engine's client and wakes up the items once answers arrive.
 
-    def __init__(self, queue: Queue, item_name: str, prompt_queue: Queue, answered_prompts: dict[str, Any]):
-        super().__init__(queue, item_name, "prompt")
+    Answers are cached by prompt so that the same question is asked only once per engine;
+    items that ask a question that is already pending wait for the first answer.
+
+    Prompters that get passed to child processes receive their answers through a :class:`multiprocessing.Queue`
+    which is created lazily when the prompter is pickled or prepared with :func:`prepare_prompts_for_fork`.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._answers: dict[str, Any] = {}
+        self._pending: set[str] = set()
+        self._awaited_keys: dict[int, str] = {}
+        self._prompters: weakref.WeakValueDictionary[int, _Prompt] = weakref.WeakValueDictionary()
+        self._remote_channels: dict[int, mp.Queue] = {}
+        self._prompter_ids = itertools.count()
+        self._owner_pid = os.getpid()
+
+    @property
+    def owner_pid(self) -> int:
+        """Id of the process that answers prompts."""
+        return self._owner_pid
+
+    def register(self, prompter: _Prompt) -> int:
+        """Registers a new prompter.
+
+        Args:
+            prompter: prompter
+
+        Returns:
+            prompter id
+        """
+        with self._condition:
+            prompter_id = next(self._prompter_ids)
+            self._prompters[prompter_id] = prompter
+            return prompter_id
+
+    def ask(self, prompter_id: int, prompt_data: Any, queue: Queue) -> Any:
+        """Puts a prompt event into the event queue unless the prompt is pending or answered
+        and waits for the answer.
+
+        Args:
+            prompter_id: prompter id
+            prompt_data: prompt
+            queue: event queue
+
+        Returns:
+            answer
+        """
+        key = str(prompt_data)
+        with self._condition:
+            if key not in self._answers and key not in self._pending:
+                self._pending.add(key)
+                self._awaited_keys[prompter_id] = key
+                queue.put(("prompt", {"prompter_id": prompter_id, "data": prompt_data}))
+            self._condition.wait_for(lambda: key in self._answers)
+            return self._answers[key]
+
+    def answer(self, prompter_id: int, answer: Any) -> None:
+        """Answers prompter's pending prompt.
+
+        Args:
+            prompter_id: prompter id
+            answer: answer
+        """
+        with self._condition:
+            key = self._awaited_keys.pop(prompter_id, None)
+            if key is not None:
+                self._pending.discard(key)
+                self._answers[key] = answer
+                self._condition.notify_all()
+                return
+            channel = self._remote_channels.get(prompter_id)
+        if channel is None:
+            raise KeyError(f"no prompt pending for prompter {prompter_id}")
+        channel.put(answer)
+
+    def remote_channel(self, prompter_id: int) -> mp.Queue:
+        """Returns a channel for delivering answers to given prompter in another process creating it if needed.
+
+        Args:
+            prompter_id: prompter id
+
+        Returns:
+            answer channel
+        """
+        with self._condition:
+            channel = self._remote_channels.get(prompter_id)
+            if channel is None:
+                channel = self._remote_channels[prompter_id] = mp.Queue()
+            return channel
+
+
+class _LegacyPromptBroker(PromptBroker):
+    """Adapts the deprecated prompt queue and answer cache arguments of :class:`QueueLogger` to a broker.
+
+    The client answers by putting the answer into the prompt queue whose id is the prompter id.
+    """
+
+    def __init__(self, prompt_queue: Queue, answered_prompts: dict[str, Any] | None):
+        """
+        Args:
+            prompt_queue: queue for prompt answers
+            answered_prompts: cache of answered prompts
+        """
+        super().__init__()
         self._prompt_queue = prompt_queue
-        self._answered_prompts = answered_prompts
+        if answered_prompts is not None:
+            self._answers = answered_prompts
+
+    def register(self, prompter: _Prompt) -> int:
+        return id(self._prompt_queue)
+
+    def ask(self, prompter_id: int, prompt_data: Any, queue: Queue) -> Any:
+        key = str(prompt_data)
+        with self._condition:
+            if key in self._answers:
+                return self._answers[key]
+        queue.put(("prompt", {"prompter_id": prompter_id, "data": prompt_data}))
+        answer = self._prompt_queue.get()
+        with self._condition:
+            self._answers[key] = answer
+        return answer
+
+    def answer(self, prompter_id: int, answer: Any) -> None:
+        self._prompt_queue.put(answer)
+
+    def remote_channel(self, prompter_id: int) -> mp.Queue:
+        return self._prompt_queue
+
+
+def prepare_prompts_for_fork(objects: Iterable[Any]) -> None:
+    """Creates remote answer channels for prompters that are about to be passed to a forked process.
+
+    Forked processes inherit prompters without pickling them, so this must be called before the fork
+    for the child to be able to receive answers. Prompters are looked up among given objects
+    and the ``prompt`` attributes of given loggers.
+
+    Args:
+        objects: target arguments of the process
+    """
+    for obj in objects:
+        prompt = obj if isinstance(obj, _Prompt) else getattr(obj, "prompt", None)
+        if isinstance(prompt, _Prompt) and os.getpid() == prompt.owner_pid:
+            prompt.ensure_remote_channel()
+
+
+class _Prompt(_MessageBase):
+    def __init__(self, queue: Queue, item_name: str, prompt_broker: PromptBroker):
+        super().__init__(queue, item_name, "prompt")
+        self._broker = prompt_broker
+        self._prompter_id = prompt_broker.register(self)
+        self._owner_pid = prompt_broker.owner_pid
+        self._remote_channel = None
+        self._remote_answers = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_broker"] = None
+        state["_remote_channel"] = self.ensure_remote_channel()
+        return state
+
+    @property
+    def prompter_id(self) -> int:
+        return self._prompter_id
+
+    @property
+    def owner_pid(self) -> int:
+        return self._owner_pid
+
+    def ensure_remote_channel(self) -> mp.Queue:
+        """Returns the channel that delivers answers to this prompter in other processes.
+
+        Returns:
+            answer channel
+        """
+        if self._remote_channel is None:
+            self._remote_channel = self._broker.remote_channel(self._prompter_id)
+        return self._remote_channel
 
     def emit(self, prompt_data: Any) -> Any:
+        if os.getpid() == self._owner_pid:
+            return self._broker.ask(self._prompter_id, prompt_data, self._queue)
+        if self._remote_channel is None:
+            raise RuntimeError("prompter was not prepared for the fork; call prepare_prompts_for_fork() before it")
         key = str(prompt_data)
-        if key not in self._answered_prompts:
-            self._answered_prompts[key] = self._PENDING
-            prompt = {"prompter_id": id(self._prompt_queue), "data": prompt_data}
-            self._queue.put(("prompt", prompt))
-            self._answered_prompts[key] = self._prompt_queue.get()
-        while self._answered_prompts[key] is self._PENDING:
-            time.sleep(0.02)
-        return self._answered_prompts[key]
+        if key not in self._remote_answers:
+            self._queue.put(("prompt", {"prompter_id": self._prompter_id, "data": prompt_data}))
+            self._remote_answers[key] = self._remote_channel.get()
+        return self._remote_answers[key]
 
 
 class _Flash(_MessageBase):
-    def __init__(self, queue: Queue, item_name: str):
-        super().__init__(queue, item_name, "flash")
+    def __init__(self, queue: Queue, item_name: str, enabled: bool = True):
+        super().__init__(queue, item_name, "flash", enabled)
 
     def emit(self) -> None:
-        self._queue.put(("flash", {"item_name": self._item_name}))
+        if self._enabled:
+            self._queue.put(("flash", {"item_name": self._item_name}))
 
 
 class QueueLogger:
@@ -109,27 +444,64 @@ class QueueLogger:
         self,
         queue: Queue,
         item_name: str,
-        prompt_queue: Queue | None,
-        answered_prompts: dict[str, Any] | None,
+        prompt_broker: PromptBroker | Queue | None,
+        answered_prompts: dict[str, Any] | None = None,
         silent: bool = False,
+        logs_dir: str | None = None,
+        event_types: Collection[str] | None = None,
     ):
+        """
+        Args:
+            queue: event queue
+            item_name: item's name
+            prompt_broker: broker that handles prompts; if None, prompts are suppressed;
+                passing a queue for prompt answers instead is deprecated
+            answered_prompts: deprecated cache of answered prompts; used only with a queue for prompt answers
+            silent: if True, messages are not put into the event queue
+            logs_dir: item's logs directory; if given, process output is spooled to a log file there
+            event_types: event types to put into the event queue; if None, all events are put;
+                if prompts are not included, they are suppressed
+        """
+        if prompt_broker is not None and not isinstance(prompt_broker, PromptBroker):
+            warnings.warn(
+                "passing a prompt queue and answered prompts to QueueLogger is deprecated, pass a PromptBroker instead",
+                DeprecationWarning,
+                stacklevel=2,
+            )
+            prompt_broker = _LegacyPromptBroker(prompt_broker, answered_prompts)
         self._silent = silent
+        self.output_log = OutputLog(logs_dir) if logs_dir is not None else None
+
+        def subscribed(event_type):
+            return event_types is None or event_type in event_types
+
         message = _Message if not silent else SuppressedMessage
         execution_message = _ExecutionMessage if not silent else SuppressedMessage
-        self.flash = _Flash(queue, item_name)
-        self.msg = message(queue, item_name, "event_msg", "msg")
-        self.msg_success = message(queue, item_name, "event_msg", "msg_success")
-        self.msg_warning = message(queue, item_name, "event_msg", "msg_warning")
-        self.msg_error = message(queue, item_name, "event_msg", "msg_error")
-        self.msg_proc = message(queue, item_name, "process_msg", "msg")
-        self.msg_proc_error = message(queue, item_name, "process_msg", "msg_error")
-        self.msg_standard_execution = execution_message(queue, item_name, "standard_execution_msg")
-        self.msg_persistent_execution = execution_message(queue, item_name, "persistent_execution_msg")
-        self.msg_kernel_execution = execution_message(queue, item_name, "kernel_execution_msg")
-        if prompt_queue is None:
+        event_msg = subscribed("event_msg")
+        process_msg = subscribed("process_msg")
+        self.flash = _Flash(queue, item_name, subscribed("flash"))
+        self.msg = message(queue, item_name, "event_msg", "msg", event_msg)
+        self.msg_success = message(queue, item_name, "event_msg", "msg_success", event_msg)
+        self.msg_warning = message(queue, item_name, "event_msg", "msg_warning", event_msg)
+        self.msg_error = message(queue, item_name, "event_msg", "msg_error", event_msg)
+        self.msg_proc = message(queue, item_name, "process_msg", "msg", process_msg)
+        self.msg_proc_error = message(queue, item_name, "process_msg", "msg_error", process_msg)
+        self.msg_standard_execution = execution_message(
+            queue, item_name, "standard_execution_msg", subscribed("standard_execution_msg")
+        )
+        self.msg_persistent_execution = execution_message(
+            queue, item_name, "persistent_execution_msg", subscribed("persistent_execution_msg")
+        )
+        self.msg_kernel_execution = execution_message(
+            queue, item_name, "kernel_execution_msg", subscribed("kernel_execution_msg")
+        )
+        self.msg_resource_usage = execution_message(
+            queue, item_name, "resource_usage_msg", subscribed("resource_usage_msg")
+        )
+        if prompt_broker is None or not subscribed("prompt"):
             self.prompt = SuppressedMessage()
         else:
-            self.prompt = _Prompt(queue, item_name, prompt_queue, answered_prompts)
+            self.prompt = _Prompt(queue, item_name, prompt_broker)
 
     def set_filter_id(self, filter_id: str) -> None:
         if not self._silent:
@@ -142,4 +514,7 @@ class QueueLogger:
             self.msg_standard_execution.filter_id = filter_id
             self.msg_persistent_execution.filter_id = filter_id
             self.msg_kernel_execution.filter_id = filter_id
+            self.msg_resource_usage.filter_id = filter_id
         self.prompt.filter_id = filter_id
+        if self.output_log is not None:
+            self.output_log.set_filter_id(filter_id)
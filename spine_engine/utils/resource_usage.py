@@ -0,0 +1,241 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+"""Utilities for measuring the resources used by executions."""
+
+from __future__ import annotations
+from dataclasses import asdict, dataclass
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Literal
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ExecutionType = Literal["process", "persistent", "kernel", "returning_process"]
+
+_BLOCK_SIZE = 512
+_MAX_RSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+@dataclass
+class ResourceUsage:
+    """Resources used by a single execution.
+
+    Fields that could not be measured on the current platform are None.
+    """
+
+    wall_time: float
+    """Elapsed time in seconds."""
+    user_time: float | None = None
+    """CPU time spent in user mode in seconds."""
+    system_time: float | None = None
+    """CPU time spent in kernel mode in seconds."""
+    max_rss: int | None = None
+    """Peak resident set size in bytes."""
+    read_bytes: int | None = None
+    """Bytes read from storage."""
+    written_bytes: int | None = None
+    """Bytes written to storage."""
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def wait_for_process(process: subprocess.Popen, start_time: float) -> tuple[int, ResourceUsage]:
+    """Waits for a child process to finish and collects its resource usage.
+
+    On platforms that support ``os.wait4()``, the process is reaped here so its rusage can be read.
+    The process is first waited for without reaping it; it is then reaped under Popen's own wait lock
+    and its return code is updated there, so concurrent :meth:`subprocess.Popen.terminate` calls
+    never signal a reaped process id.
+
+    Args:
+        process: child process
+        start_time: process start time from :func:`time.monotonic`
+
+    Returns:
+        process' exit code and resource usage
+    """
+    if hasattr(os, "wait4") and hasattr(process, "_waitpid_lock"):
+        if hasattr(os, "waitid") and hasattr(os, "WNOWAIT"):
+            try:
+                os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+            except ChildProcessError:
+                pass
+        with process._waitpid_lock:
+            if process.returncode is None:
+                try:
+                    _, status, rusage = os.wait4(process.pid, 0)
+                except ChildProcessError:
+                    pass
+                else:
+                    process.returncode = os.waitstatus_to_exitcode(status)
+                    return process.returncode, _usage_from_rusage(rusage, time.monotonic() - start_time)
+    return_code = process.wait()
+    return return_code, ResourceUsage(time.monotonic() - start_time)
+
+
+def measure_self(start_time: float, baseline: Any | None = None) -> ResourceUsage:
+    """Measures resource usage of the current process.
+
+    Args:
+        start_time: measurement start time from :func:`time.monotonic`
+        baseline: rusage from :func:`self_rusage` taken at start; if given, CPU time and I/O are deltas
+
+    Returns:
+        resource usage
+    """
+    wall_time = time.monotonic() - start_time
+    if resource is None:
+        return ResourceUsage(wall_time)
+    usage = _usage_from_rusage(resource.getrusage(resource.RUSAGE_SELF), wall_time)
+    if baseline is not None:
+        usage.user_time -= baseline.ru_utime
+        usage.system_time -= baseline.ru_stime
+        usage.read_bytes -= baseline.ru_inblock * _BLOCK_SIZE
+        usage.written_bytes -= baseline.ru_oublock * _BLOCK_SIZE
+    return usage
+
+
+def self_rusage() -> Any | None:
+    """Returns current process' rusage or None if not supported."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF)
+
+
+def _usage_from_rusage(rusage: Any, wall_time: float) -> ResourceUsage:
+    return ResourceUsage(
+        wall_time=wall_time,
+        user_time=rusage.ru_utime,
+        system_time=rusage.ru_stime,
+        max_rss=rusage.ru_maxrss * _MAX_RSS_UNIT,
+        read_bytes=rusage.ru_inblock * _BLOCK_SIZE,
+        written_bytes=rusage.ru_oublock * _BLOCK_SIZE,
+    )
+
+
+class ProcessSampler:
+    """Measures the resources a long-running process uses between two points in time.
+
+    Statistics are read from ``/proc`` and are therefore available on Linux only.
+    Peak RSS is the process' lifetime peak.
+    """
+
+    def __init__(self, pid: int | None):
+        """
+        Args:
+            pid: process id or None if unknown
+        """
+        self._pid = pid
+        self._start_time = time.monotonic()
+        self._start_stats = _read_proc_stats(pid)
+
+    def stop(self) -> ResourceUsage:
+        """Returns resources used since the sampler was created.
+
+        Returns:
+            resource usage
+        """
+        usage = ResourceUsage(time.monotonic() - self._start_time)
+        end_stats = _read_proc_stats(self._pid)
+        if self._start_stats is None or end_stats is None:
+            return usage
+        usage.user_time = end_stats["user_time"] - self._start_stats["user_time"]
+        usage.system_time = end_stats["system_time"] - self._start_stats["system_time"]
+        usage.max_rss = end_stats["max_rss"]
+        if end_stats["read_bytes"] is not None and self._start_stats["read_bytes"] is not None:
+            usage.read_bytes = end_stats["read_bytes"] - self._start_stats["read_bytes"]
+            usage.written_bytes = end_stats["written_bytes"] - self._start_stats["written_bytes"]
+        return usage
+
+
+def current_rss(pid: int | None) -> int | None:
+    """Returns the current resident set size of a process.
+
+    Available on Linux only.
+
+    Args:
+        pid: process id
+
+    Returns:
+        resident set size in bytes or None if not available
+    """
+    if pid is None:
+        return None
+    try:
+        with open(os.path.join("/proc", str(pid), "status"), encoding="utf-8") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def _read_proc_stats(pid: int | None) -> dict[str, Any] | None:
+    """Reads CPU times, peak RSS and I/O counters of a process from /proc.
+
+    Args:
+        pid: process id
+
+    Returns:
+        statistics or None if not available
+    """
+    if pid is None:
+        return None
+    proc_dir = os.path.join("/proc", str(pid))
+    try:
+        with open(os.path.join(proc_dir, "stat"), encoding="utf-8") as stat_file:
+            fields = stat_file.read().rpartition(")")[2].split()
+        with open(os.path.join(proc_dir, "status"), encoding="utf-8") as status_file:
+            max_rss = None
+            for line in status_file:
+                if line.startswith("VmHWM:"):
+                    max_rss = int(line.split()[1]) * 1024
+                    break
+    except (OSError, IndexError, ValueError):
+        return None
+    ticks = os.sysconf("SC_CLK_TCK")
+    stats = {
+        "user_time": int(fields[11]) / ticks,
+        "system_time": int(fields[12]) / ticks,
+        "max_rss": max_rss,
+        "read_bytes": None,
+        "written_bytes": None,
+    }
+    try:
+        with open(os.path.join(proc_dir, "io"), encoding="utf-8") as io_file:
+            counters = dict(line.split(":") for line in io_file if ":" in line)
+        stats["read_bytes"] = int(counters["read_bytes"])
+        stats["written_bytes"] = int(counters["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        pass
+    return stats
+
+
+def emit_resource_usage(logger, execution_type: ExecutionType, usage: ResourceUsage) -> None:
+    """Emits resource usage through logger if it supports resource usage messages.
+
+    Args:
+        logger (LoggerInterface): logger
+        execution_type: type of execution
+        usage: resource usage
+    """
+    signal = getattr(logger, "msg_resource_usage", None)
+    if signal is not None:
+        signal.emit({"execution_type": execution_type, **usage.to_dict()})
@@ -15,11 +15,52 @@ The ReturningProcess class.
 
 """
 
+import atexit
 from contextlib import contextmanager
 from enum import Enum, auto, unique
+import io
 import multiprocessing as mp
+from multiprocessing.queues import Queue
+from multiprocessing.reduction import ForkingPickler
+import pickle
+from queue import Empty
 import threading
-from .execution_resources import one_shot_process_semaphore
+import time
+import traceback
+from typing import Any, NamedTuple
+from .execution_resources import current_acquisition_tag, one_shot_process_semaphore
+from .queue_logger import BatchingQueue, _Prompt, prepare_prompts_for_fork
+from .resource_usage import ResourceUsage, measure_self, self_rusage
+
+DEFAULT_MAX_IDLE_WORKERS = 4
+"""Default number of idle worker processes kept by the returning process pool."""
+
+
+class _Completion(NamedTuple):
+    """Return value of a target together with the resources it used."""
+
+    return_value: Any
+    resource_usage: ResourceUsage
+
+
+class _RelayedPut(NamedTuple):
+    """An item put into a relayed queue in a worker process."""
+
+    index: int
+    item: Any
+
+
+class _RelayedPrompt(NamedTuple):
+    """A prompt emitted by a relayed prompter in a worker process."""
+
+    index: int
+    prompt_data: Any
+
+
+class _RelayedAnswer(NamedTuple):
+    """Answer to a relayed prompt."""
+
+    answer: Any
 
 
 class ReturningProcess(mp.Process):
@@ -28,6 +69,9 @@ class ReturningProcess(mp.Process):
         self._queue = mp.Queue()
         self._terminated = False
         self.maybe_idle = _MaybeIdle()  # target functions should enter this context whenever they may become idle
+        self.resource_usage = None
+        """ResourceUsage of the last run or None if not available;
+        callers can pass it to :func:`resource_usage.emit_resource_usage`."""
 
     def run_until_complete(self):
         """Starts the process and joins it after it has finished.
@@ -39,17 +83,29 @@ class ReturningProcess(mp.Process):
             if self._terminated:
                 return (False,)
             with self.maybe_idle.listen():
+                start_time = time.monotonic()
                 self.start()
                 return_value = self._queue.get()
                 self.join()
+            if isinstance(return_value, _Completion):
+                self.resource_usage = return_value.resource_usage
+                self.resource_usage.wall_time = time.monotonic() - start_time
+                return_value = return_value.return_value
             return return_value
 
+    def start(self):
+        if mp.get_start_method() == "fork":
+            # Forked children inherit the arguments without pickling, so prompters need answer channels now
+            prepare_prompts_for_fork((*self._args, *self._kwargs.values()))
+        super().start()
+
     def run(self):
         if not self._target:
             self._queue.put((False,))
             return
+        start_time = time.monotonic()
         return_value = self._target(self, *self._args, **self._kwargs)
-        self._queue.put(return_value)
+        self._queue.put(_Completion(return_value, measure_self(start_time)))
 
     def terminate(self):
         self._terminated = True
@@ -70,8 +126,12 @@ class _MaybeIdle:
         ENTER = auto()
         EXIT = auto()
 
-    def __init__(self):
-        self._queue = mp.Queue()
+    def __init__(self, queue=None):
+        """
+        Args:
+            queue (multiprocessing.Queue, optional): queue for idle events; a new queue is created if not given
+        """
+        self._queue = queue if queue is not None else mp.Queue()
 
     def __enter__(self):
         self._queue.put(self._Event.ENTER)
@@ -81,7 +141,7 @@ class _MaybeIdle:
 
     @contextmanager
     def listen(self):
-        thread = threading.Thread(target=self._do_listen)
+        thread = threading.Thread(target=self._do_listen, args=(current_acquisition_tag(),))
         thread.start()
         try:
             yield
@@ -89,17 +149,343 @@ class _MaybeIdle:
             self._queue.put(None)
             thread.join()
 
-    def _do_listen(self):
+    def _do_listen(self, tag):
         while True:
             event = self._queue.get()
             if event == self._Event.ENTER:
-                one_shot_process_semaphore.release()
+                one_shot_process_semaphore.release(tag)
             elif event == self._Event.EXIT:
-                one_shot_process_semaphore.acquire()
+                one_shot_process_semaphore.acquire(tag=tag)
             elif event is None:
                 break
 
 
+class PooledReturningProcess:
+    """A drop-in replacement for :class:`ReturningProcess` that runs its target in a warm worker process.
+
+    Workers are taken from :data:`returning_process_pool` and returned there once the target has finished.
+    Unlike with :class:`ReturningProcess`, the target and its arguments must be picklable;
+    they are pickled in the calling thread so pickling errors are raised by :meth:`run_until_complete`.
+    Multiprocessing queues, event queues and prompters among the arguments, e.g. those of loggers,
+    stay in the calling process: the worker gets stand-ins that relay their use over the worker's message queue,
+    so events put by the target arrive before its return value.
+    The target receives a context object as its first argument instead of the process;
+    its ``maybe_idle`` attribute works the same as :attr:`ReturningProcess.maybe_idle`.
+    """
+
+    def __init__(self, target=None, args=(), kwargs=None):
+        """
+        Args:
+            target (Callable, optional): function to run in worker process
+            args (tuple): positional arguments for target
+            kwargs (dict, optional): keyword arguments for target
+        """
+        self._target = target
+        self._args = args
+        self._kwargs = kwargs if kwargs is not None else {}
+        self._worker = None
+        self._terminated = False
+        self._lock = threading.Lock()
+        self.resource_usage = None
+        """ResourceUsage of the last run or None if not available; peak RSS is the worker's lifetime peak."""
+
+    def run_until_complete(self):
+        """Runs the target in a worker process and waits for it to finish.
+
+        Returns:
+            tuple: Return value of the target where the first element is a status flag
+        """
+        if not self._target:
+            return (False,)
+        with one_shot_process_semaphore:
+            with self._lock:
+                if self._terminated:
+                    return (False,)
+                self._worker = returning_process_pool.acquire()
+            try:
+                return_value = self._worker.run(self._target, self._args, self._kwargs, lambda: self._terminated)
+                self.resource_usage = self._worker.last_resource_usage
+                return return_value
+            finally:
+                with self._lock:
+                    if not self._terminated:
+                        returning_process_pool.release(self._worker)
+                    self._worker = None
+
+    def terminate(self):
+        """Kills the worker process if the target is running."""
+        with self._lock:
+            self._terminated = True
+            if self._worker is not None:
+                self._worker.kill()
+
+
+class _PoolWorker:
+    """A worker process that runs targets sent to it one at a time."""
+
+    def __init__(self):
+        self._jobs = mp.Queue()
+        self._messages = mp.Queue()
+        self._process = mp.Process(target=_work, args=(self._jobs, self._messages))
+        self._process.start()
+        self.last_resource_usage = None
+
+    def is_alive(self):
+        return self._process.is_alive()
+
+    def run(self, target, args, kwargs, is_terminated):
+        """Sends target to the worker and waits for the return value.
+
+        The one shot process semaphore is released while the target has entered the ``maybe_idle`` context.
+
+        Args:
+            target (Callable): function to run
+            args (tuple): positional arguments
+            kwargs (dict): keyword arguments
+            is_terminated (Callable): function that returns True if execution has been terminated
+
+        Returns:
+            tuple: target's return value or (False,) if the worker was terminated or died
+        """
+        buffer = io.BytesIO()
+        relayed = []
+        _JobPickler(buffer, relayed).dump((target, args, kwargs))
+        self._jobs.put(buffer.getvalue())
+        self.last_resource_usage = None
+        idle = False
+        try:
+            while True:
+                try:
+                    message = self._messages.get(timeout=0.1)
+                except Empty:
+                    if is_terminated() or not self._process.is_alive():
+                        return (False,)
+                    continue
+                if isinstance(message, _RelayedPut):
+                    relayed[message.index].put(message.item)
+                elif isinstance(message, _RelayedPrompt):
+                    prompter = relayed[message.index]
+                    threading.Thread(
+                        target=self._answer_prompt, args=(prompter, message.prompt_data), daemon=True
+                    ).start()
+                elif message == _MaybeIdle._Event.ENTER:
+                    idle = True
+                    one_shot_process_semaphore.release()
+                elif message == _MaybeIdle._Event.EXIT:
+                    one_shot_process_semaphore.acquire()
+                    idle = False
+                elif isinstance(message, _Completion):
+                    self.last_resource_usage = message.resource_usage
+                    return message.return_value
+                else:
+                    return message
+        finally:
+            if idle:
+                one_shot_process_semaphore.acquire()
+
+    def _answer_prompt(self, prompter, prompt_data):
+        """Asks a prompt on behalf of the worker and sends the answer back.
+
+        Args:
+            prompter (_Prompt): prompter in this process
+            prompt_data (Any): prompt
+        """
+        self._jobs.put(_RelayedAnswer(prompter.emit(prompt_data)))
+
+    def kill(self):
+        """Kills the worker process."""
+        if self._process.is_alive():
+            self._process.kill()
+        self._process.join()
+
+    def stop(self):
+        """Asks the worker process to quit and waits for it."""
+        self._jobs.put(None)
+        self._process.join(timeout=5.0)
+        if self._process.is_alive():
+            self.kill()
+
+
+class _WorkerContext:
+    """Passed to targets in place of the process."""
+
+    def __init__(self, messages):
+        self.maybe_idle = _MaybeIdle(messages)
+
+
+class _JobPickler(ForkingPickler):
+    """Pickles jobs replacing queues and prompters by references to the calling process."""
+
+    def __init__(self, file, relayed):
+        """
+        Args:
+            file (BinaryIO): output file
+            relayed (list): list that receives the replaced objects; references are indices to it
+        """
+        super().__init__(file)
+        self._relayed = relayed
+
+    def persistent_id(self, obj):
+        if isinstance(obj, (BatchingQueue, Queue)):
+            kind = "queue"
+        elif isinstance(obj, _Prompt):
+            kind = "prompt"
+        else:
+            return None
+        for index, relayed in enumerate(self._relayed):
+            if relayed is obj:
+                return kind, index
+        self._relayed.append(obj)
+        return kind, len(self._relayed) - 1
+
+
+class _JobUnpickler(pickle.Unpickler):
+    """Unpickles jobs pickled by :class:`_JobPickler` in a worker process."""
+
+    def __init__(self, file, jobs, messages):
+        """
+        Args:
+            file (BinaryIO): input file
+            jobs (multiprocessing.Queue): worker's job queue
+            messages (multiprocessing.Queue): worker's message queue
+        """
+        super().__init__(file)
+        self._jobs = jobs
+        self._messages = messages
+        self._stand_ins = {}
+
+    def persistent_load(self, pid):
+        stand_in = self._stand_ins.get(pid)
+        if stand_in is None:
+            kind, index = pid
+            if kind == "queue":
+                stand_in = _QueueRelay(index, self._messages)
+            else:
+                stand_in = _PromptRelay(index, self._jobs, self._messages)
+            self._stand_ins[pid] = stand_in
+        return stand_in
+
+
+class _QueueRelay:
+    """Stands in for a queue of the calling process in a worker process."""
+
+    def __init__(self, index, messages):
+        self._index = index
+        self._messages = messages
+
+    def put(self, item, block=True, timeout=None):
+        self._messages.put(_RelayedPut(self._index, item))
+
+    def flush(self):
+        """Does nothing as items are not buffered."""
+
+    def close(self):
+        """Does nothing as items are not buffered."""
+
+
+class _PromptRelay:
+    """Stands in for a prompter of the calling process in a worker process."""
+
+    def __init__(self, index, jobs, messages):
+        self._index = index
+        self._jobs = jobs
+        self._messages = messages
+        self.filter_id = ""
+
+    def emit(self, prompt_data):
+        self._messages.put(_RelayedPrompt(self._index, prompt_data))
+        return self._jobs.get().answer
+
+    def connect(self, slot):
+        """Does nothing as slots live in the calling process."""
+
+    def disconnect(self, slot):
+        """Does nothing as slots live in the calling process."""
+
+
+def _work(jobs, messages):
+    """Worker process' main loop."""
+    context = _WorkerContext(messages)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        target, args, kwargs = _JobUnpickler(io.BytesIO(job), jobs, messages).load()
+        baseline = self_rusage()
+        start_time = time.monotonic()
+        try:
+            return_value = target(context, *args, **kwargs)
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            return_value = (False,)
+        messages.put(_Completion(return_value, measure_self(start_time, baseline)))
+
+
+class ReturningProcessPool:
+    """Keeps idle worker processes for :class:`PooledReturningProcess`."""
+
+    def __init__(self, max_idle_workers=DEFAULT_MAX_IDLE_WORKERS):
+        """
+        Args:
+            max_idle_workers (int): maximum number of idle workers to keep
+        """
+        self._max_idle_workers = max_idle_workers
+        self._idle_workers = []
+        self._lock = threading.Lock()
+
+    def set_max_idle_workers(self, max_idle_workers):
+        """Sets the maximum number of idle workers stopping excess workers.
+
+        Args:
+            max_idle_workers (int): maximum number of idle workers
+        """
+        with self._lock:
+            self._max_idle_workers = max_idle_workers
+            excess = self._idle_workers[max_idle_workers:]
+            del self._idle_workers[max_idle_workers:]
+        for worker in excess:
+            worker.stop()
+
+    def acquire(self):
+        """Returns an idle worker starting a new one if none is available.
+
+        Returns:
+            _PoolWorker: worker
+        """
+        with self._lock:
+            while self._idle_workers:
+                worker = self._idle_workers.pop()
+                if worker.is_alive():
+                    return worker
+        return _PoolWorker()
+
+    def release(self, worker):
+        """Returns a worker to the pool.
+
+        Args:
+            worker (_PoolWorker): worker
+        """
+        if not worker.is_alive():
+            return
+        with self._lock:
+            if len(self._idle_workers) < self._max_idle_workers:
+                self._idle_workers.append(worker)
+                return
+        worker.stop()
+
+    def shut_down(self):
+        """Stops all idle workers."""
+        with self._lock:
+            workers = self._idle_workers
+            self._idle_workers = []
+        for worker in workers:
+            worker.stop()
+
+
+returning_process_pool = ReturningProcessPool()
+atexit.register(returning_process_pool.shut_down)
+
+
 if __name__ == "__main__":
     # https://docs.python.org/3.7/library/multiprocessing.html?highlight=freeze_support#multiprocessing.freeze_support
     mp.freeze_support()
@@ -0,0 +1,93 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""Unit tests for ``conda_kernel_spec_manager`` module."""
+
+import json
+import os
+import os.path
+from tempfile import TemporaryDirectory
+import time
+import unittest
+from unittest import mock
+from spine_engine.execution_managers import conda_kernel_spec_manager
+from spine_engine.execution_managers.conda_kernel_spec_manager import CondaKernelSpecManager, _DiscoveryCache
+
+
+class TestCondaKernelSpecManager(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self._cache_file = os.path.join(self._temp_dir.name, "cache", "conda_discovery_cache.json")
+        self._conda_prefix = os.path.join(self._temp_dir.name, "conda")
+        self._envs_dir = os.path.join(self._conda_prefix, "envs")
+        self._env_path = os.path.join(self._envs_dir, "my_env")
+        self._write_kernel_spec("python3", "Python 3")
+        conda_info = {"conda_prefix": self._conda_prefix, "envs": [self._env_path], "envs_dirs": [self._envs_dir]}
+        self._conda_output = json.dumps(conda_info).encode("ascii")
+        cache_patcher = mock.patch.object(
+            conda_kernel_spec_manager, "_discovery_cache", _DiscoveryCache(lambda: self._cache_file)
+        )
+        cache_patcher.start()
+        self.addCleanup(cache_patcher.stop)
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _write_kernel_spec(self, kernel_dir_name, display_name):
+        kernel_dir = os.path.join(self._env_path, "share", "jupyter", "kernels", kernel_dir_name)
+        os.makedirs(kernel_dir, exist_ok=True)
+        with open(os.path.join(kernel_dir, "kernel.json"), "w") as spec_file:
+            json.dump(
+                {"argv": ["python", "-m", "ipykernel"], "display_name": display_name, "language": "python"}, spec_file
+            )
+
+    def _make_manager(self):
+        return CondaKernelSpecManager(conda_exe="conda", conda_only=True)
+
+    def test_conda_is_queried_once_across_manager_instances(self):
+        with mock.patch("subprocess.check_output", return_value=self._conda_output) as check_output:
+            manager1 = self._make_manager()
+            manager2 = self._make_manager()
+            self.assertEqual(check_output.call_count, 1)
+        self.assertEqual(list(manager1.find_kernel_specs()), ["conda-env-my_env-py"])
+        self.assertEqual(manager2.get_kernel_spec("conda-env-my_env-py").display_name, "Python [conda env:my_env]")
+
+    def test_cache_survives_in_file(self):
+        with mock.patch("subprocess.check_output", return_value=self._conda_output):
+            self._make_manager()
+        self.assertTrue(os.path.exists(self._cache_file))
+        fresh_cache = _DiscoveryCache(lambda: self._cache_file)
+        with mock.patch.object(conda_kernel_spec_manager, "_discovery_cache", fresh_cache):
+            with mock.patch("subprocess.check_output") as check_output:
+                manager = self._make_manager()
+                check_output.assert_not_called()
+        self.assertEqual(list(manager.find_kernel_specs()), ["conda-env-my_env-py"])
+
+    def test_new_kernel_spec_in_environment_invalidates_cache(self):
+        with mock.patch("subprocess.check_output", return_value=self._conda_output):
+            self._make_manager()
+            self._write_kernel_spec("ir", "R")
+            kernels_dir = os.path.join(self._env_path, "share", "jupyter", "kernels")
+            later = time.time() + 10.0
+            os.utime(kernels_dir, (later, later))
+            manager = self._make_manager()
+        self.assertEqual(sorted(manager.find_kernel_specs()), ["conda-env-my_env-py", "conda-env-my_env-r"])
+
+    def test_entries_expire_after_timeout(self):
+        with mock.patch("subprocess.check_output", return_value=self._conda_output) as check_output:
+            self._make_manager()
+            with mock.patch.object(conda_kernel_spec_manager, "DISCOVERY_CACHE_TIMEOUT", -1.0):
+                self._make_manager()
+            self.assertEqual(check_output.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""Unit tests for ``interpreter_pool`` module."""
+
+import os.path
+import sys
+from tempfile import TemporaryDirectory
+import unittest
+from unittest.mock import MagicMock
+from spine_engine.execution_managers.interpreter_pool import InterpreterPool, python_interpreter_pool
+from spine_engine.execution_managers.process_execution_manager import ProcessExecutionManager
+
+
+class TestInterpreterPool(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def _write_script(self, code):
+        path = os.path.join(self._temp_dir.name, "script.py")
+        with open(path, "w", encoding="utf-8") as script:
+            script.write(code)
+        return path
+
+    def test_can_run_only_python_scripts_when_enabled(self):
+        pool = InterpreterPool()
+        script = self._write_script("")
+        self.assertFalse(pool.can_run(sys.executable, [script]))
+        pool.configure(True, size=1)
+        self.addCleanup(pool.shut_down)
+        self.assertTrue(pool.can_run(sys.executable, [script]))
+        self.assertTrue(pool.can_run(sys.executable, ["script.py"], self._temp_dir.name))
+        self.assertFalse(pool.can_run(sys.executable, ["-c", "print('hello')"]))
+        self.assertFalse(pool.can_run("julia", [script]))
+
+    def test_script_gets_arguments_workdir_and_exit_code(self):
+        pool = InterpreterPool()
+        pool.configure(True, size=1, preload_modules=["json"])
+        self.addCleanup(pool.shut_down)
+        self._write_script("import os, sys\nprint(sys.argv[1:])\nprint(os.getcwd())\nsys.exit(3)\n")
+        process = pool.start(sys.executable, ["script.py", "a", "b"], self._temp_dir.name)
+        stdout, stderr = process.communicate()
+        self.assertEqual(process.returncode, 3)
+        lines = stdout.decode("utf-8").splitlines()
+        self.assertEqual(lines[0], "['a', 'b']")
+        self.assertEqual(os.path.realpath(lines[1]), os.path.realpath(self._temp_dir.name))
+        self.assertEqual(stderr, b"")
+
+    def test_exception_traceback_starts_from_script(self):
+        pool = InterpreterPool()
+        pool.configure(True, size=1)
+        self.addCleanup(pool.shut_down)
+        script = self._write_script("gibberish\n")
+        process = pool.start(sys.executable, [script])
+        _, stderr = process.communicate()
+        self.assertEqual(process.returncode, 1)
+        error_lines = stderr.decode("utf-8").splitlines()
+        self.assertEqual(error_lines[0], "Traceback (most recent call last):")
+        self.assertIn(script, error_lines[1])
+        self.assertEqual(error_lines[-1], "NameError: name 'gibberish' is not defined")
+
+    def test_script_runs_in_main_module(self):
+        pool = InterpreterPool()
+        pool.configure(True, size=1)
+        self.addCleanup(pool.shut_down)
+        script = self._write_script(
+            "import atexit, multiprocessing, pickle, sys\n"
+            "class Data:\n"
+            "    pass\n"
+            "def double(x):\n"
+            "    return 2 * x\n"
+            "if __name__ == '__main__':\n"
+            "    assert sys.modules['__main__'].Data is Data\n"
+            "    assert isinstance(pickle.loads(pickle.dumps(Data())), Data)\n"
+            "    with multiprocessing.get_context('spawn').Pool(1) as worker_pool:\n"
+            "        print(worker_pool.map(double, [1, 2]))\n"
+            "    print(repr(sys.stdin.read()))\n"
+            "    atexit.register(lambda: print(type(pickle.loads(pickle.dumps(Data()))).__name__))\n"
+        )
+        process = pool.start(sys.executable, [script])
+        stdout, stderr = process.communicate(timeout=60.0)
+        self.assertEqual(stderr, b"")
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(stdout.decode("utf-8").splitlines(), ["[2, 4]", "''", "Data"])
+
+    def test_process_execution_manager_uses_pool(self):
+        python_interpreter_pool.configure(True, size=1)
+        self.addCleanup(python_interpreter_pool.configure, False)
+        logger = MagicMock()
+        script = self._write_script("print('hello')\n")
+        exec_manager = ProcessExecutionManager(logger, sys.executable, [script])
+        ret = exec_manager.run_until_complete()
+        self.assertTrue(exec_manager._output_finished.wait(5.0))
+        self.assertEqual(ret, 0)
+        logger.msg_proc.emit.assert_called_once_with("hello")
+
+
+if __name__ == "__main__":
+    unittest.main()
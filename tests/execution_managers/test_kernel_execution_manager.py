@@ -12,11 +12,22 @@
 """Unit tests for ``kernel_execution_manager`` module."""
 
 from pathlib import Path
+import subprocess
 from tempfile import TemporaryDirectory
+import time
 import unittest
+from unittest import mock
 from unittest.mock import MagicMock
 from jupyter_client.kernelspec import NATIVE_KERNEL_NAME  # =='python3'
-from spine_engine.execution_managers.kernel_execution_manager import KernelExecutionManager, _kernel_manager_factory
+from spine_engine.execution_managers.kernel_execution_manager import (
+    KernelExecutionManager,
+    _kernel_manager_factory,
+    _KernelPool,
+    _KernelRegistry,
+    configure_kernel_pool,
+    prewarm_kernel_manager,
+)
+from spine_engine.utils.execution_resources import ResourceSemaphore
 
 
 class TestKernelExecutionManager(unittest.TestCase):
@@ -186,3 +197,141 @@ class TestKernelExecutionManager(unittest.TestCase):
         kc = exec_mngr._kernel_manager.client()  # Make new client
         exec_mngr._kernel_client = kc  # Replace the original client
         return exec_mngr
+
+
+class TestKernelRegistry(unittest.TestCase):
+    @staticmethod
+    def _make_kernel_manager(kernel_name, group_id, connection_file, busy=False):
+        km = MagicMock()
+        km.kernel_name = kernel_name
+        km.group_id.return_value = group_id
+        km.connection_file = connection_file
+        km.is_busy.return_value = busy
+        return km
+
+    def test_find_idle_looks_up_by_kernel_name_and_group(self):
+        registry = _KernelRegistry()
+        busy = self._make_kernel_manager("python3", "SomeGroup", "busy.json", busy=True)
+        idle = self._make_kernel_manager("python3", "SomeGroup", "idle.json")
+        other = self._make_kernel_manager("julia", "SomeGroup", "other.json")
+        keys = {km: registry.add(km) for km in (busy, idle, other)}
+        self.assertEqual(registry.find_idle("python3", "SomeGroup"), (keys[idle], idle))
+        self.assertIsNone(registry.find_idle("python3", "AnotherGroup"))
+        self.assertEqual(registry.key_of(other), keys[other])
+        self.assertIs(registry.get_by_connection_file("busy.json"), busy)
+        self.assertIs(registry.pop_by_connection_file("idle.json"), idle)
+        self.assertIsNone(registry.find_idle("python3", "SomeGroup"))
+        self.assertIsNone(registry.key_of(idle))
+        self.assertEqual(len(registry), 2)
+
+
+class TestPrewarmKernelManager(unittest.TestCase):
+    def test_prewarmed_kernel_is_keyed_by_filter_id(self):
+        logger = MagicMock()
+        logger.msg_kernel_execution.filter_id = "scenario_1"
+        prewarm_keys = []
+
+        def new_kernel_manager(kernel_name, group_id, *args, **kwargs):
+            prewarm_keys.extend(_kernel_manager_factory._prewarming)
+            return None
+
+        with mock.patch.object(_kernel_manager_factory, "_new_kernel_manager", side_effect=new_kernel_manager):
+            self.assertFalse(_kernel_manager_factory.prewarm_kernel_manager(NATIVE_KERNEL_NAME, "SomeGroup", logger))
+        self.assertEqual(prewarm_keys, [(NATIVE_KERNEL_NAME, "scenario_1")])
+
+
+class TestKernelPoolPermits(unittest.TestCase):
+    _SPEC_KEY = (NATIVE_KERNEL_NAME, "", (), "", "", ())
+
+    def setUp(self):
+        self._semaphore = ResourceSemaphore()
+        self._shut_down = []
+        for name, new in (
+            ("persistent_process_semaphore", self._semaphore),
+            ("_start_kernel", MagicMock(return_value=None)),
+            ("_shutdown", self._shut_down.append),
+        ):
+            patcher = mock.patch(f"spine_engine.execution_managers.kernel_execution_manager.{name}", new)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self._pool = _KernelPool()
+        self._pool._size = 1
+        self._pool._recipes[self._SPEC_KEY] = (NATIVE_KERNEL_NAME, "", None, "", "", {})
+
+    def test_idle_kernel_holds_permit_until_reclaimed(self):
+        self._pool._refill_queue.put(self._SPEC_KEY)
+        self._pool._refill()
+        self.assertEqual(self._pool.n_idle(), 1)
+        self.assertEqual(self._semaphore.metrics()["processes_by_group"], {"kernel_pool": 1})
+        self.assertFalse(self._semaphore.acquire(timeout=0.0))
+        self.assertTrue(self._semaphore.acquire(timeout=1.0))
+        self.assertEqual(self._pool.n_idle(), 0)
+        deadline = time.monotonic() + 5.0
+        while not self._shut_down and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self._shut_down), 1)
+        self._semaphore.release()
+
+    def test_kernel_started_for_cleared_pool_is_shut_down(self):
+        start_kernel = mock.patch(
+            "spine_engine.execution_managers.kernel_execution_manager._start_kernel",
+            side_effect=lambda *args: self._pool._recipes.clear(),
+        )
+        self._pool._refill_queue.put(self._SPEC_KEY)
+        with start_kernel:
+            self._pool._refill()
+        self.assertEqual(self._pool.n_idle(), 0)
+        self.assertEqual(len(self._shut_down), 1)
+        self.assertEqual(self._semaphore.metrics()["process_count"], 0)
+
+
+class TestKernelPool(unittest.TestCase):
+    def setUp(self):
+        configure_kernel_pool(1)
+        self.addCleanup(_kernel_manager_factory.kill_kernel_managers)
+        self.addCleanup(configure_kernel_pool, 0)
+
+    def test_new_kernel_manager_claims_pre_started_kernel(self):
+        logger = MagicMock()
+        logger.msg_kernel_execution.filter_id = ""
+        exec_mngr1 = KernelExecutionManager(logger, NATIVE_KERNEL_NAME, [], group_id="SomeGroup")
+        exec_mngr1.std_out.close()
+        exec_mngr1.std_err.close()
+        deadline = time.monotonic() + 60.0
+        while _kernel_manager_factory.n_pooled_kernels() == 0 and time.monotonic() < deadline:
+            time.sleep(0.1)
+        self.assertEqual(_kernel_manager_factory.n_pooled_kernels(), 1)
+        exec_mngr2 = KernelExecutionManager(logger, NATIVE_KERNEL_NAME, [], group_id="AnotherGroup")
+        exec_mngr2.std_out.close()
+        exec_mngr2.std_err.close()
+        km = exec_mngr2._kernel_manager
+        self.assertTrue(km.is_alive())
+        self.assertEqual(km.group_id(), "AnotherGroup")
+        self.assertIsNot(km, exec_mngr1._kernel_manager)
+        self.assertEqual(_kernel_manager_factory.n_kernel_managers(), 2)
+        self.assertIs(_kernel_manager_factory.get_kernel_manager(km.connection_file), km)
+
+    def test_caller_supplied_output_streams_bypass_pool(self):
+        logger = MagicMock()
+        logger.msg_kernel_execution.filter_id = ""
+        with (
+            mock.patch.object(_kernel_manager_factory._pool, "claim") as claim,
+            mock.patch(
+                "spine_engine.execution_managers.kernel_execution_manager._start_kernel", return_value=None
+            ) as start_kernel,
+        ):
+            km = _kernel_manager_factory.new_kernel_manager(
+                NATIVE_KERNEL_NAME, "SomeGroup", logger, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            _kernel_manager_factory.pop_kernel_manager(km.connection_file)
+        claim.assert_not_called()
+        start_kernel.assert_called_once()
+        self.assertEqual(start_kernel.call_args.args[4], {"stdout": subprocess.PIPE, "stderr": subprocess.PIPE})
+
+    def test_prewarm_keeps_caller_supplied_output_streams(self):
+        logger = MagicMock()
+        with mock.patch.object(_kernel_manager_factory, "prewarm_kernel_manager") as prewarm:
+            prewarm_kernel_manager(NATIVE_KERNEL_NAME, "SomeGroup", logger, stdout=subprocess.PIPE)
+        kwargs = prewarm.call_args.kwargs
+        self.assertIs(kwargs["stdout"], subprocess.PIPE)
+        self.assertIs(kwargs["stderr"], subprocess.DEVNULL)
@@ -12,10 +12,268 @@
 """Unit tests for ``persistent_execution_manager`` module."""
 
 import concurrent.futures
+import socket
+import subprocess
+import sys
+import time
 import unittest
+from unittest import mock
 from unittest.mock import MagicMock
-from spine_engine.execution_managers.persistent_execution_manager import PythonPersistentExecutionManager
-from spine_engine.utils.execution_resources import persistent_process_semaphore
+from spine_engine.execution_managers.persistent_execution_manager import (
+    PythonPersistentExecutionManager,
+    PythonPersistentManager,
+    _ControlChannel,
+    _PersistentManagerFactory,
+    _wanted_key,
+    discard_prewarmed_persistent_managers,
+    prewarm_persistent_manager,
+)
+from spine_engine.utils.execution_resources import AcquisitionTag, acquisition_tag, persistent_process_semaphore
+
+
+class TestPythonPersistentManager(unittest.TestCase):
+    def setUp(self):
+        self.assertTrue(persistent_process_semaphore.acquire(timeout=10.0))
+        self._manager = PythonPersistentManager([sys.executable], "SomeGroup")
+        self.addCleanup(self._manager.kill_process)
+
+    def test_commands_reuse_control_channel(self):
+        channel = self._manager._channel
+        for i in range(20):
+            list(self._manager.issue_command(f"x = {i}"))
+            self.assertTrue(self._manager.command_successful)
+        messages = list(self._manager.issue_command("print(x)"))
+        self.assertIs(self._manager._channel, channel)
+        deadline = time.monotonic() + 5.0
+        while {"type": "stdout", "data": "19"} not in messages and time.monotonic() < deadline:
+            messages += self._manager.drain_queue()
+        self.assertIn({"type": "stdout", "data": "19"}, messages)
+
+    def test_failing_command_is_reported(self):
+        list(self._manager.issue_command("raise RuntimeError()"))
+        self.assertFalse(self._manager.command_successful)
+        list(self._manager.issue_command("pass"))
+        self.assertTrue(self._manager.command_successful)
+
+    def test_batch_runs_all_commands_at_once(self):
+        commands = ["def double(x):\n    return 2 * x", "y = double(21)", "print(y)"]
+        messages = list(self._manager.issue_batch(commands))
+        self.assertTrue(self._manager.command_successful)
+        self.assertEqual(messages[:3], [{"type": "stdin", "data": cmd} for cmd in commands])
+        deadline = time.monotonic() + 5.0
+        while {"type": "stdout", "data": "42"} not in messages and time.monotonic() < deadline:
+            messages += self._manager.drain_queue()
+        self.assertIn({"type": "stdout", "data": "42"}, messages)
+        list(self._manager.issue_command("print(y + 1)"))
+        self.assertTrue(self._manager.command_successful)
+
+    def test_batch_stops_at_first_failing_command(self):
+        list(self._manager.issue_batch(["z = 1", "raise RuntimeError()", "z = 2"]))
+        self.assertFalse(self._manager.command_successful)
+        messages = list(self._manager.issue_command("print(z)"))
+        deadline = time.monotonic() + 5.0
+        while {"type": "stdout", "data": "1"} not in messages and time.monotonic() < deadline:
+            messages += self._manager.drain_queue()
+        self.assertIn({"type": "stdout", "data": "1"}, messages)
+
+    def test_batch_displays_expression_values_and_hides_its_own_frames(self):
+        messages = list(self._manager.issue_batch(["6 * 7", "1 / 0", "print('not run')"]))
+        self.assertFalse(self._manager.command_successful)
+        deadline = time.monotonic() + 5.0
+        while not any("ZeroDivisionError" in msg["data"] for msg in messages) and time.monotonic() < deadline:
+            messages += self._manager.drain_queue()
+        self.assertIn({"type": "stdout", "data": "42"}, messages)
+        stderr = [msg["data"] for msg in messages if msg["type"] == "stderr"]
+        self.assertTrue(any("ZeroDivisionError" in line for line in stderr))
+        self.assertFalse(any("run_batch" in line for line in stderr))
+        self.assertNotIn({"type": "stdout", "data": "not run"}, messages)
+
+    def test_batch_adds_commands_to_history(self):
+        list(self._manager.issue_batch(["a = 1", "b = 2"], add_history=True))
+        self.assertTrue(self._manager.command_successful)
+        self.assertEqual(self._manager.get_history_item("", "", True), "b = 2")
+
+    def test_requests(self):
+        self.assertEqual(self._manager.make_complete_command("for i in range(2):"), None)
+        self.assertIn("print(", self._manager.get_completions("pri"))
+
+
+class TestControlChannel(unittest.TestCase):
+    def test_malformed_frame_is_skipped(self):
+        process_end, engine_end = socket.socketpair()
+        channel = _ControlChannel(engine_end)
+        self.addCleanup(channel.close)
+        response = channel.expect("response", "1")
+        for data in (b"garbage", "response\u001f1\u001fanswer".encode("UTF8")):
+            process_end.sendall(len(data).to_bytes(4, "big") + data)
+        self.assertEqual(response.get(timeout=5.0), "answer")
+        process_end.close()
+
+    def test_waiters_are_woken_when_connection_closes(self):
+        process_end, engine_end = socket.socketpair()
+        channel = _ControlChannel(engine_end)
+        self.addCleanup(channel.close)
+        response = channel.expect("response", "1")
+        process_end.close()
+        self.assertIsNone(response.get(timeout=5.0))
+
+    def test_accept_gives_up_when_process_does_not_connect(self):
+        process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30.0)"])
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+        with (
+            socket.create_server(("127.0.0.1", 0)) as listener,
+            mock.patch.object(_ControlChannel, "CONNECT_TIMEOUT", 0.1),
+        ):
+            self.assertIsNone(_ControlChannel.accept(listener, process))
+
+
+class TestPersistentManagerEviction(unittest.TestCase):
+    def setUp(self):
+        self._factory = _PersistentManagerFactory()
+        self._evictions = []
+        self._factory.add_listener(self._evictions.append)
+        self.addCleanup(self._factory.remove_listener, self._evictions.append)
+        self.addCleanup(self._factory.configure_pool, None, None)
+
+    def _add_idle_manager(self, key, args, last_used, pid=None):
+        pm = MagicMock()
+        pm.args = args
+        pm.group_id = "SomeGroup"
+        pm.language = "python"
+        pm.last_used = last_used
+        pm.pid = pid
+        pm.acquisition_tag = AcquisitionTag("SomeEngine")
+        pm.is_persistent_alive.return_value = True
+        pm.is_running_until_completion.return_value = False
+        self._factory.persistent_managers[key] = pm
+        self.addCleanup(self._factory.persistent_managers.pop, key, None)
+        return pm
+
+    def test_least_recently_used_is_evicted_first(self):
+        now = time.monotonic()
+        self._add_idle_manager("recent", ["python"], now)
+        self._add_idle_manager("old", ["python"], now - 10.0)
+        idle_pms = self._factory._get_idle_persistent_managers()
+        self.assertEqual([key for key, _ in self._factory._eviction_candidates(idle_pms)], ["old", "recent"])
+
+    def test_managers_matching_queued_work_are_evicted_last(self):
+        now = time.monotonic()
+        self._add_idle_manager("wanted", ["julia"], now - 10.0)
+        self._add_idle_manager("unwanted", ["python"], now)
+        idle_pms = self._factory._get_idle_persistent_managers()
+        with mock.patch.dict(self._factory._wanted, {_wanted_key(["julia"], "SomeGroup"): 1}):
+            candidates = self._factory._eviction_candidates(idle_pms)
+        self.assertEqual([key for key, _ in candidates], ["unwanted", "wanted"])
+
+    def test_idle_ttl(self):
+        now = time.monotonic()
+        expired = self._add_idle_manager("expired", ["python"], now - 100.0)
+        fresh = self._add_idle_manager("fresh", ["python"], now)
+        with mock.patch.object(_PersistentManagerFactory, "_idle_ttl", 50.0):
+            with self._factory._idle_manager_lock:
+                self._factory.evict_idle_managers()
+        expired.kill_process.assert_called_once()
+        fresh.kill_process.assert_not_called()
+        self.assertNotIn("expired", self._factory.persistent_managers)
+        self.assertEqual(len(self._evictions), 1)
+        self.assertEqual(self._evictions[0]["key"], "expired")
+        self.assertEqual(self._evictions[0]["reason"], "idle_ttl")
+
+    def test_reaper_does_not_spin_when_idle_ttl_is_zero(self):
+        expired = self._add_idle_manager("expired", ["python"], time.monotonic() - 1.0)
+        intervals = []
+
+        def sleep(interval):
+            intervals.append(interval)
+            _PersistentManagerFactory._idle_ttl = None
+
+        with (
+            mock.patch.object(_PersistentManagerFactory, "_idle_ttl", 0.0),
+            mock.patch.object(_PersistentManagerFactory, "_reaper", None),
+            mock.patch("spine_engine.execution_managers.persistent_execution_manager.time.sleep", side_effect=sleep),
+        ):
+            self._factory._reap()
+        self.assertEqual(intervals, [0.1])
+        expired.kill_process.assert_called_once()
+
+    def test_listeners_receive_only_evictions_of_their_group(self):
+        own_evictions = []
+        other_evictions = []
+        self._factory.add_listener(own_evictions.append, "SomeEngine")
+        self.addCleanup(self._factory.remove_listener, own_evictions.append)
+        self._factory.add_listener(other_evictions.append, "OtherEngine")
+        self.addCleanup(self._factory.remove_listener, other_evictions.append)
+        pm = self._add_idle_manager("expired", ["python"], time.monotonic() - 100.0)
+        with self._factory._idle_manager_lock:
+            self._factory._evict("expired", pm, "idle_ttl")
+        self.assertEqual([eviction["key"] for eviction in own_evictions], ["expired"])
+        self.assertEqual(other_evictions, [])
+        self.assertEqual(len(self._evictions), 1)
+
+    def test_memory_cap(self):
+        now = time.monotonic()
+        old = self._add_idle_manager("old", ["python"], now - 10.0, pid=1)
+        recent = self._add_idle_manager("recent", ["python"], now, pid=2)
+        rss = {1: 300, 2: 200}
+        with (
+            mock.patch.object(_PersistentManagerFactory, "_memory_cap", 250),
+            mock.patch("spine_engine.execution_managers.persistent_execution_manager.current_rss", rss.get),
+        ):
+            with self._factory._idle_manager_lock:
+                self._factory.evict_idle_managers()
+        old.kill_process.assert_called_once()
+        recent.kill_process.assert_not_called()
+        self.assertEqual([eviction["reason"] for eviction in self._evictions], ["memory_cap"])
+
+
+class TestPrewarming(unittest.TestCase):
+    def setUp(self):
+        self._tag = AcquisitionTag("prewarm-test")
+
+    def test_execution_takes_over_prewarmed_process(self):
+        with acquisition_tag(self._tag):
+            self.assertTrue(prewarm_persistent_manager(PythonPersistentManager, ["python"], "PrewarmGroup"))
+            self.assertFalse(prewarm_persistent_manager(PythonPersistentManager, ["python"], "PrewarmGroup"))
+        prewarmed = [
+            pm for pm in _PersistentManagerFactory.persistent_managers.values() if pm.group_id == "PrewarmGroup"
+        ]
+        self.assertEqual(len(prewarmed), 1)
+        self.addCleanup(prewarmed[0].kill_process)
+        self.assertFalse(prewarmed[0].is_running_until_completion())
+        logger = MagicMock()
+        exec_mngr = PythonPersistentExecutionManager(
+            logger, ["python"], ["x = 1"], "alias", kill_completed_processes=False, group_id="PrewarmGroup"
+        )
+        self.assertIs(exec_mngr._persistent_manager, prewarmed[0])
+        logger.msg_warning.emit.assert_not_called()
+        self.assertEqual(exec_mngr.run_until_complete(), 0)
+        discard_prewarmed_persistent_managers(self._tag)
+        self.assertTrue(prewarmed[0].is_persistent_alive())
+
+    def test_unused_prewarmed_process_is_discarded(self):
+        evictions = []
+        factory = _PersistentManagerFactory()
+        factory.add_listener(evictions.append)
+        self.addCleanup(factory.remove_listener, evictions.append)
+        with acquisition_tag(self._tag):
+            self.assertTrue(prewarm_persistent_manager(PythonPersistentManager, ["python"], "UnusedGroup"))
+        pm = next(pm for pm in factory.persistent_managers.values() if pm.group_id == "UnusedGroup")
+        self.addCleanup(pm.kill_process)
+        discard_prewarmed_persistent_managers(AcquisitionTag("someone-else"))
+        self.assertTrue(pm.is_persistent_alive())
+        discard_prewarmed_persistent_managers(self._tag)
+        self.assertFalse(pm.is_persistent_alive())
+        self.assertNotIn(pm, factory.persistent_managers.values())
+        self.assertEqual([eviction["reason"] for eviction in evictions], ["unused_prewarm"])
+
+    def test_no_prewarming_without_free_permit(self):
+        persistent_process_semaphore.set_limit(0)
+        self.addCleanup(persistent_process_semaphore.set_limit, "unlimited")
+        self.assertFalse(prewarm_persistent_manager(PythonPersistentManager, ["python"], "NoPermitGroup"))
+        self.assertFalse(
+            any(pm.group_id == "NoPermitGroup" for pm in _PersistentManagerFactory.persistent_managers.values())
+        )
 
 
 class TestPythonPersistentExecutionManager(unittest.TestCase):
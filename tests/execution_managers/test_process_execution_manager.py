@@ -16,6 +16,7 @@ from tempfile import TemporaryDirectory
 import unittest
 from unittest.mock import MagicMock
 from spine_engine.execution_managers.process_execution_manager import ProcessExecutionManager
+from spine_engine.utils.output_limiter import OutputLog, output_rate_limit
 
 
 class TestProcessExecutionManager(unittest.TestCase):
@@ -71,6 +72,48 @@ class TestProcessExecutionManager(unittest.TestCase):
         self.assertTrue(workdir == path_in_args or os.path.realpath(workdir) == path_in_args)
         self.assertEqual(ret, 0)
 
+    def test_output_exceeding_rate_limit_is_suppressed(self):
+        logger = MagicMock()
+        output_rate_limit.set_limit(0.001, burst=2)
+        try:
+            exec_manager = ProcessExecutionManager(logger, "python", ["-c", "for i in range(5): print(i)"])
+            ret = exec_manager.run_until_complete()
+        finally:
+            output_rate_limit.set_limit("unlimited")
+        self.addCleanup(exec_manager._output_limiter.discard)
+        self.assertTrue(exec_manager._output_finished.is_set())
+        self.assertEqual(ret, 0)
+        self.assertEqual(logger.msg_proc.emit.call_args_list, [(("0",),), (("1",),), (("2",),), (("3",),), (("4",),)])
+        logger.msg_warning.emit.assert_called_once_with(
+            f"3 lines suppressed, full output in {exec_manager._output_limiter.spool_path}"
+        )
+
+    def test_output_is_written_to_output_log(self):
+        logger = MagicMock()
+        with TemporaryDirectory() as logs_dir:
+            logger.output_log = OutputLog(logs_dir)
+            exec_manager = ProcessExecutionManager(logger, "python", ["-c", "print('hello')"])
+            ret = exec_manager.run_until_complete()
+            self.assertTrue(exec_manager._output_finished.is_set())
+            self.assertEqual(ret, 0)
+            self.assertEqual(logger.output_log.read(0, 100), b"hello\n")
+
+    def test_all_output_is_emitted_before_returning(self):
+        logger = MagicMock()
+        exec_manager = ProcessExecutionManager(logger, "python", ["-c", "for i in range(100): print(i)"])
+        exec_manager.run_until_complete()
+        calls = [name for name, _, _ in logger.method_calls if name in ("msg_proc.emit", "msg_resource_usage.emit")]
+        self.assertEqual(calls, 100 * ["msg_proc.emit"] + ["msg_resource_usage.emit"])
+
+    def test_resource_usage_is_emitted(self):
+        logger = MagicMock()
+        exec_manager = ProcessExecutionManager(logger, "python", ["-c", "print('hello')"])
+        exec_manager.run_until_complete()
+        logger.msg_resource_usage.emit.assert_called_once()
+        usage = logger.msg_resource_usage.emit.call_args.args[0]
+        self.assertEqual(usage["execution_type"], "process")
+        self.assertGreater(usage["wall_time"], 0.0)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -12,6 +12,7 @@
 
 """Unit tests for EngineServer class."""
 
+import json
 import os
 import pathlib
 import threading
@@ -111,6 +112,39 @@ class TestEngineServer(unittest.TestCase):
         self.assertTrue(msg_data[1].startswith("json.decoder.JSONDecodeError:"))
         server.close()
 
+    def test_start_execution_with_invalid_priority_is_rejected(self):
+        server = EngineServer("tcp", 5556, ServerSecurityModel.NONE, "")
+        self.req_socket.connect("tcp://localhost:5556")
+        for priority in ("high", True, 1.5):
+            engine_data = json.dumps({"items": {}, "priority": priority})
+            msg = ServerMessage("start_execution", "job", engine_data, None)
+            self.req_socket.send_multipart([msg.to_bytes()])
+            response = self.req_socket.recv_multipart()
+            msg_data = ServerMessage.parse(response[1]).getData()
+            self.assertEqual(msg_data[0], "server_init_failed")
+            self.assertIn("Priority must be an integer", msg_data[1])
+        server.close()
+
+    def test_start_execution_with_unsupported_file_transfer_version_is_rejected(self):
+        server = EngineServer("tcp", 5556, ServerSecurityModel.NONE, "")
+        self.req_socket.connect("tcp://localhost:5556")
+        for version in (0, 3, "2", True):
+            engine_data = json.dumps({"items": {}, "file_transfer_version": version})
+            msg = ServerMessage("start_execution", "job", engine_data, None)
+            self.req_socket.send_multipart([msg.to_bytes()])
+            response = self.req_socket.recv_multipart()
+            msg_data = ServerMessage.parse(response[1]).getData()
+            self.assertEqual(msg_data[0], "server_init_failed")
+            self.assertIn("Unsupported file transfer version", msg_data[1])
+        for engine_data in ({"items": {}}, {"items": {}, "file_transfer_version": 1}):
+            msg = ServerMessage("start_execution", "job", json.dumps(engine_data), None)
+            self.req_socket.send_multipart([msg.to_bytes()])
+            response = self.req_socket.recv_multipart()
+            msg_data = ServerMessage.parse(response[1]).getData()
+            self.assertEqual(msg_data[0], "server_init_failed")
+            self.assertIn("Project directory for job_id:job not found", msg_data[1])
+        server.close()
+
     def test_multiple_client_sockets_sync(self):
         """Tests multiple client sockets pinging the server synchronously (sequentially)."""
         server = EngineServer("tcp", 5558, ServerSecurityModel.NONE, "")
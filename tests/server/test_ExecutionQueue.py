@@ -0,0 +1,59 @@
+#####################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""
+Unit tests for ExecutionQueue class.
+"""
+
+import unittest
+from spine_engine.server.execution_queue import ExecutionQueue
+
+
+class TestExecutionQueue(unittest.TestCase):
+    def test_jobs_beyond_slots_wait(self):
+        execution_queue = ExecutionQueue(2)
+        self.assertTrue(execution_queue.submit("a", "worker a"))
+        self.assertTrue(execution_queue.submit("b", "worker b"))
+        self.assertFalse(execution_queue.submit("c", "worker c"))
+        self.assertEqual(execution_queue.n_running(), 2)
+        self.assertEqual(execution_queue.positions(), [("c", "worker c", 1)])
+        self.assertEqual(execution_queue.finish("a"), ["worker c"])
+        self.assertEqual(execution_queue.n_waiting(), 0)
+        self.assertEqual(execution_queue.finish("b"), [])
+        self.assertEqual(execution_queue.n_running(), 1)
+
+    def test_higher_priority_gets_slot_first_and_equal_priorities_keep_order(self):
+        execution_queue = ExecutionQueue(1)
+        execution_queue.submit("running", "worker")
+        execution_queue.submit("low 1", "worker low 1")
+        execution_queue.submit("high", "worker high", priority=5)
+        execution_queue.submit("low 2", "worker low 2")
+        self.assertEqual(
+            execution_queue.positions(),
+            [("high", "worker high", 1), ("low 1", "worker low 1", 2), ("low 2", "worker low 2", 3)],
+        )
+        self.assertEqual(execution_queue.finish("running"), ["worker high"])
+        self.assertEqual(execution_queue.finish("high"), ["worker low 1"])
+
+    def test_remove_waiting_job(self):
+        execution_queue = ExecutionQueue(1)
+        execution_queue.submit("a", "worker a")
+        execution_queue.submit("b", "worker b")
+        execution_queue.submit("c", "worker c")
+        self.assertIsNone(execution_queue.remove("a"))
+        self.assertEqual(execution_queue.remove("b"), "worker b")
+        self.assertEqual(execution_queue.positions(), [("c", "worker c", 1)])
+        self.assertEqual(execution_queue.clear(), ["worker c"])
+        self.assertEqual(execution_queue.finish("a"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
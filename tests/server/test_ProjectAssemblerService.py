@@ -0,0 +1,83 @@
+#####################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""
+Unit tests for ProjectAssemblerService class.
+"""
+
+import hashlib
+import json
+import os
+from tempfile import TemporaryDirectory
+import unittest
+from unittest import mock
+import zmq
+from spine_engine.server.engine_server import EngineServer, ServerSecurityModel
+from spine_engine.server.util.server_message import ServerMessage
+
+
+class TestProjectAssemblerService(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        patcher = mock.patch(
+            "spine_engine.server.project_extractor_service.ProjectExtractorService.INTERNAL_PROJECT_DIR",
+            self._temp_dir.name,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = EngineServer("tcp", 5559, ServerSecurityModel.NONE, "")
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.DEALER)
+        self.socket.connect("tcp://localhost:5559")
+
+    def tearDown(self):
+        self.service.close()
+        if not self.socket.closed:
+            self.socket.close()
+        if not self.context.closed:
+            self.context.term()
+        self._temp_dir.cleanup()
+
+    def _request(self, command, data, *frames):
+        msg = ServerMessage(command, "1", json.dumps(data), None)
+        self.socket.send_multipart([msg.to_bytes(), *frames])
+        return ServerMessage.parse(self.socket.recv_multipart()[1])
+
+    def test_only_missing_files_are_uploaded_for_second_project(self):
+        files = {"project.json": b"{}", "tool.py": b"print('hello')"}
+        manifest = {path: hashlib.sha256(data).hexdigest() for path, data in files.items()}
+        response = self._request("sync_manifest", {"manifest": manifest})
+        self.assertEqual(response.getData(), ["blobs_missing", list(manifest.values())])
+        response = self._request("upload_blobs", list(manifest.values()), *files.values())
+        self.assertEqual(response.getData(), ["blobs_stored", 2])
+        response = self._request("assemble_project", {"project_name": "project", "manifest": manifest})
+        self.assertEqual(response.getCommand(), "assemble_project")
+        self.assertEqual(len(response.getId()), 32)
+        changed_manifest = dict(manifest, **{"tool.py": hashlib.sha256(b"print('changed')").hexdigest()})
+        response = self._request("sync_manifest", {"manifest": changed_manifest})
+        self.assertEqual(response.getData(), ["blobs_missing", [changed_manifest["tool.py"]]])
+        project_dirs = [
+            name for name in os.listdir(self._temp_dir.name) if name.startswith("project__") and "." not in name
+        ]
+        self.assertEqual(len(project_dirs), 1)
+        with open(os.path.join(self._temp_dir.name, project_dirs[0], "tool.py"), "rb") as tool_file:
+            self.assertEqual(tool_file.read(), b"print('hello')")
+
+    def test_assembling_with_missing_files_fails(self):
+        manifest = {"tool.py": hashlib.sha256(b"print('hello')").hexdigest()}
+        response = self._request("assemble_project", {"project_name": "project", "manifest": manifest})
+        event_type, error = response.getData()
+        self.assertEqual(event_type, "remote_execution_init_failed")
+        self.assertIn("1 files missing from blob store", error)
+
+
+if __name__ == "__main__":
+    unittest.main()
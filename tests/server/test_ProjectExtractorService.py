@@ -14,6 +14,7 @@
 Unit tests for ProjectExtractorService class.
 """
 
+import hashlib
 import json
 import os
 from pathlib import Path
@@ -82,6 +83,94 @@ class TestProjectExtractorService(unittest.TestCase):
         response = self.socket.recv_multipart()
         self.check_correct_error_response(response[1], "Project ZIP file missing")
 
+    @mock.patch(
+        "spine_engine.server.project_extractor_service.ProjectExtractorService.INTERNAL_PROJECT_DIR",
+        new_callable=mock.PropertyMock,
+    )
+    def test_chunked_project_upload(self, mock_proj_dir):
+        mock_proj_dir.return_value = self._temp_dir.name
+        with open(os.path.join(str(Path(__file__).parent), "zippedproject.zip"), "rb") as f:
+            file_data = f.read()
+        begin_data = {"project_name": "project_name", "file_name": "zippedproject.zip", "size": len(file_data)}
+        msg = ServerMessage("begin_upload", "1", json.dumps(begin_data), None)
+        self.socket.send_multipart([msg.to_bytes()])
+        event_type, upload_id, offset = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+        self.assertEqual(event_type, "upload_started")
+        self.assertEqual(offset, 0)
+        chunk_size = len(file_data) // 3 + 1
+        for start in range(0, len(file_data), chunk_size):
+            chunk = file_data[start : start + chunk_size]
+            chunk_data = {"offset": start, "sha256": hashlib.sha256(chunk).hexdigest()}
+            msg = ServerMessage("upload_chunk", upload_id, json.dumps(chunk_data), None)
+            self.socket.send_multipart([msg.to_bytes(), chunk])
+            response_data = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+            self.assertEqual(response_data, ["upload_chunk_received", start + len(chunk)])
+            if start == 0:
+                # Client reconnects and asks where to continue
+                msg = ServerMessage("begin_upload", "2", json.dumps(dict(begin_data, upload_id=upload_id)), None)
+                self.socket.send_multipart([msg.to_bytes()])
+                response_data = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+                self.assertEqual(response_data, ["upload_started", upload_id, len(chunk)])
+        msg = ServerMessage("finish_upload", upload_id, "", None)
+        self.socket.send_multipart([msg.to_bytes()])
+        response_msg = ServerMessage.parse(self.socket.recv_multipart()[1])
+        self.assertEqual("finish_upload", response_msg.getCommand())
+        self.assertEqual(len(response_msg.getId()), 32)
+        self.assertEqual("", response_msg.getData())
+        project_dirs = [
+            name for name in os.listdir(self._temp_dir.name) if name.startswith("project_name__") and "." not in name
+        ]
+        self.assertEqual(len(project_dirs), 1)
+        self.assertFalse(os.path.exists(os.path.join(self._temp_dir.name, project_dirs[0], "zippedproject.zip")))
+        self.assertEqual(os.listdir(os.path.join(self._temp_dir.name, ".uploads")), [])
+
+    def test_corrupted_upload_fails_final_checksum(self):
+        with (
+            TemporaryDirectory() as project_dir,
+            mock.patch(
+                "spine_engine.server.project_extractor_service.ProjectExtractorService.INTERNAL_PROJECT_DIR",
+                project_dir,
+            ),
+        ):
+            chunk = b"1234567890"
+            begin_data = {
+                "project_name": "project_name",
+                "file_name": "zippedproject.zip",
+                "size": len(chunk),
+                "sha256": hashlib.sha256(b"something else").hexdigest(),
+            }
+            msg = ServerMessage("begin_upload", "1", json.dumps(begin_data), None)
+            self.socket.send_multipart([msg.to_bytes()])
+            _, upload_id, _ = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+            chunk_data = {"offset": 0, "sha256": hashlib.sha256(chunk).hexdigest()}
+            msg = ServerMessage("upload_chunk", upload_id, json.dumps(chunk_data), None)
+            self.socket.send_multipart([msg.to_bytes(), chunk])
+            self.socket.recv_multipart()
+            msg = ServerMessage("finish_upload", upload_id, "", None)
+            self.socket.send_multipart([msg.to_bytes()])
+            response_data = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+            self.assertEqual(response_data, ["upload_failed", "Checksum mismatch in received project ZIP file", None])
+            self.assertEqual(os.listdir(os.path.join(project_dir, ".uploads")), [])
+
+    def test_chunk_at_wrong_offset_is_rejected(self):
+        with (
+            TemporaryDirectory() as project_dir,
+            mock.patch(
+                "spine_engine.server.project_extractor_service.ProjectExtractorService.INTERNAL_PROJECT_DIR",
+                project_dir,
+            ),
+        ):
+            begin_data = {"project_name": "project_name", "file_name": "zippedproject.zip", "size": 10}
+            msg = ServerMessage("begin_upload", "1", json.dumps(begin_data), None)
+            self.socket.send_multipart([msg.to_bytes()])
+            _, upload_id, _ = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+            chunk = b"12345"
+            chunk_data = {"offset": 5, "sha256": hashlib.sha256(chunk).hexdigest()}
+            msg = ServerMessage("upload_chunk", upload_id, json.dumps(chunk_data), None)
+            self.socket.send_multipart([msg.to_bytes(), chunk])
+            response_data = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+            self.assertEqual(response_data, ["upload_failed", "Expected chunk at offset 0, got 5", 0])
+
     def check_correct_error_response(self, response, expected_err_str):
         response_msg = ServerMessage.parse(response)
         self.assertEqual("prepare_execution", response_msg.getCommand())
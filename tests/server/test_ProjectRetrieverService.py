@@ -0,0 +1,127 @@
+#####################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""
+Unit tests for ProjectRetrieverService class.
+"""
+
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+import unittest
+from unittest import mock
+import zipfile
+import zmq
+from spine_engine.server.engine_server import EngineServer, ServerSecurityModel
+from spine_engine.server.util.server_message import ServerMessage
+
+
+class TestProjectRetrieverService(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        patcher = mock.patch(
+            "spine_engine.server.project_extractor_service.ProjectExtractorService.INTERNAL_PROJECT_DIR",
+            self._temp_dir.name,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = EngineServer("tcp", 5559, ServerSecurityModel.NONE, "")
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.DEALER)
+        self.socket.connect("tcp://localhost:5559")
+        with open(os.path.join(str(Path(__file__).parent), "zippedproject.zip"), "rb") as f:
+            file_data = f.read()
+        msg = ServerMessage("prepare_execution", "1", json.dumps("project_name"), ["zippedproject.zip"])
+        self.socket.send_multipart([msg.to_bytes(), file_data])
+        self._job_id = ServerMessage.parse(self.socket.recv_multipart()[1]).getId()
+        self._project_dir = next(
+            os.path.join(self._temp_dir.name, name)
+            for name in os.listdir(self._temp_dir.name)
+            if name.startswith("project_name__") and os.path.isdir(os.path.join(self._temp_dir.name, name))
+        )
+
+    def tearDown(self):
+        self.service.close()
+        if not self.socket.closed:
+            self.socket.close()
+        if not self.context.closed:
+            self.context.term()
+        self._temp_dir.cleanup()
+
+    def _retrieve(self, data):
+        msg = ServerMessage("retrieve_project", self._job_id, json.dumps(data), None)
+        self.socket.send_multipart([msg.to_bytes()])
+        zip_data = b""
+        while True:
+            response = self.socket.recv_multipart()
+            event_type, info = ServerMessage.parse(response[1]).getData()
+            if event_type == "project_retrieved":
+                break
+            self.assertEqual(event_type, "project_chunk")
+            self.assertEqual(info, len(response[2]))
+            zip_data += response[2]
+            self.socket.send_multipart([ServerMessage("project_chunk_ack", self._job_id, "1", None).to_bytes()])
+        self.assertEqual(info["size"], len(zip_data))
+        return zipfile.ZipFile(io.BytesIO(zip_data)), info["deleted"]
+
+    def test_full_project_is_retrieved_by_default(self):
+        zip_file, deleted = self._retrieve({})
+        self.assertIn("simple_script.py", zip_file.namelist())
+        self.assertIn(".spinetoolbox/project.json", zip_file.namelist())
+        self.assertEqual(deleted, [])
+
+    def test_only_changes_since_upload_are_retrieved(self):
+        with open(os.path.join(self._project_dir, "output.txt"), "w") as output_file:
+            output_file.write("result")
+        os.remove(os.path.join(self._project_dir, "input_file.txt"))
+        zip_file, deleted = self._retrieve({"incremental": True})
+        self.assertEqual(zip_file.namelist(), ["output.txt"])
+        self.assertEqual(zip_file.read("output.txt"), b"result")
+        self.assertEqual(deleted, ["input_file.txt"])
+
+    def test_files_matching_client_manifest_are_skipped(self):
+        with open(os.path.join(self._project_dir, "simple_script.py"), "rb") as script_file:
+            script_digest = hashlib.sha256(script_file.read()).hexdigest()
+        manifest = {"simple_script.py": script_digest, "input_file.txt": "0" * 64, "gone.txt": "0" * 64}
+        zip_file, deleted = self._retrieve({"manifest": manifest})
+        self.assertNotIn("simple_script.py", zip_file.namelist())
+        self.assertIn("input_file.txt", zip_file.namelist())
+        self.assertEqual(deleted, ["gone.txt"])
+
+    def test_chunks_are_sent_only_ahead_of_acknowledgements(self):
+        with (
+            mock.patch("spine_engine.server.project_retriever_service.RETRIEVE_CHUNK_SIZE", 64),
+            mock.patch("spine_engine.server.project_retriever_service.RETRIEVE_WINDOW", 2),
+        ):
+            msg = ServerMessage("retrieve_project", self._job_id, json.dumps({}), None)
+            self.socket.send_multipart([msg.to_bytes()])
+            for _ in range(2):
+                event_type, _ = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+                self.assertEqual(event_type, "project_chunk")
+            self.assertEqual(self.socket.poll(200), 0)
+            ack = ServerMessage("project_chunk_ack", self._job_id, "1", None)
+            self.socket.send_multipart([ack.to_bytes()])
+            event_type, _ = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+            self.assertEqual(event_type, "project_chunk")
+            self.assertEqual(self.socket.poll(200), 0)
+            self.socket.send_multipart([ServerMessage("project_chunk_ack", self._job_id, "1000", None).to_bytes()])
+            while True:
+                event_type, _ = ServerMessage.parse(self.socket.recv_multipart()[1]).getData()
+                if event_type != "project_chunk":
+                    break
+            self.assertEqual(event_type, "project_retrieved")
+
+
+if __name__ == "__main__":
+    unittest.main()
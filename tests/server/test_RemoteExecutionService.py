@@ -0,0 +1,94 @@
+#####################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""
+Unit tests for RemoteExecutionService class.
+"""
+
+import hashlib
+import os
+import queue
+from tempfile import TemporaryDirectory
+import threading
+import unittest
+from unittest import mock
+import zmq
+from spine_engine.server import remote_execution_service
+from spine_engine.server.remote_execution_service import RemoteExecutionService
+
+
+class TestSendFile(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self._context = zmq.Context()
+        self._service = RemoteExecutionService(
+            self._context, mock.MagicMock(), "job_id", self._temp_dir.name, queue.Queue(), 5601
+        )
+        self._service.push_socket.bind("inproc://test_send_file")
+        self._pull_socket = self._context.socket(zmq.PULL)
+        self._pull_socket.connect("inproc://test_send_file")
+
+    def tearDown(self):
+        self._pull_socket.close()
+        self._service.close()
+        self._context.term()
+        self._temp_dir.cleanup()
+
+    def _write_file(self, relative_path, data):
+        path = os.path.join(self._temp_dir.name, *relative_path.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_file_is_sent_in_chunks_with_checksum(self):
+        chunk_size = 2 * zmq.COPY_THRESHOLD
+        data = os.urandom(2 * chunk_size + 1000)
+        path = self._write_file("output/result.sqlite", data)
+        with (
+            mock.patch.object(remote_execution_service, "OUTPUT_CHUNK_SIZE", chunk_size),
+            mock.patch.object(remote_execution_service, "MAX_CHUNKS_IN_FLIGHT", 1),
+        ):
+            sender = threading.Thread(target=self._service.send_file, args=(path,))
+            sender.start()
+            self.assertEqual(self._pull_socket.recv_multipart(), [b"incoming_file", b"result.sqlite [257.0 KB]"])
+            received = b""
+            for expected_offset in (0, chunk_size, 2 * chunk_size):
+                event, file_path, offset, chunk = self._pull_socket.recv_multipart()
+                self.assertEqual(event, b"file_chunk")
+                self.assertEqual(file_path, b"output/result.sqlite")
+                self.assertEqual(int(offset), expected_offset)
+                received += chunk
+            end_message = self._pull_socket.recv_multipart()
+            sender.join()
+        self.assertEqual(received, data)
+        self.assertEqual(
+            end_message, [b"file_end", b"output/result.sqlite", hashlib.sha256(data).hexdigest().encode("ascii")]
+        )
+
+    def test_empty_file(self):
+        path = self._write_file("empty.txt", b"")
+        self._service.send_file(path)
+        self.assertEqual(self._pull_socket.recv_multipart()[0], b"incoming_file")
+        self.assertEqual(
+            self._pull_socket.recv_multipart(),
+            [b"file_end", b"empty.txt", hashlib.sha256(b"").hexdigest().encode("ascii")],
+        )
+
+    def test_whole_file_is_sent_in_single_message_to_version_1_clients(self):
+        path = self._write_file("output/result.txt", b"result")
+        self._service.send_whole_file(path)
+        self.assertEqual(self._pull_socket.recv_multipart(), [b"incoming_file", b"result.txt [6 B]"])
+        self.assertEqual(self._pull_socket.recv_multipart(), [b"output/result.txt", b"result"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""
+Unit tests for BlobStore class.
+"""
+
+import hashlib
+import os
+from tempfile import TemporaryDirectory
+import time
+import unittest
+from unittest import mock
+from spine_engine.server.util import blob_store
+from spine_engine.server.util.blob_store import BlobStore
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self._store_dir = os.path.join(self._temp_dir.name, "blobs")
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_missing_reports_only_unknown_digests(self):
+        store = BlobStore(self._store_dir)
+        store.add([(_digest(b"a"), b"a")])
+        self.assertEqual(store.missing([_digest(b"a"), _digest(b"b"), _digest(b"b")]), [_digest(b"b")])
+        self.assertEqual(BlobStore(self._store_dir).missing([_digest(b"a")]), [])
+
+    def test_blob_with_wrong_checksum_is_rejected(self):
+        store = BlobStore(self._store_dir)
+        with self.assertRaises(ValueError):
+            store.add([(_digest(b"a"), b"b")])
+        with self.assertRaises(ValueError):
+            store.missing(["../../etc"])
+
+    def test_materialize_copies_blobs_into_project_directory(self):
+        store = BlobStore(self._store_dir)
+        store.add([(_digest(b"script"), b"script"), (_digest(b"data"), b"data")])
+        manifest = {"tool.py": _digest(b"script"), "data/input.csv": _digest(b"data"), "copy.py": _digest(b"script")}
+        project_dir = os.path.join(self._temp_dir.name, "project")
+        store.materialize(manifest, project_dir)
+        with open(os.path.join(project_dir, "data", "input.csv"), "rb") as input_file:
+            self.assertEqual(input_file.read(), b"data")
+        for file_name in ("tool.py", "copy.py"):
+            file_path = os.path.join(project_dir, file_name)
+            with open(file_path, "rb") as script_file:
+                self.assertEqual(script_file.read(), b"script")
+            self.assertFalse(os.path.samefile(file_path, store.path(_digest(b"script"))))
+
+    def test_materialize_refuses_paths_outside_project(self):
+        store = BlobStore(self._store_dir)
+        store.add([(_digest(b"a"), b"a")])
+        with self.assertRaises(ValueError):
+            store.materialize({"../escape.txt": _digest(b"a")}, os.path.join(self._temp_dir.name, "project"))
+
+    def test_modifying_project_file_leaves_blob_intact(self):
+        store = BlobStore(self._store_dir)
+        store.add([(_digest(b"db"), b"db")])
+        project_dir = os.path.join(self._temp_dir.name, "project")
+        store.materialize({"db.sqlite": _digest(b"db")}, project_dir)
+        with open(os.path.join(project_dir, "db.sqlite"), "ab") as db_file:
+            db_file.write(b" modified")
+        self.assertEqual(store.missing([_digest(b"db")]), [])
+        with open(store.path(_digest(b"db")), "rb") as blob_file:
+            self.assertEqual(blob_file.read(), b"db")
+
+    def test_modified_blob_is_missing(self):
+        store = BlobStore(self._store_dir)
+        store.add([(_digest(b"db"), b"db")])
+        with open(store.path(_digest(b"db")), "ab") as blob_file:
+            blob_file.write(b" modified")
+        self.assertEqual(store.missing([_digest(b"db")]), [_digest(b"db")])
+        store.add([(_digest(b"db"), b"db")])
+        self.assertEqual(store.missing([_digest(b"db")]), [])
+
+    def test_prune_removes_blobs_unused_for_timeout(self):
+        store = BlobStore(self._store_dir)
+        store.add([(_digest(b"used"), b"used"), (_digest(b"unused"), b"unused")])
+        with mock.patch.object(blob_store.time, "time", return_value=time.time() + blob_store.BLOB_TIMEOUT):
+            store.materialize({"file": _digest(b"used")}, os.path.join(self._temp_dir.name, "project"))
+            store.prune(force=True)
+        self.assertEqual(store.missing([_digest(b"used"), _digest(b"unused")]), [_digest(b"unused")])
+        self.assertFalse(os.path.exists(store.path(_digest(b"unused"))))
+
+    def test_prune_during_materialize_keeps_blobs_being_copied(self):
+        store = BlobStore(self._store_dir)
+        store.add([(_digest(b"a"), b"a")])
+        copy_file = blob_store.shutil.copyfile
+
+        def prune_and_copy(source, target):
+            store.prune(force=True)
+            return copy_file(source, target)
+
+        project_dir = os.path.join(self._temp_dir.name, "project")
+        with (
+            mock.patch.object(blob_store.time, "time", return_value=time.time() + blob_store.BLOB_TIMEOUT),
+            mock.patch.object(blob_store.shutil, "copyfile", side_effect=prune_and_copy),
+        ):
+            store.materialize({"a.txt": _digest(b"a")}, project_dir)
+        with open(os.path.join(project_dir, "a.txt"), "rb") as project_file:
+            self.assertEqual(project_file.read(), b"a")
+
+    def test_materialize_reports_blob_removed_during_copy(self):
+        store = BlobStore(self._store_dir)
+        store.add([(_digest(b"a"), b"a")])
+        with mock.patch.object(blob_store.shutil, "copyfile", side_effect=FileNotFoundError):
+            with self.assertRaisesRegex(ValueError, _digest(b"a")):
+                store.materialize({"a.txt": _digest(b"a")}, os.path.join(self._temp_dir.name, "project"))
+
+
+if __name__ == "__main__":
+    unittest.main()
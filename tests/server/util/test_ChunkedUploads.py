@@ -0,0 +1,132 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""
+Unit tests for ChunkedUploads class.
+"""
+
+import hashlib
+import os
+from tempfile import TemporaryDirectory
+import threading
+import unittest
+from unittest import mock
+from spine_engine.server.util import chunked_upload
+from spine_engine.server.util.chunked_upload import ChunkedUploads, UploadError
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class TestChunkedUploads(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = TemporaryDirectory()
+        self._data = bytes(range(256)) * 10
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def test_chunks_are_written_to_disk_in_order(self):
+        uploads = ChunkedUploads(self._temp_dir.name)
+        upload = uploads.begin("project", "project.zip", len(self._data), _digest(self._data))
+        offset = 0
+        for start in range(0, len(self._data), 1000):
+            chunk = self._data[start : start + 1000]
+            offset = uploads.write_chunk(upload.upload_id, offset, chunk, _digest(chunk))
+        self.assertEqual(offset, len(self._data))
+        finished = uploads.finish(upload.upload_id)
+        with open(finished.path, "rb") as part_file:
+            self.assertEqual(part_file.read(), self._data)
+        uploads.remove(finished)
+        self.assertFalse(os.path.exists(finished.directory))
+
+    def test_rejected_chunks_report_expected_offset(self):
+        uploads = ChunkedUploads(self._temp_dir.name)
+        upload = uploads.begin("project", "project.zip", len(self._data))
+        chunk = self._data[:100]
+        uploads.write_chunk(upload.upload_id, 0, chunk, _digest(chunk))
+        with self.assertRaises(UploadError) as context:
+            uploads.write_chunk(upload.upload_id, 0, chunk, _digest(chunk))
+        self.assertEqual(context.exception.offset, 100)
+        with self.assertRaises(UploadError) as context:
+            uploads.write_chunk(upload.upload_id, 100, chunk, _digest(b"garbage"))
+        self.assertEqual(context.exception.offset, 100)
+        with self.assertRaises(UploadError) as context:
+            uploads.finish(upload.upload_id)
+        self.assertEqual(context.exception.offset, 100)
+
+    def test_chunks_of_other_uploads_are_written_while_one_upload_is_busy(self):
+        uploads = ChunkedUploads(self._temp_dir.name)
+        busy_upload = uploads.begin("project", "busy.zip", len(self._data))
+        upload = uploads.begin("project", "project.zip", len(self._data))
+        chunk = self._data[:100]
+        with busy_upload.lock:
+            self.assertEqual(uploads.write_chunk(upload.upload_id, 0, chunk, _digest(chunk)), 100)
+
+    def test_chunk_checksum_is_computed_without_holding_store_lock(self):
+        uploads = ChunkedUploads(self._temp_dir.name)
+        upload = uploads.begin("project", "project.zip", len(self._data))
+        lock_free_while_hashing = []
+        original_sha256 = hashlib.sha256
+
+        def sha256(data):
+            acquirer = threading.Thread(target=lambda: lock_free_while_hashing.append(try_acquire()))
+            acquirer.start()
+            acquirer.join()
+            return original_sha256(data)
+
+        def try_acquire():
+            acquired = uploads._lock.acquire(timeout=0.0)
+            if acquired:
+                uploads._lock.release()
+            return acquired
+
+        chunk = self._data[:100]
+        digest = _digest(chunk)
+        with mock.patch.object(chunked_upload.hashlib, "sha256", side_effect=sha256):
+            uploads.write_chunk(upload.upload_id, 0, chunk, digest)
+        self.assertEqual(lock_free_while_hashing, [True])
+
+    def test_upload_can_be_resumed_by_new_instance(self):
+        uploads = ChunkedUploads(self._temp_dir.name)
+        upload = uploads.begin("project", "project.zip", len(self._data))
+        chunk = self._data[:500]
+        uploads.write_chunk(upload.upload_id, 0, chunk, _digest(chunk))
+        restarted_uploads = ChunkedUploads(self._temp_dir.name)
+        resumed = restarted_uploads.begin("project", "project.zip", len(self._data), upload_id=upload.upload_id)
+        self.assertEqual(resumed.offset(), 500)
+        self.assertEqual(resumed.project_name, "project")
+        rest = self._data[500:]
+        restarted_uploads.write_chunk(upload.upload_id, 500, rest, _digest(rest))
+        self.assertEqual(restarted_uploads.finish(upload.upload_id).offset(), len(self._data))
+
+    def test_corrupted_file_fails_final_checksum(self):
+        uploads = ChunkedUploads(self._temp_dir.name)
+        upload = uploads.begin("project", "project.zip", len(self._data), _digest(b"something else"))
+        uploads.write_chunk(upload.upload_id, 0, self._data, _digest(self._data))
+        finished = uploads.finish(upload.upload_id)
+        with self.assertRaises(UploadError):
+            uploads.verify(finished)
+        self.assertFalse(os.path.exists(upload.directory))
+
+    def test_stale_uploads_are_discarded(self):
+        uploads = ChunkedUploads(self._temp_dir.name)
+        upload = uploads.begin("project", "project.zip", len(self._data))
+        with mock.patch.object(chunked_upload, "UPLOAD_TIMEOUT", -1.0):
+            uploads.discard_stale()
+        self.assertFalse(os.path.exists(upload.directory))
+        with self.assertRaises(UploadError):
+            uploads.begin("project", "project.zip", len(self._data), upload_id=upload.upload_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
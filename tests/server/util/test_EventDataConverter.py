@@ -154,6 +154,18 @@ class TestEventDataConverter(unittest.TestCase):
         # The converted & deconverted list must be equal to the original
         self.assertEqual(expected_data, deconverted_events)
 
+    def test_convert_deconvert_batch(self):
+        event_data = self.make_event_data()
+        expected_data = deepcopy(event_data)
+        batch = EventDataConverter.join_batch(
+            EventDataConverter.convert(event_type, data) for event_type, data in event_data
+        )
+        self.assertIsInstance(batch, str)
+        self.assertEqual(expected_data, EventDataConverter.deconvert_batch(batch.encode("utf-8")))
+
+    def test_convert_empty_batch(self):
+        self.assertEqual(EventDataConverter.deconvert_batch(EventDataConverter.join_batch([]).encode("utf-8")), [])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,189 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+
+"""Unit tests for EventPusher class."""
+
+import unittest
+from unittest import mock
+import zmq
+from spine_engine.server.util import event_pusher
+from spine_engine.server.util.event_data_converter import EventDataConverter
+from spine_engine.server.util.event_pusher import EventPusher
+
+
+class TestEventPusher(unittest.TestCase):
+    def setUp(self):
+        self._context = zmq.Context()
+        self._push_socket = self._context.socket(zmq.PUSH)
+        self._push_socket.bind("inproc://test_event_pusher")
+        self._pull_socket = self._context.socket(zmq.PULL)
+        self._pull_socket.connect("inproc://test_event_pusher")
+
+    def tearDown(self):
+        self._pull_socket.close()
+        self._push_socket.close()
+        self._context.term()
+
+    def _receive_events(self):
+        events = []
+        while self._pull_socket.poll(timeout=1000):
+            message_type, batch = self._pull_socket.recv_multipart()
+            self.assertEqual(message_type, b"events")
+            events += EventDataConverter.deconvert_batch(batch)
+            if events and events[-1][0] == "dag_exec_finished":
+                break
+        return events
+
+    def test_events_queued_before_start_are_sent_in_single_batch(self):
+        pusher = EventPusher(self._push_socket)
+        pusher.push("exec_started", {"item_name": "a"})
+        pusher.push("event_msg", {"item_name": "a", "msg_type": "msg", "msg_text": "hello"})
+        pusher.push("dag_exec_finished", "COMPLETED")
+        pusher.start()
+        pusher.close()
+        message_type, batch = self._pull_socket.recv_multipart()
+        self.assertEqual(message_type, b"events")
+        self.assertEqual(
+            EventDataConverter.deconvert_batch(batch),
+            [
+                ("exec_started", {"item_name": "a"}),
+                ("event_msg", {"item_name": "a", "msg_type": "msg", "msg_text": "hello"}),
+                ("dag_exec_finished", "COMPLETED"),
+            ],
+        )
+        self.assertFalse(pusher.is_alive())
+
+    def test_batches_are_limited_in_size(self):
+        pusher = EventPusher(self._push_socket)
+        for i in range(5):
+            pusher.push("event_msg", {"msg_text": str(i)})
+        with mock.patch.object(event_pusher, "MAX_BATCH_SIZE", 2):
+            pusher.start()
+            pusher.close()
+        batch_sizes = []
+        while self._pull_socket.poll(timeout=0):
+            _, batch = self._pull_socket.recv_multipart()
+            batch_sizes.append(len(EventDataConverter.deconvert_batch(batch)))
+        self.assertEqual(batch_sizes, [2, 2, 1])
+
+    def test_low_priority_events_are_dropped_when_buffer_is_full(self):
+        pusher = EventPusher(self._push_socket, max_buffered_events=2)
+        pusher.push("event_msg", {"msg_text": "first"})
+        pusher.push("event_msg", {"msg_text": "second"})
+        pusher.push("resource_usage_msg", {"item_name": "a", "filter_id": "", "memory": 1})
+        pusher.push("event_msg", {"msg_text": "third"})
+        pusher.push("dag_exec_finished", "COMPLETED")
+        self.assertEqual(pusher.dropped_count, 1)
+        pusher.start()
+        pusher.close()
+        self.assertEqual(
+            self._receive_events(),
+            [
+                ("event_msg", {"msg_text": "first"}),
+                ("event_msg", {"msg_text": "second"}),
+                ("event_msg", {"msg_text": "third"}),
+                ("dag_exec_finished", "COMPLETED"),
+            ],
+        )
+
+    def test_output_is_summarized_when_buffer_is_full(self):
+        pusher = EventPusher(self._push_socket, max_buffered_events=2)
+        pusher.push("event_msg", {"msg_text": "first"})
+        pusher.push("event_msg", {"msg_text": "second"})
+        with mock.patch.object(event_pusher, "DEFAULT_TAIL_LENGTH", 2):
+            for i in range(3):
+                pusher.push(
+                    "kernel_execution_msg", {"item_name": "a", "filter_id": "", "type": "stdout", "data": str(i)}
+                )
+        pusher.push("dag_exec_finished", "COMPLETED")
+        pusher.start()
+        pusher.close()
+        self.assertEqual(
+            self._receive_events(),
+            [
+                ("event_msg", {"msg_text": "first"}),
+                ("event_msg", {"msg_text": "second"}),
+                (
+                    "event_msg",
+                    {
+                        "item_name": "a",
+                        "filter_id": "",
+                        "msg_type": "msg_warning",
+                        "msg_text": "3 lines of output suppressed because the client could not keep up; "
+                        "the last 2 follow",
+                    },
+                ),
+                ("kernel_execution_msg", {"item_name": "a", "filter_id": "", "type": "stdout", "data": "1"}),
+                ("kernel_execution_msg", {"item_name": "a", "filter_id": "", "type": "stdout", "data": "2"}),
+                ("dag_exec_finished", "COMPLETED"),
+            ],
+        )
+
+    def test_flooding_output_keeps_buffer_bounded(self):
+        pusher = EventPusher(self._push_socket, max_buffered_events=10)
+        for i in range(1000):
+            pusher.push(
+                "persistent_execution_msg", {"item_name": "a", "filter_id": "", "type": "stdout", "data": str(i)}
+            )
+            pusher.push("process_msg", {"item_name": "b", "filter_id": "", "msg_type": "msg_error", "msg_text": str(i)})
+        self.assertEqual(len(pusher._events), 10)
+        pusher.start()
+        pusher.close()
+        events = self._receive_events()
+        warnings = [data["msg_text"] for event_type, data in events if event_type == "event_msg"]
+        self.assertEqual(
+            warnings,
+            [
+                "995 lines of output suppressed because the client could not keep up; the last 100 follow",
+                "995 lines of output suppressed because the client could not keep up; the last 100 follow",
+            ],
+        )
+        self.assertEqual(
+            events[-1], ("process_msg", {"item_name": "b", "filter_id": "", "msg_type": "msg_error", "msg_text": "999"})
+        )
+
+    def test_send_failure_is_reported_and_later_events_are_discarded(self):
+        failing_socket = mock.MagicMock()
+        failing_socket.send_multipart.side_effect = [zmq.ZMQError(zmq.EAGAIN, "send failed"), None]
+        pusher = EventPusher(failing_socket)
+        pusher.push("event_msg", {"msg_text": "first"})
+        pusher.start()
+        pusher.join(timeout=5.0)
+        self.assertFalse(pusher.is_alive())
+        pusher.push("event_msg", {"msg_text": "second"})
+        pusher.close()
+        self.assertEqual(failing_socket.send_multipart.call_count, 2)
+        frames = failing_socket.send_multipart.call_args.args[0]
+        self.assertEqual(frames[0], b"events")
+        [(event_type, data)] = EventDataConverter.deconvert_batch(frames[1])
+        self.assertEqual(event_type, "server_execution_error")
+        self.assertIn("Sending events to client failed on Server", data)
+
+    def test_events_pushed_while_running_are_sent(self):
+        pusher = EventPusher(self._push_socket)
+        pusher.start()
+        for i in range(10):
+            pusher.push("event_msg", {"msg_text": str(i)})
+        pusher.push("dag_exec_finished", "COMPLETED")
+        events = self._receive_events()
+        pusher.close()
+        expected = [("event_msg", {"msg_text": str(i)}) for i in range(10)] + [("dag_exec_finished", "COMPLETED")]
+        self.assertEqual(events, expected)
+
+    def test_close_without_start(self):
+        pusher = EventPusher(self._push_socket)
+        pusher.close()
+        self.assertFalse(self._pull_socket.poll(timeout=0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -16,7 +16,11 @@ Unit tests for FileExtractor class.
 
 import os
 from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
 import unittest
+from unittest import mock
+from zipfile import ZIP_STORED, BadZipFile, ZipFile
 from spine_engine.server.util.zip_handler import ZipHandler
 
 
@@ -38,6 +42,54 @@ class TestZipHandler(unittest.TestCase):
         ZipHandler.delete_folder(output_dir_path)
         self.assertEqual(os.path.isdir(output_dir_path), False)
 
+    def test_extract_extracts_large_members_in_parallel(self):
+        with TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "project.zip")
+            contents = {f"dir{i}/file{i}.bin": bytes([i]) * (200 + i) for i in range(5)}
+            contents["small.txt"] = b"x"
+            with ZipFile(zip_path, "w") as zip_obj:
+                for name, data in contents.items():
+                    zip_obj.writestr(name, data)
+            output_dir = os.path.join(temp_dir, "output")
+            with mock.patch("spine_engine.server.util.zip_handler.PARALLEL_EXTRACTION_THRESHOLD", 100):
+                ZipHandler.extract(zip_path, output_dir)
+            for name, data in contents.items():
+                with open(os.path.join(output_dir, *name.split("/")), "rb") as extracted:
+                    self.assertEqual(extracted.read(), data)
+
+    def test_extract_raises_on_crc_mismatch(self):
+        with TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "project.zip")
+            payload = b"spine" * 100
+            with ZipFile(zip_path, "w", compression=ZIP_STORED) as zip_obj:
+                zip_obj.writestr("data.txt", payload)
+            with open(zip_path, "rb") as zip_file:
+                archive = zip_file.read()
+            with open(zip_path, "wb") as zip_file:
+                zip_file.write(archive.replace(payload, b"SPINE" + payload[5:]))
+            with self.assertRaises(BadZipFile):
+                ZipHandler.extract(zip_path, os.path.join(temp_dir, "output"))
+
+    def test_extract_keeps_members_inside_output_folder(self):
+        with TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "project.zip")
+            with ZipFile(zip_path, "w") as zip_obj:
+                zip_obj.writestr("../../escaped.txt", b"a" * 200)
+            output_dir = os.path.join(temp_dir, "output")
+            ZipHandler.extract(zip_path, output_dir)
+            self.assertTrue(os.path.isfile(os.path.join(output_dir, "escaped.txt")))
+            self.assertFalse(os.path.exists(os.path.join(temp_dir, "escaped.txt")))
+
+    @unittest.skipUnless(sys.platform == "win32", "Windows specific test")
+    def test_extract_replaces_characters_windows_does_not_allow(self):
+        with TemporaryDirectory() as temp_dir:
+            zip_path = os.path.join(temp_dir, "project.zip")
+            with ZipFile(zip_path, "w") as zip_obj:
+                zip_obj.writestr("data/results:2024?.csv", b"a")
+            output_dir = os.path.join(temp_dir, "output")
+            ZipHandler.extract(zip_path, output_dir)
+            self.assertTrue(os.path.isfile(os.path.join(output_dir, "data", "results_2024_.csv")))
+
     def test_extract_invalid_input(self):
         with self.assertRaises(ValueError):
             ZipHandler.extract("", "./output")
@@ -16,6 +16,7 @@ from functools import partial
 import gc
 import os.path
 import sys
+import threading
 import unittest
 from unittest.mock import MagicMock, NonCallableMagicMock, call, patch
 import pytest
@@ -108,7 +109,9 @@ class TestSpineEngine:
         return resource
 
     @staticmethod
-    def _create_engine(items, connections, item_instances, execution_permits=None, jumps=None):
+    def _create_engine(
+        items, connections, item_instances, execution_permits=None, jumps=None, event_types=None, settings=None
+    ):
         if execution_permits is None:
             execution_permits = {item_name: True for item_name in items}
         with patch("spine_engine.spine_engine.create_timestamp") as mock_create_timestamp:
@@ -119,6 +122,8 @@ class TestSpineEngine:
                 jumps=jumps,
                 execution_permits=execution_permits,
                 items_module_name="items_module",
+                event_types=event_types,
+                settings=settings,
             )
 
         def make_item(name, direction):
@@ -149,6 +154,109 @@ class TestSpineEngine:
         mock_item_a.exclude_execution.assert_not_called()
         assert mock_item_a.filter_id == ""
 
+    def test_get_events_returns_batches_ending_with_dag_exec_finished(self):
+        mock_item_a = self._mock_item("item_a")
+        item_instances = {"item_a": [mock_item_a]}
+        items = {"item_a": {"type": "TestItem"}}
+        engine = self._create_engine(items, [], item_instances)
+        events = []
+        while not events or events[-1][0] != "dag_exec_finished":
+            batch = engine.get_events()
+            assert batch
+            events += batch
+        event_types = [event_type for event_type, _ in events]
+        assert event_types.count("exec_started") == 2
+        assert event_types.count("exec_finished") == 2
+        assert events[-1] == ("dag_exec_finished", "COMPLETED")
+        with pytest.raises(StopIteration):
+            engine.get_events()
+
+    def test_unsubscribed_events_are_dropped(self):
+        mock_item_a = self._mock_item("item_a")
+        item_instances = {"item_a": [mock_item_a]}
+        items = {"item_a": {"type": "TestItem"}}
+        engine = self._create_engine(items, [], item_instances, event_types=["exec_finished"])
+        events = []
+        while not events or events[-1][0] != "dag_exec_finished":
+            events += engine.get_events()
+        assert [event_type for event_type, _ in events] == ["exec_finished", "exec_finished", "dag_exec_finished"]
+
+    def test_read_output_log_requires_project_dir(self):
+        engine = self._create_engine({"item_a": {"type": "TestItem"}}, [], {"item_a": [self._mock_item("item_a")]})
+        with pytest.raises(ValueError):
+            engine.read_output_log("output.log", 0, 10)
+
+    def test_downstream_items_are_prewarmed_while_upstream_executes(self):
+        prewarmed = threading.Event()
+        mock_item_a = self._mock_item("item_a")
+        mock_item_a.execute.side_effect = lambda *args: (
+            ItemExecutionFinishState.SUCCESS if prewarmed.wait(10.0) else ItemExecutionFinishState.FAILURE
+        )
+        mock_item_b = self._mock_item("item_b")
+        mock_item_c = self._mock_item("item_c")
+        item_instances = {"item_a": [mock_item_a], "item_b": [mock_item_b], "item_c": [mock_item_c]}
+        items = {"item_a": {"type": "TestItem"}, "item_b": {"type": "TestItem"}, "item_c": {"type": "TestItem"}}
+        connections = [
+            {"from": ("item_a", "right"), "to": ("item_b", "left")},
+            {"from": ("item_b", "right"), "to": ("item_c", "left")},
+        ]
+        execution_permits = {"item_a": True, "item_b": True, "item_c": False}
+        engine = self._create_engine(
+            items,
+            connections,
+            item_instances,
+            execution_permits,
+            settings={"engineSettings/prewarmPersistent": "true"},
+        )
+        silent_items = {name: NonCallableMagicMock() for name in items}
+        silent_items["item_b"].prewarm.side_effect = prewarmed.set
+        engine._make_silent_item = silent_items.get
+        with (
+            patch("spine_engine.spine_engine.discard_prewarmed_persistent_managers") as discard_persistent_managers,
+            patch("spine_engine.spine_engine.discard_prewarmed_kernel_managers") as discard_kernel_managers,
+        ):
+            engine.run()
+            engine._prewarm_thread.join()
+        assert engine.state() == SpineEngineState.COMPLETED
+        silent_items["item_b"].prewarm.assert_called_once_with()
+        silent_items["item_c"].prewarm.assert_not_called()
+        discard_persistent_managers.assert_called_once_with(engine._acquisition_tag)
+        discard_kernel_managers.assert_called_once_with(engine._acquisition_tag)
+
+    def test_execution_does_not_wait_for_prewarming_to_finish(self):
+        prewarm_started = threading.Event()
+        release_prewarm = threading.Event()
+        mock_item_a = self._mock_item("item_a")
+        mock_item_a.execute.side_effect = lambda *args: (
+            ItemExecutionFinishState.SUCCESS if prewarm_started.wait(10.0) else ItemExecutionFinishState.FAILURE
+        )
+        mock_item_b = self._mock_item("item_b")
+        item_instances = {"item_a": [mock_item_a], "item_b": [mock_item_b]}
+        items = {"item_a": {"type": "TestItem"}, "item_b": {"type": "TestItem"}}
+        connections = [{"from": ("item_a", "right"), "to": ("item_b", "left")}]
+        engine = self._create_engine(
+            items,
+            connections,
+            item_instances,
+            {"item_a": True, "item_b": True},
+            settings={"engineSettings/prewarmPersistent": "true"},
+        )
+        silent_items = {name: NonCallableMagicMock() for name in items}
+        silent_items["item_b"].prewarm.side_effect = lambda: prewarm_started.set() or release_prewarm.wait(10.0)
+        engine._make_silent_item = silent_items.get
+        with (
+            patch("spine_engine.spine_engine.discard_prewarmed_persistent_managers") as discard_persistent_managers,
+            patch("spine_engine.spine_engine.discard_prewarmed_kernel_managers") as discard_kernel_managers,
+        ):
+            engine.run()
+            assert engine.state() == SpineEngineState.COMPLETED
+            assert engine._prewarm_thread.is_alive()
+            discard_persistent_managers.assert_not_called()
+            release_prewarm.set()
+            engine._prewarm_thread.join()
+        discard_persistent_managers.assert_called_once_with(engine._acquisition_tag)
+        discard_kernel_managers.assert_called_once_with(engine._acquisition_tag)
+
     def test_linear_execution(self):
         """Test execution with items a-b-c in a line."""
         url_prefix = "db:///" if sys.platform == "win32" else "db:////"
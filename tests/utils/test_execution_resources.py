@@ -0,0 +1,261 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""Unit tests for ``execution_resources`` module."""
+
+import threading
+import time
+import unittest
+from spine_engine.utils.execution_resources import (
+    AcquisitionTag,
+    AdaptiveLimit,
+    ResourceSemaphore,
+    acquisition_tag,
+    current_acquisition_tag,
+)
+
+_MB = 1024 * 1024
+
+
+class TestAdaptiveLimit(unittest.TestCase):
+    def test_limit_follows_available_memory(self):
+        limit = AdaptiveLimit(8, min_free_memory=100 * _MB, memory_per_process=50 * _MB, memory_probe=lambda: 300 * _MB)
+        self.assertEqual(limit.evaluate(0)["effective_limit"], 4)
+        self.assertEqual(limit.evaluate(2)["effective_limit"], 6)
+
+    def test_limit_is_capped_by_max_processes(self):
+        limit = AdaptiveLimit(2, memory_probe=lambda: 1024 * 1024 * _MB, load_probe=lambda: 0.0)
+        self.assertEqual(limit.evaluate(0)["effective_limit"], 2)
+
+    def test_high_load_admits_no_new_processes(self):
+        limit = AdaptiveLimit(8, max_load_per_cpu=1.0, memory_probe=lambda: None, load_probe=lambda: 3.0)
+        self.assertEqual(limit.evaluate(3)["effective_limit"], 3)
+
+    def test_one_process_is_always_admitted(self):
+        limit = AdaptiveLimit(8, memory_probe=lambda: 0, load_probe=lambda: 10.0)
+        decision = limit.evaluate(0)
+        self.assertEqual(decision, {"effective_limit": 1, "available_memory": 0, "load_per_cpu": 10.0})
+
+
+class TestResourceSemaphore(unittest.TestCase):
+    def test_adaptive_limit_shrinks_under_memory_pressure(self):
+        memory = [1000 * _MB]
+        semaphore = ResourceSemaphore("test")
+        semaphore.set_limit(
+            AdaptiveLimit(4, min_free_memory=0, memory_per_process=100 * _MB, memory_probe=lambda: memory[0])
+        )
+        decisions = []
+        semaphore.add_listener(decisions.append)
+        self.assertTrue(semaphore.acquire(timeout=0.0))
+        memory[0] = 0
+        self.assertFalse(semaphore.acquire(timeout=0.1))
+        self.assertEqual(
+            [(d["decision"], d["effective_limit"]) for d in decisions],
+            [("limit_changed", 4), ("limit_changed", 1), ("deferred", 1)],
+        )
+        self.assertEqual(decisions[0]["limiter"], "test")
+        semaphore.release()
+
+    def test_waiting_thread_is_admitted_when_memory_frees_up(self):
+        memory = [0]
+        semaphore = ResourceSemaphore()
+        semaphore.set_limit(
+            AdaptiveLimit(4, min_free_memory=0, memory_per_process=100 * _MB, memory_probe=lambda: memory[0])
+        )
+        self.assertTrue(semaphore.acquire())
+        acquired = threading.Event()
+
+        def acquire():
+            if semaphore.acquire(timeout=10.0):
+                acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        self.assertFalse(acquired.wait(0.1))
+        memory[0] = 100 * _MB
+        self.assertTrue(acquired.wait(5.0))
+        thread.join()
+        semaphore.release()
+        semaphore.release()
+
+    def test_listener_receives_decisions_of_its_group_only(self):
+        memory = [0]
+        semaphore = ResourceSemaphore()
+        semaphore.set_limit(
+            AdaptiveLimit(4, min_free_memory=0, memory_per_process=100 * _MB, memory_probe=lambda: memory[0])
+        )
+        own_decisions = []
+        other_decisions = []
+        all_decisions = []
+        semaphore.add_listener(own_decisions.append, "engine-a")
+        semaphore.add_listener(other_decisions.append, "engine-b")
+        semaphore.add_listener(all_decisions.append)
+        tag = AcquisitionTag("engine-a")
+        self.assertTrue(semaphore.acquire(tag=tag))
+        self.assertFalse(semaphore.acquire(timeout=0.0, tag=tag))
+        self.assertEqual([d["decision"] for d in own_decisions], ["limit_changed", "deferred"])
+        self.assertEqual(other_decisions, [])
+        self.assertEqual(all_decisions, own_decisions)
+        semaphore.release(tag)
+
+    def test_reclaimer_frees_permit_for_waiting_acquisition_only(self):
+        semaphore = ResourceSemaphore()
+        self.assertTrue(semaphore.acquire())
+        reclaimed = []
+
+        def reclaim():
+            if reclaimed:
+                return False
+            reclaimed.append(True)
+            semaphore.release()
+            return True
+
+        semaphore.add_reclaimer(reclaim)
+        self.assertFalse(semaphore.acquire(timeout=0.0))
+        self.assertEqual(reclaimed, [])
+        self.assertTrue(semaphore.acquire(timeout=0.1))
+        self.assertEqual(reclaimed, [True])
+        semaphore.release()
+
+    def test_removed_listener_is_not_called(self):
+        semaphore = ResourceSemaphore()
+        semaphore.set_limit(AdaptiveLimit(1, memory_probe=lambda: None, load_probe=lambda: None))
+        decisions = []
+        semaphore.add_listener(decisions.append)
+        semaphore.remove_listener(decisions.append)
+        self.assertTrue(semaphore.acquire())
+        semaphore.release()
+        self.assertEqual(decisions, [])
+
+    def test_fixed_limit(self):
+        semaphore = ResourceSemaphore()
+        self.assertTrue(semaphore.acquire(timeout=0.0))
+        self.assertFalse(semaphore.acquire(timeout=0.0))
+        semaphore.set_limit(2)
+        self.assertTrue(semaphore.acquire(timeout=0.0))
+        semaphore.release()
+        semaphore.release()
+
+    def test_waiters_are_admitted_in_fifo_order(self):
+        semaphore = ResourceSemaphore()
+        self.assertTrue(semaphore.acquire())
+        admitted = self._start_waiters(semaphore, [AcquisitionTag(), AcquisitionTag(), AcquisitionTag()])
+        for _ in range(3):
+            semaphore.release()
+            self._wait_for_admissions(admitted, 1 + len(admitted))
+        self.assertEqual(admitted, [0, 1, 2])
+        semaphore.release()
+
+    def test_higher_priority_is_admitted_first(self):
+        semaphore = ResourceSemaphore()
+        self.assertTrue(semaphore.acquire())
+        admitted = self._start_waiters(semaphore, [AcquisitionTag(priority=0), AcquisitionTag(priority=5)])
+        semaphore.release()
+        self._wait_for_admissions(admitted, 1)
+        semaphore.release()
+        self._wait_for_admissions(admitted, 2)
+        self.assertEqual(admitted, [1, 0])
+        semaphore.release()
+
+    def test_group_holding_fewer_processes_goes_first(self):
+        semaphore = ResourceSemaphore()
+        semaphore.set_limit(2)
+        tag_a = AcquisitionTag("a")
+        tag_b = AcquisitionTag("b")
+        self.assertTrue(semaphore.acquire(tag=tag_a))
+        self.assertTrue(semaphore.acquire(tag=tag_a))
+        admitted = self._start_waiters(semaphore, [tag_a, tag_b])
+        semaphore.release(tag_a)
+        self._wait_for_admissions(admitted, 1)
+        self.assertEqual(admitted, [1])
+        semaphore.release(tag_a)
+        self._wait_for_admissions(admitted, 2)
+        semaphore.release(tag_a)
+        semaphore.release(tag_b)
+
+    def test_quota_limits_group(self):
+        semaphore = ResourceSemaphore()
+        semaphore.set_limit("unlimited")
+        semaphore.set_quota("a", 1)
+        tag = AcquisitionTag("a")
+        self.assertTrue(semaphore.acquire(tag=tag))
+        self.assertFalse(semaphore.acquire(timeout=0.0, tag=tag))
+        self.assertTrue(semaphore.acquire(timeout=0.0, tag=AcquisitionTag("b")))
+        semaphore.set_quota("a", None)
+        self.assertTrue(semaphore.acquire(timeout=0.0, tag=tag))
+
+    def test_discarded_group_leaves_no_accounting_behind(self):
+        semaphore = ResourceSemaphore()
+        semaphore.set_limit(2)
+        semaphore.set_quota("a", 1)
+        tag = AcquisitionTag("a")
+        self.assertTrue(semaphore.acquire(tag=tag))
+        semaphore.discard_group("a")
+        self.assertEqual(semaphore.metrics()["processes_by_group"], {})
+        self.assertTrue(semaphore.acquire(timeout=0.0, tag=tag))
+        self.assertFalse(semaphore.acquire(timeout=0.0, tag=AcquisitionTag("b")))
+        semaphore.release(tag)
+        semaphore.release(tag)
+        metrics = semaphore.metrics()
+        self.assertEqual(metrics["process_count"], 0)
+        self.assertEqual(metrics["processes_by_group"], {})
+
+    def test_metrics(self):
+        semaphore = ResourceSemaphore()
+        with acquisition_tag(AcquisitionTag("a")):
+            self.assertTrue(semaphore.acquire())
+            self.assertFalse(semaphore.acquire(timeout=0.05))
+            admitted = self._start_waiters(semaphore, [AcquisitionTag("b")])
+            self._wait_for_queue_depth(semaphore, 1)
+            metrics = semaphore.metrics()
+            self.assertEqual(metrics["limit"], 1)
+            self.assertEqual(metrics["process_count"], 1)
+            self.assertEqual(metrics["queue_depth"], 1)
+            self.assertEqual(metrics["processes_by_group"], {"a": 1})
+            self.assertEqual(metrics["waiting_by_group"], {"b": 1})
+            semaphore.release()
+        self._wait_for_admissions(admitted, 1)
+        metrics = semaphore.metrics()
+        self.assertEqual(metrics["acquisitions"], 2)
+        self.assertGreater(metrics["max_wait_time"], 0.0)
+        self.assertEqual(metrics["processes_by_group"], {"b": 1})
+
+    def test_acquisition_tag_is_restored(self):
+        tag = AcquisitionTag("a", 1)
+        with acquisition_tag(tag):
+            self.assertIs(current_acquisition_tag(), tag)
+        self.assertEqual(current_acquisition_tag(), AcquisitionTag())
+
+    @staticmethod
+    def _start_waiters(semaphore, tags):
+        admitted = []
+        for index, tag in enumerate(tags):
+            threading.Thread(
+                target=lambda i=index, t=tag: semaphore.acquire(tag=t) and admitted.append(i), daemon=True
+            ).start()
+            TestResourceSemaphore._wait_for_queue_depth(semaphore, index + 1)
+        return admitted
+
+    @staticmethod
+    def _wait_for_queue_depth(semaphore, depth):
+        deadline = time.monotonic() + 5.0
+        while semaphore.metrics()["queue_depth"] != depth and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+    @staticmethod
+    def _wait_for_admissions(admitted, count):
+        deadline = time.monotonic() + 5.0
+        while len(admitted) < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""Unit tests for ``output_limiter`` module."""
+
+import gc
+import os
+import pickle
+import threading
+from spine_engine.utils.output_limiter import (
+    OutputCoalescer,
+    OutputLimiter,
+    OutputLog,
+    OutputRateLimit,
+    collapse_carriage_returns,
+    read_output_log,
+)
+
+
+class TestOutputLimiter:
+    def test_unlimited_limiter_admits_everything(self):
+        limiter = OutputLimiter()
+        assert all(limiter.admit(f"line {i}") for i in range(10000))
+        assert limiter.take_suppressed_summary() is None
+        assert limiter.spool_path is None
+
+    def test_lines_exceeding_burst_are_spooled(self):
+        limiter = OutputLimiter(lines_per_second=0.001, burst=2)
+        admitted = [limiter.admit(f"line {i}") for i in range(5)]
+        assert admitted == [True, True, False, False, False]
+        summary = limiter.take_suppressed_summary()
+        assert summary == f"3 lines suppressed, full output in {limiter.spool_path}"
+        assert limiter.take_suppressed_summary() is None
+        limiter.close()
+        try:
+            with open(limiter.spool_path, encoding="utf-8") as spool:
+                assert spool.read() == "line 2\nline 3\nline 4\n"
+        finally:
+            limiter.discard()
+        assert not os.path.exists(limiter.spool_path)
+
+    def test_spool_file_is_reopened_after_close(self):
+        limiter = OutputLimiter(lines_per_second=0.001, burst=1)
+        assert limiter.admit("line 1")
+        assert not limiter.admit("line 2")
+        limiter.close()
+        assert not limiter.admit("line 3")
+        limiter.close()
+        try:
+            with open(limiter.spool_path, encoding="utf-8") as spool:
+                assert spool.read() == "line 2\nline 3\n"
+        finally:
+            limiter.discard()
+
+    def test_spool_file_is_removed_with_limiter(self):
+        limiter = OutputLimiter(lines_per_second=0.001, burst=1)
+        limiter.admit("line 1")
+        limiter.admit("line 2")
+        limiter.finish()
+        spool_path = limiter.spool_path
+        assert os.path.exists(spool_path)
+        del limiter
+        gc.collect()
+        assert not os.path.exists(spool_path)
+
+    def test_all_lines_go_to_output_log_and_tail_is_kept(self, tmp_path):
+        output_log = OutputLog(str(tmp_path))
+        limiter = OutputLimiter(lines_per_second=0.001, burst=1, output_log=output_log, tail_length=2)
+        assert limiter.admit("line 1")
+        assert not limiter.admit("line 2")
+        assert not limiter.admit("line 3", "stderr")
+        assert not limiter.admit("line 4")
+        summary, tail = limiter.finish()
+        assert summary == f"3 lines suppressed, full output in {output_log.path}"
+        assert tail == [("stderr", "line 3"), ("stdout", "line 4")]
+        assert os.path.dirname(output_log.path) == str(tmp_path)
+        assert output_log.read(0, 100) == b"line 1\nline 2\nline 3\nline 4\n"
+
+    def test_tail_is_kept_across_summaries(self):
+        limiter = OutputLimiter(lines_per_second=0.001, burst=1, tail_length=2)
+        limiter.admit("line 1")
+        limiter.admit("line 2")
+        limiter.take_suppressed_summary()
+        assert limiter.finish() == (None, [("stdout", "line 2")])
+        limiter.discard()
+
+
+class TestOutputLog:
+    def test_read_byte_range(self, tmp_path):
+        output_log = OutputLog(str(tmp_path))
+        assert output_log.path is None
+        assert output_log.read(0, 10) == b""
+        output_log.write("first line")
+        output_log.write("second line\n")
+        assert output_log.read(6, 10) == b"line\nsecon"
+        assert read_output_log(output_log.path, 100, 10) == b""
+        output_log.close()
+
+    def test_filter_id_is_part_of_file_name(self, tmp_path):
+        output_log = OutputLog(str(tmp_path))
+        output_log.set_filter_id("my filter")
+        output_log.write("line")
+        output_log.close()
+        assert os.path.basename(output_log.path).endswith("_746eb990e6c224db1117e809c1891c826ee21ada.log")
+
+    def test_log_is_rotated(self, tmp_path):
+        output_log = OutputLog(str(tmp_path), max_bytes=10, backup_count=2)
+        for i in range(4):
+            output_log.write(f"line {i} ...")
+        output_log.close()
+        path = output_log.path
+        assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in (path, path + ".1", path + ".2"))
+        assert read_output_log(path + ".1", 0, 100) == b"line 3 ...\n"
+        assert read_output_log(path + ".2", 0, 100) == b"line 2 ...\n"
+
+    def test_pickling_drops_open_file(self, tmp_path):
+        output_log = OutputLog(str(tmp_path))
+        output_log.write("line")
+        unpickled = pickle.loads(pickle.dumps(output_log))
+        assert unpickled.path is None
+        output_log.close()
+
+
+class TestOutputRateLimit:
+    def test_make_limiter_uses_current_limits(self):
+        rate_limit = OutputRateLimit()
+        rate_limit.set_limit(0.001, burst=1)
+        limiter = rate_limit.make_limiter()
+        assert limiter.admit("line 1")
+        assert not limiter.admit("line 2")
+        limiter.discard()
+        rate_limit.set_limit("unlimited")
+        limiter = rate_limit.make_limiter()
+        assert limiter.admit("line 1")
+        assert limiter.admit("line 2")
+
+    def test_limiter_with_output_log_respects_unlimited_rate(self, tmp_path):
+        rate_limit = OutputRateLimit()
+        rate_limit.set_limit("unlimited", burst=2)
+        output_log = OutputLog(str(tmp_path))
+        limiter = rate_limit.make_limiter(output_log)
+        assert all(limiter.admit(f"line {i}") for i in range(2000))
+        assert limiter.finish() == (None, [])
+        assert output_log.read(0, 100000).count(b"\n") == 2000
+
+
+class TestCollapseCarriageReturns:
+    def test_text_without_carriage_returns_is_unchanged(self):
+        assert collapse_carriage_returns("a\nb\n") == "a\nb\n"
+
+    def test_only_last_overwrite_of_line_is_kept(self):
+        assert collapse_carriage_returns("10%\r20%\r30%\ndone\n") == "\r30%\ndone\n"
+
+    def test_trailing_carriage_return_and_crlf_are_kept(self):
+        assert collapse_carriage_returns("10%\r") == "10%\r"
+        assert collapse_carriage_returns("a\r\nb\r\n") == "a\r\nb\r\n"
+
+
+class TestOutputCoalescer:
+    def test_chunks_of_same_stream_are_forwarded_together(self):
+        forwarded = []
+        coalescer = OutputCoalescer(lambda stream, text: forwarded.append((stream, text)), window=60.0)
+        for i in range(100):
+            coalescer.add("stdout", f"{i}%\r")
+        coalescer.add("stdout", "done\n")
+        assert forwarded == []
+        coalescer.close()
+        assert forwarded == [("stdout", "\rdone\n")]
+
+    def test_stream_change_keeps_order(self):
+        forwarded = []
+        coalescer = OutputCoalescer(lambda stream, text: forwarded.append((stream, text)), window=60.0)
+        coalescer.add("stdout", "a\n")
+        coalescer.add("stdout", "b\n")
+        coalescer.add("stderr", "c\n")
+        coalescer.add("stdout", "d\n")
+        coalescer.close()
+        assert forwarded == [("stdout", "a\nb\n"), ("stderr", "c\n"), ("stdout", "d\n")]
+
+    def test_size_limit_forwards_immediately(self):
+        forwarded = []
+        coalescer = OutputCoalescer(lambda stream, text: forwarded.append((stream, text)), window=60.0, max_chars=4)
+        coalescer.add("stdout", "ab")
+        coalescer.add("stdout", "cd")
+        assert forwarded == [("stdout", "abcd")]
+        coalescer.close()
+
+    def test_window_expiry_forwards_in_background(self):
+        forwarded = threading.Event()
+        coalescer = OutputCoalescer(lambda stream, text: forwarded.set(), window=0.01)
+        coalescer.add("stdout", "a\n")
+        assert forwarded.wait(5.0)
+        coalescer.close()
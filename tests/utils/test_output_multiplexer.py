@@ -0,0 +1,52 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""Unit tests for ``output_multiplexer`` module."""
+
+import os
+import threading
+from spine_engine.utils.output_multiplexer import OutputMultiplexer
+
+
+def _open_pipe():
+    read_fd, write_fd = os.pipe()
+    return os.fdopen(read_fd, "rb"), write_fd
+
+
+class TestOutputMultiplexer:
+    def test_lines_are_split_across_chunks(self):
+        multiplexer = OutputMultiplexer()
+        stream, write_fd = _open_pipe()
+        lines = []
+        closed = threading.Event()
+        multiplexer.add_stream(stream, lines.append, closed.set)
+        stream.close()
+        os.write(write_fd, "first line\nsecond ".encode("utf-8"))
+        os.write(write_fd, "line\nthird line ä".encode("utf-8")[:-1])
+        os.write(write_fd, "ä".encode("utf-8")[-1:])
+        os.close(write_fd)
+        assert closed.wait(5.0)
+        assert lines == ["first line", "second line", "third line ä"]
+
+    def test_multiple_streams_are_served(self):
+        multiplexer = OutputMultiplexer()
+        outputs = {}
+        events = []
+        for name in ("a", "b", "c"):
+            stream, write_fd = _open_pipe()
+            outputs[name] = []
+            event = threading.Event()
+            events.append(event)
+            multiplexer.add_stream(stream, outputs[name].append, event.set)
+            os.write(write_fd, f"hello from {name}\n".encode("utf-8"))
+            os.close(write_fd)
+        assert all(event.wait(5.0) for event in events)
+        assert outputs == {"a": ["hello from a"], "b": ["hello from b"], "c": ["hello from c"]}
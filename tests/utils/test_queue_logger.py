@@ -9,8 +9,21 @@
 # Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
 # this program. If not, see <http://www.gnu.org/licenses/>.
 ######################################################################################################################
+from hashlib import sha1
+import multiprocessing as mp
 from queue import Queue
-from spine_engine.utils.queue_logger import QueueLogger
+import threading
+import pytest
+from spine_engine.utils.queue_logger import BatchingQueue, PromptBroker, QueueLogger, prepare_prompts_for_fork
+from spine_engine.utils.returning_process import ReturningProcess
+
+
+def _prompt_in_child(logger, answer_queue):
+    answer_queue.put(logger.prompt.emit("question"))
+
+
+def _prompt_in_returning_process(process, logger):
+    return logger.prompt.emit("question")
 
 
 class MessageStoringSlot:
@@ -24,7 +37,7 @@ class MessageStoringSlot:
 class TestQueueLogger:
     def test_msg(self):
         queue = Queue()
-        logger = QueueLogger(queue, "item's name", None, None)
+        logger = QueueLogger(queue, "item's name", None)
         slot = MessageStoringSlot()
         logger.msg.connect(slot)
         logger.msg.emit("my message")
@@ -36,7 +49,7 @@ class TestQueueLogger:
 
     def test_msg_standard_execution(self):
         queue = Queue()
-        logger = QueueLogger(queue, "item's name", None, None)
+        logger = QueueLogger(queue, "item's name", None)
         slot = MessageStoringSlot()
         logger.msg_standard_execution.connect(slot)
         logger.msg_standard_execution.emit({"exec_key": "exec value"})
@@ -46,9 +59,19 @@ class TestQueueLogger:
             {"filter_id": "", "item_name": "item's name", "exec_key": "exec value"},
         )
 
+    def test_msg_resource_usage(self):
+        queue = Queue()
+        logger = QueueLogger(queue, "item's name", None)
+        logger.set_filter_id("my filter id")
+        logger.msg_resource_usage.emit({"execution_type": "process", "wall_time": 2.0})
+        assert queue.get() == (
+            "resource_usage_msg",
+            {"filter_id": "my filter id", "item_name": "item's name", "execution_type": "process", "wall_time": 2.0},
+        )
+
     def test_set_filter_id(self):
         queue = Queue()
-        logger = QueueLogger(queue, "item's name", None, None)
+        logger = QueueLogger(queue, "item's name", None)
         logger.set_filter_id("my filter id")
         logger.msg.emit("my message")
         assert queue.get() == (
@@ -57,18 +80,155 @@ class TestQueueLogger:
         )
 
     def test_prompt(self):
+        queue = Queue()
+        broker = PromptBroker()
+        logger = QueueLogger(queue, "item's name", broker)
+        logger.set_filter_id("my filter id")
+        answers = []
+        thread = threading.Thread(target=lambda: answers.append(logger.prompt.emit("my message")))
+        thread.start()
+        assert queue.get(timeout=5.0) == ("prompt", {"prompter_id": logger.prompt.prompter_id, "data": "my message"})
+        broker.answer(logger.prompt.prompter_id, "Here's my answer.")
+        thread.join()
+        assert answers == ["Here's my answer."]
+        assert logger.prompt.emit("my message") == "Here's my answer."
+        assert queue.empty()
+
+    def test_same_prompt_from_two_items_is_asked_once(self):
+        queue = Queue()
+        broker = PromptBroker()
+        loggers = [QueueLogger(queue, name, broker) for name in ("item 1", "item 2")]
+        answers = []
+        threads = [threading.Thread(target=lambda l=l: answers.append(l.prompt.emit("question"))) for l in loggers]
+        for thread in threads:
+            thread.start()
+        event_type, prompt = queue.get(timeout=5.0)
+        assert event_type == "prompt"
+        broker.answer(prompt["prompter_id"], "answer")
+        for thread in threads:
+            thread.join()
+        assert answers == ["answer", "answer"]
+        assert queue.empty()
+
+    def test_prompt_from_child_process(self):
+        queue = mp.Queue()
+        broker = PromptBroker()
+        logger = QueueLogger(queue, "item's name", broker)
+        answer_queue = mp.Queue()
+        prepare_prompts_for_fork([logger])
+        process = mp.Process(target=_prompt_in_child, args=(logger, answer_queue))
+        process.start()
+        assert queue.get(timeout=30.0) == ("prompt", {"prompter_id": logger.prompt.prompter_id, "data": "question"})
+        broker.answer(logger.prompt.prompter_id, "answer")
+        assert answer_queue.get(timeout=30.0) == "answer"
+        process.join()
+
+    def test_prompt_from_returning_process(self):
+        queue = mp.Queue()
+        broker = PromptBroker()
+        logger = QueueLogger(queue, "item's name", broker)
+        process = ReturningProcess(target=_prompt_in_returning_process, args=(logger,))
+        results = []
+        thread = threading.Thread(target=lambda: results.append(process.run_until_complete()))
+        thread.start()
+        assert queue.get(timeout=30.0) == ("prompt", {"prompter_id": logger.prompt.prompter_id, "data": "question"})
+        broker.answer(logger.prompt.prompter_id, "answer")
+        thread.join(timeout=30.0)
+        assert results == ["answer"]
+
+    def test_deprecated_prompt_queue_and_answer_cache_still_work(self):
         queue = Queue()
         prompt_queue = Queue()
         answered_prompts = {}
-        logger = QueueLogger(queue, "item's name", prompt_queue, answered_prompts)
+        with pytest.warns(DeprecationWarning):
+            logger = QueueLogger(queue, "item's name", prompt_queue, answered_prompts, silent=False)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(logger.prompt.emit("question")))
+        thread.start()
+        assert queue.get(timeout=30.0) == ("prompt", {"prompter_id": id(prompt_queue), "data": "question"})
+        prompt_queue.put("answer")
+        thread.join(timeout=30.0)
+        assert results == ["answer"]
+        assert answered_prompts == {"question": "answer"}
+        assert logger.prompt.emit("question") == "answer"
+        assert queue.empty()
+
+    def test_unrelated_forks_do_not_create_answer_channels(self):
+        broker = PromptBroker()
+        logger = QueueLogger(mp.Queue(), "item's name", broker)
+        process = mp.Process(target=int)
+        process.start()
+        process.join()
+        assert logger.prompt._remote_channel is None
+
+    def test_set_filter_id_propagates_to_output_log(self, tmp_path):
+        logger = QueueLogger(Queue(), "item's name", None, logs_dir=str(tmp_path))
         logger.set_filter_id("my filter id")
-        prompt_queue.put("Here's my answer.")
-        assert logger.prompt.emit("my message") == "Here's my answer."
-        assert queue.get() == ("prompt", {"prompter_id": id(prompt_queue), "data": "my message"})
-        assert answered_prompts == {"my message": "Here's my answer."}
+        logger.output_log.write("line")
+        logger.output_log.close()
+        assert logger.output_log.path.endswith(".log")
+        assert "_" + sha1(b"my filter id").hexdigest() in logger.output_log.path
+
+    def test_no_output_log_without_logs_dir(self):
+        logger = QueueLogger(Queue(), "item's name", None)
+        assert logger.output_log is None
+
+    def test_unsubscribed_events_are_not_queued_but_slots_are_called(self):
+        queue = Queue()
+        logger = QueueLogger(queue, "item's name", PromptBroker(), event_types={"event_msg"})
+        slot = MessageStoringSlot()
+        logger.msg_proc.connect(slot)
+        logger.msg_proc.emit("process output")
+        logger.flash.emit()
+        assert logger.prompt.emit("question") is None
+        assert slot.message == {"filter_id": "", "msg_type": "msg", "msg_text": "process output"}
+        assert queue.empty()
+        logger.msg.emit("my message")
+        assert queue.get_nowait() == (
+            "event_msg",
+            {"filter_id": "", "item_name": "item's name", "msg_type": "msg", "msg_text": "my message"},
+        )
 
     def test_flash(self):
         queue = Queue()
-        logger = QueueLogger(queue, "item's name", None, None)
+        logger = QueueLogger(queue, "item's name", None)
         logger.flash.emit()
         assert queue.get() == ("flash", {"item_name": "item's name"})
+
+
+class TestBatchingQueue:
+    def test_events_are_batched_until_batch_is_full(self):
+        queue = Queue()
+        batching_queue = BatchingQueue(queue, max_batch_size=3, max_delay=60.0)
+        logger = QueueLogger(batching_queue, "item's name", None)
+        logger.msg_proc.emit("line 1")
+        logger.msg_proc.emit("line 2")
+        assert queue.empty()
+        logger.msg_proc.emit("line 3")
+        batch = queue.get()
+        assert [event[1]["msg_text"] for event in batch] == ["line 1", "line 2", "line 3"]
+        batching_queue.close()
+
+    def test_urgent_event_flushes_buffer(self):
+        queue = Queue()
+        batching_queue = BatchingQueue(queue, max_batch_size=100, max_delay=60.0)
+        batching_queue.put(("process_msg", {"msg_text": "line"}))
+        batching_queue.put(("exec_finished", {"item_name": "item"}))
+        assert queue.get_nowait() == [("process_msg", {"msg_text": "line"}), ("exec_finished", {"item_name": "item"})]
+        batching_queue.close()
+
+    def test_buffer_is_flushed_after_delay(self):
+        queue = Queue()
+        batching_queue = BatchingQueue(queue, max_batch_size=100, max_delay=0.01)
+        batching_queue.put(("process_msg", {"msg_text": "line"}))
+        assert queue.get(timeout=5.0) == [("process_msg", {"msg_text": "line"})]
+        batching_queue.close()
+
+    def test_close_flushes_buffer_and_disables_batching(self):
+        queue = Queue()
+        batching_queue = BatchingQueue(queue, max_batch_size=100, max_delay=60.0)
+        batching_queue.put(("process_msg", {"msg_text": "line 1"}))
+        batching_queue.close()
+        assert queue.get_nowait() == [("process_msg", {"msg_text": "line 1"})]
+        batching_queue.put(("process_msg", {"msg_text": "line 2"}))
+        assert queue.get_nowait() == [("process_msg", {"msg_text": "line 2"})]
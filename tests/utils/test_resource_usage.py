@@ -0,0 +1,120 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""Unit tests for ``resource_usage`` module."""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+from spine_engine.utils.resource_usage import (
+    ProcessSampler,
+    ResourceUsage,
+    current_rss,
+    emit_resource_usage,
+    measure_self,
+    self_rusage,
+    wait_for_process,
+)
+
+
+class TestWaitForProcess(unittest.TestCase):
+    def test_return_code_and_usage(self):
+        start_time = time.monotonic()
+        process = subprocess.Popen([sys.executable, "-c", "import sys; sys.exit(3)"])
+        return_code, usage = wait_for_process(process, start_time)
+        self.assertEqual(return_code, 3)
+        self.assertEqual(process.returncode, 3)
+        self.assertGreater(usage.wall_time, 0.0)
+        if hasattr(os, "wait4"):
+            self.assertGreater(usage.max_rss, 0)
+            self.assertGreaterEqual(usage.user_time, 0.0)
+
+    def test_popen_sees_reaped_process(self):
+        process = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(0.5)"])
+        terminator = threading.Timer(0.2, process.terminate)
+        terminator.start()
+        return_code, _ = wait_for_process(process, time.monotonic())
+        terminator.join()
+        self.assertEqual(process.poll(), return_code)
+        self.assertEqual(process.wait(timeout=1.0), return_code)
+        process.terminate()
+
+    def test_already_reaped_process(self):
+        process = subprocess.Popen([sys.executable, "-c", "pass"])
+        process.wait()
+        return_code, usage = wait_for_process(process, time.monotonic())
+        self.assertEqual(return_code, 0)
+        self.assertIsNone(usage.max_rss)
+
+
+class TestMeasureSelf(unittest.TestCase):
+    def test_deltas_are_non_negative(self):
+        baseline = self_rusage()
+        start_time = time.monotonic()
+        sum(range(100000))
+        usage = measure_self(start_time, baseline)
+        self.assertGreaterEqual(usage.wall_time, 0.0)
+        if baseline is not None:
+            self.assertGreaterEqual(usage.user_time, 0.0)
+            self.assertGreaterEqual(usage.read_bytes, 0)
+
+
+class TestProcessSampler(unittest.TestCase):
+    def test_unknown_pid_gives_wall_time_only(self):
+        usage = ProcessSampler(None).stop()
+        self.assertGreaterEqual(usage.wall_time, 0.0)
+        self.assertIsNone(usage.user_time)
+        self.assertIsNone(usage.max_rss)
+
+    @unittest.skipUnless(os.path.exists("/proc/self/stat"), "requires /proc")
+    def test_samples_current_process(self):
+        sampler = ProcessSampler(os.getpid())
+        sum(range(100000))
+        usage = sampler.stop()
+        self.assertGreaterEqual(usage.user_time, 0.0)
+        self.assertGreater(usage.max_rss, 0)
+
+
+class TestCurrentRss(unittest.TestCase):
+    def test_unknown_pid(self):
+        self.assertIsNone(current_rss(None))
+
+    @unittest.skipUnless(os.path.exists("/proc/self/status"), "requires /proc")
+    def test_current_process(self):
+        self.assertGreater(current_rss(os.getpid()), 0)
+
+
+class TestEmitResourceUsage(unittest.TestCase):
+    def test_emits_dictionary(self):
+        logger = MagicMock()
+        emit_resource_usage(logger, "process", ResourceUsage(1.0, user_time=0.5))
+        logger.msg_resource_usage.emit.assert_called_once_with(
+            {
+                "execution_type": "process",
+                "wall_time": 1.0,
+                "user_time": 0.5,
+                "system_time": None,
+                "max_rss": None,
+                "read_bytes": None,
+                "written_bytes": None,
+            }
+        )
+
+    def test_logger_without_signal_is_ignored(self):
+        emit_resource_usage(object(), "process", ResourceUsage(1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
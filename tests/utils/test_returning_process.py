@@ -0,0 +1,133 @@
+######################################################################################################################
+# Copyright (C) 2017-2022 Spine project consortium
+# Copyright Spine Engine contributors
+# This file is part of Spine Engine.
+# Spine Engine is free software: you can redistribute it and/or modify it under the terms of the GNU Lesser General
+# Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option)
+# any later version. This program is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY;
+# without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser General
+# Public License for more details. You should have received a copy of the GNU Lesser General Public License along with
+# this program. If not, see <http://www.gnu.org/licenses/>.
+######################################################################################################################
+"""Unit tests for ``returning_process`` module."""
+
+import multiprocessing as mp
+import os
+import threading
+from tempfile import TemporaryDirectory
+import time
+import unittest
+from spine_engine.utils.execution_resources import one_shot_process_semaphore
+from spine_engine.utils.queue_logger import BatchingQueue, PromptBroker, QueueLogger
+from spine_engine.utils.returning_process import PooledReturningProcess, returning_process_pool
+
+
+def _return_pid(context, offset):
+    return (True, os.getpid() + offset)
+
+
+def _wait_while_idle(context, path):
+    with context.maybe_idle:
+        deadline = time.monotonic() + 10.0
+        while not os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    return (True,)
+
+
+def _log_and_prompt(context, logger):
+    for i in range(3):
+        logger.msg.emit(f"message {i}")
+    answer = logger.prompt.emit("question")
+    logger.msg.emit(f"answer was {answer}")
+    return (True, threading.active_count())
+
+
+def _raise(context):
+    raise RuntimeError("failure")
+
+
+def _sleep(context):
+    time.sleep(30.0)
+    return (True,)
+
+
+class TestPooledReturningProcess(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(one_shot_process_semaphore.set_limit, one_shot_process_semaphore._max_processes)
+        one_shot_process_semaphore.set_limit(1)
+        self.addCleanup(returning_process_pool.shut_down)
+
+    def test_resource_usage_is_measured(self):
+        process = PooledReturningProcess(target=_return_pid, args=(0,))
+        process.run_until_complete()
+        self.assertIsNotNone(process.resource_usage)
+        self.assertGreaterEqual(process.resource_usage.wall_time, 0.0)
+
+    def test_workers_are_reused(self):
+        first = PooledReturningProcess(target=_return_pid, args=(0,)).run_until_complete()
+        second = PooledReturningProcess(target=_return_pid, kwargs={"offset": 0}).run_until_complete()
+        self.assertTrue(first[0])
+        self.assertNotEqual(first[1], os.getpid())
+        self.assertEqual(first, second)
+
+    def test_maybe_idle_releases_semaphore(self):
+        with TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "go")
+            results = []
+            idle_process = PooledReturningProcess(target=_wait_while_idle, args=(path,))
+            thread = threading.Thread(target=lambda: results.append(idle_process.run_until_complete()))
+            thread.start()
+            try:
+                second = PooledReturningProcess(target=_return_pid, args=(0,)).run_until_complete()
+            finally:
+                open(path, "w").close()
+                thread.join()
+        self.assertTrue(second[0])
+        self.assertEqual(results, [(True,)])
+        self.assertTrue(one_shot_process_semaphore.acquire(timeout=1.0))
+        one_shot_process_semaphore.release()
+
+    def test_logger_events_arrive_before_return_value(self):
+        queue = BatchingQueue(mp.Queue(), max_batch_size=1)
+        broker = PromptBroker()
+        logger = QueueLogger(queue, "item", broker)
+        results = []
+        process = PooledReturningProcess(target=_log_and_prompt, args=(logger,))
+        thread = threading.Thread(target=lambda: results.append(process.run_until_complete()))
+        thread.start()
+        events = []
+        while not events or events[-1][0] != "prompt":
+            events += queue.get(timeout=30.0)
+        broker.answer(events[-1][1]["prompter_id"], "yes")
+        thread.join(timeout=30.0)
+        self.assertTrue(results[0][0])
+        while True:
+            batch = queue.get(timeout=30.0)
+            events += batch
+            if batch[-1][1].get("msg_text") == "answer was yes":
+                break
+        self.assertEqual(
+            [data.get("msg_text") for event_type, data in events if event_type == "event_msg"],
+            ["message 0", "message 1", "message 2", "answer was yes"],
+        )
+        # The answer is cached by the broker, so the second job does not need to wait for the user
+        second = PooledReturningProcess(target=_log_and_prompt, args=(logger,)).run_until_complete()
+        self.assertEqual(second[1], results[0][1])
+
+    def test_unpicklable_arguments_raise(self):
+        with self.assertRaises(Exception):
+            PooledReturningProcess(target=_return_pid, args=(threading.Lock(),)).run_until_complete()
+
+    def test_exception_in_target_returns_failure(self):
+        self.assertEqual(PooledReturningProcess(target=_raise).run_until_complete(), (False,))
+
+    def test_terminate(self):
+        process = PooledReturningProcess(target=_sleep)
+        timer = threading.Timer(0.5, process.terminate)
+        timer.start()
+        self.assertEqual(process.run_until_complete(), (False,))
+        timer.join()
+
+
+if __name__ == "__main__":
+    unittest.main()